@@ -13,18 +13,22 @@ in the README file, the file will be displayed as if it was in markdown.
 
 import sys
 
-from PyQt6.QtCore import QSize, Qt
-from PyQt6.QtGui import QFont, QPixmap
+from PyQt6.QtCore import QEvent, QSize, Qt
+from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import (QDialog, QDialogButtonBox, QHBoxLayout, QLabel,
                              QTabWidget, QTextBrowser, QVBoxLayout)
 
 
 from app.metadata import __app_name__, __version__, __author__, __license__
+from core.icon_registry import icon_registry
 
 
 class AboutDialog(QDialog):
     """Dialog for viewing application information."""
 
+    _logo_path = "icons/application_icon.svg"
+    _logo_size = QSize(100, 100)
+
     def __init__(self, parent=None):
         super().__init__()
         self._parent = parent
@@ -45,10 +49,9 @@ class AboutDialog(QDialog):
         self._title.setStyleSheet("font-size:32px;")
         self._title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self._logo = QLabel()
-        self._logo.setPixmap(
-            QPixmap(".\\resources\\icons\\application_icon.svg"))
-        self._logo.setMaximumSize(QSize(100, 100))
+        self._logo.setMaximumSize(self._logo_size)
         self._logo.setScaledContents(True)
+        self._update_logo()
 
         # Tabs
         self._tabs = QTabWidget()
@@ -101,6 +104,17 @@ class AboutDialog(QDialog):
 
         self.setLayout(central_layout)
 
+    def event(self, event):
+        """Render the logo again when the dialog moves to another screen."""
+        if event.type() == QEvent.Type.DevicePixelRatioChange:
+            self._update_logo()
+        return super().event(event)
+
+    def _update_logo(self):
+        """Show the logo rendered for the dialog's device pixel ratio."""
+        self._logo.setPixmap(icon_registry().pixmap(
+            self._logo_path, self._logo_size, self.devicePixelRatioF()))
+
     def _get_caller_module(self):
         """Get the module of the calling class."""
         return sys.modules[self._parent.__module__]
@@ -2,7 +2,6 @@
 
 import os
 import sys
-from glob import glob
 
 from icecream import ic
 from PyQt6.QtCore import pyqtSlot
@@ -10,12 +9,19 @@ from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import (QComboBox, QDialog, QDialogButtonBox, QFormLayout,
                              QLabel, QSpinBox, QVBoxLayout)
 
+from core.rate_limit import debounce, throttle
+from core.resource_loader import RESOURCE_DIR, list_resources, read_text
 from ui.toggle_switch import QToggleSwitch
 
 
 class ConfigDialog(QDialog):
     """Dialog window for editing the application preferences (config)."""
 
+    # Quiet time after the last step of a spin box before its value is taken
+    SPIN_DEBOUNCE_MS = 300
+    # Shortest time between two theme previews while arrowing through them
+    THEME_PREVIEW_INTERVAL_MS = 150
+
     def __init__(self, config_handler):
         super().__init__()
         self._config = config_handler
@@ -28,6 +34,8 @@ class ConfigDialog(QDialog):
 
         # Store user changes before saving
         self._pending_changes = {}
+        # Rate limiters of the fields, flushed before saving
+        self._limiters = []
 
         self._create_widgets()
         self._create_layout()
@@ -56,8 +64,11 @@ class ConfigDialog(QDialog):
             self._config.theme_filename)
         if idx > -1:
             self.window_theme_field.setCurrentIndex(idx)
-        self.window_theme_field.currentTextChanged.connect(
-            self._window_theme_changed)
+        # Restyling is slow, so arrowing through the themes previews at most
+        # one per interval, ending with the last one
+        self._limiters.append(throttle(
+            self.window_theme_field.currentTextChanged,
+            self._window_theme_changed, self.THEME_PREVIEW_INTERVAL_MS))
 
         # Number of recent files
         num_recents_label = QLabel("Number of Recent Files to Store/View")
@@ -66,12 +77,30 @@ class ConfigDialog(QDialog):
         self.num_recents_field.setMaximum(30)
         self.num_recents_field.setValue(
             self._config.num_recents_to_show)
-        self.num_recents_field.valueChanged.connect(self._num_recents_changed)
+        self._limiters.append(debounce(
+            self.num_recents_field.valueChanged, self._num_recents_changed,
+            self.SPIN_DEBOUNCE_MS))
+
+        # Memory budget of the open documents
+        document_memory_label = QLabel("Memory for Open Documents")
+        document_memory_label.setToolTip(
+            "Decoded data of the least recently used documents is freed "
+            "beyond this, and reloaded when needed.")
+        self.document_memory_field = QSpinBox()
+        self.document_memory_field.setRange(16, 1024 * 1024)
+        self.document_memory_field.setSingleStep(64)
+        self.document_memory_field.setSuffix(" MiB")
+        self.document_memory_field.setValue(self._config.document_memory_mb)
+        self._limiters.append(debounce(
+            self.document_memory_field.valueChanged,
+            self._document_memory_changed, self.SPIN_DEBOUNCE_MS))
 
         # Collect all the form widgets for easy layout creation
         self.form_widgets = [(restore_window_label, self.restore_window_field),
                              (window_theme_label, self.window_theme_field),
-                             (num_recents_label, self.num_recents_field)]
+                             (num_recents_label, self.num_recents_field),
+                             (document_memory_label,
+                              self.document_memory_field)]
 
         # Save | Cancel buttons
         btn_box = (QDialogButtonBox.StandardButton.Save |
@@ -93,8 +122,8 @@ class ConfigDialog(QDialog):
         self.setLayout(central_layout)
 
     def _get_window_themes(self) -> dict:
-        r"""
-        Get the theme names and filenames from .\resources\styles\colors*.qss.
+        """
+        Get the theme names and filenames from resources/styles/colors*.qss.
 
         Note
         ----
@@ -116,13 +145,12 @@ class ConfigDialog(QDialog):
 
         """
         themes = {}
-        for file in glob(".\\resources\\styles\\colors*.qss"):
-            with open(file, 'r', encoding='utf-8') as file:
-                contents = file.read()
+        for path in list_resources("styles", "colors*.qss"):
+            contents = read_text(path)
             label = next((line.split("=")[1].strip()
                           for line in contents.split("\n")
                          if line.startswith('@theme-name')), "Unknown")
-            themes[label] = os.path.basename(file.name)
+            themes[label] = os.path.basename(path)
         return themes
 
     @pyqtSlot()
@@ -131,20 +159,27 @@ class ConfigDialog(QDialog):
             self.restore_window_field.isChecked()
         )
 
-    @pyqtSlot()
-    def _window_theme_changed(self):
+    @pyqtSlot(str)
+    def _window_theme_changed(self, _theme_name=None):
         new_theme = ic(self.window_theme_field.currentData())
         self._pending_changes['theme_filename'] = new_theme
         self.window_theme_changed = new_theme != self._original_theme
-        self.setStyleSheet(self._config.get_stylesheet(new_theme))
+        # Only the colors change, the structure is styled application-wide
+        self.setStyleSheet(self._config.get_stylesheet_parts(new_theme)[1])
 
     @pyqtSlot(int)
     def _num_recents_changed(self, value):
         self._pending_changes['num_recents_to_show'] = value
 
+    @pyqtSlot(int)
+    def _document_memory_changed(self, value):
+        self._pending_changes['document_memory_mb'] = value
+
     @pyqtSlot()
     def _on_save(self):
         """Apply changes and close dialog."""
+        for limiter in self._limiters:
+            limiter.flush()
         for key, value in self._pending_changes.items():
             setattr(self._config, key, value)
 
@@ -166,7 +201,8 @@ if __name__ == "__main__":
             button.clicked.connect(self._launch_editor)
             self.setCentralWidget(button)
 
-            self._config = ConfigHandler(".\\resources\\app_config.yaml")
+            self._config = ConfigHandler(
+                os.path.join(RESOURCE_DIR, "app_config.yaml"))
 
         def _launch_editor(self):
             config_dialog = ConfigDialog(self._config, parent=self)
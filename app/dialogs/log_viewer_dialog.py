@@ -0,0 +1,264 @@
+"""Dialog showing the application log while it is written.
+
+The log is indexed in the background by core.log_index. The table only
+reads the lines it displays from the memory-mapped file, so logs of hundreds
+of MB open at once and scroll smoothly. New lines appear as they are
+written, and the view follows them while it is scrolled to the bottom.
+Filtering by level or module uses the index, not the file.
+"""
+
+import collections
+
+from PyQt6.QtCore import (QAbstractTableModel, QModelIndex, QSignalBlocker, Qt,
+                          pyqtSlot)
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import (QAbstractItemView, QCheckBox, QComboBox, QDialog,
+                             QHBoxLayout, QHeaderView, QLabel, QTableView,
+                             QVBoxLayout)
+
+from core.log_index import LogTail, level_number, split_record
+
+
+class LogTableModel(QAbstractTableModel):
+    """Lines of an indexed log file, read from the file when displayed."""
+
+    COLUMNS = ("Time", "Level", "Module", "Message")
+    LEVEL_COLORS = {"WARNING": QColor("#c87800"),
+                    "ERROR": QColor("#d03030"),
+                    "CRITICAL": QColor("#d03030")}
+    # Parsed lines kept, a few screens worth
+    CACHE_SIZE = 1000
+
+    def __init__(self, log_tail, parent=None):
+        super().__init__(parent)
+        self._tail = log_tail
+        # Numbers of the lines shown, None shows the first _line_count lines
+        self._rows = None
+        self._line_count = len(log_tail.index)
+        self._min_level = 0
+        self._module = None
+        self._cache = collections.OrderedDict()
+        log_tail.lines_added.connect(self._on_lines_added)
+        log_tail.reset.connect(self._on_reset)
+
+    # pylint: disable=invalid-name,missing-function-docstring
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._rows is None:
+            return self._line_count
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation,
+                   role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and \
+                role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+    # pylint: enable=invalid-name,missing-function-docstring
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        """Fields of a line and the color of its level."""
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._fields(index.row())[index.column()]
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self.LEVEL_COLORS.get(self._fields(index.row())[1])
+        if role == Qt.ItemDataRole.ToolTipRole and \
+                index.column() == len(self.COLUMNS) - 1:
+            return self._fields(index.row())[-1]
+        return None
+
+    def line_number(self, row: int) -> int:
+        """Number of the file line shown in a row."""
+        return row if self._rows is None else self._rows[row]
+
+    def set_filter(self, min_level: int = 0, module: str = None):
+        """Only show the lines of a level or above, and of a module."""
+        self.beginResetModel()
+        self._min_level = min_level
+        self._module = module
+        self._rows = self._tail.index.rows(min_level, module)
+        self._line_count = len(self._tail.index)
+        self._cache.clear()
+        self.endResetModel()
+
+    def _fields(self, row):
+        """(time, level, module, message) of the line in a row."""
+        line_number = self.line_number(row)
+        fields = self._cache.get(line_number)
+        if fields is None:
+            fields = split_record(self._tail.line(line_number))
+            self._cache[line_number] = fields
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return fields
+
+    @pyqtSlot(int, int)
+    def _on_lines_added(self, first, count):
+        """Append the new lines that pass the filter."""
+        if self._rows is None:
+            new_rows = count
+        else:
+            new_lines = self._tail.index.rows(self._min_level, self._module,
+                                              first_line=first)
+            new_rows = len(new_lines)
+        if not new_rows:
+            return
+        first_row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), first_row,
+                             first_row + new_rows - 1)
+        if self._rows is None:
+            self._line_count += new_rows
+        else:
+            self._rows.extend(new_lines)
+        self.endInsertRows()
+
+    @pyqtSlot()
+    def _on_reset(self):
+        """Empty the table when the file is indexed again."""
+        self.beginResetModel()
+        self._rows = self._tail.index.rows(self._min_level, self._module)
+        self._line_count = len(self._tail.index)
+        self._cache.clear()
+        self.endResetModel()
+
+
+class LogViewerDialog(QDialog):
+    """Non-modal dialog following a log file.
+
+    The file is only followed while the dialog is shown; showing it again
+    continues from the lines indexed before.
+    """
+
+    LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+    def __init__(self, log_filepath, task_scheduler):
+        super().__init__()
+        self.log_tail = LogTail(log_filepath, task_scheduler, parent=self)
+
+        self.setWindowTitle(f"Log - {log_filepath}")
+        self.resize(1000, 600)
+
+        self._create_widgets()
+        self._create_layout()
+        # After the model, so that it has the new rows when following them
+        self.log_tail.lines_added.connect(self._on_lines_added)
+        self.log_tail.reset.connect(self._update_status)
+        self._update_status()
+
+    def _create_widgets(self):
+        """Define all the widgets for the dialog and their functionality."""
+        self.level_filter = QComboBox()
+        self.level_filter.addItem("All levels", 0)
+        for level in self.LEVELS:
+            self.level_filter.addItem(f"{level} and above",
+                                      level_number(level))
+        self.level_filter.currentIndexChanged.connect(self._apply_filter)
+
+        self.module_filter = QComboBox()
+        self.module_filter.addItem("All modules", None)
+        self.module_filter.currentIndexChanged.connect(self._apply_filter)
+
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.setChecked(True)
+        self.follow_check.setToolTip("Scroll to new lines as they are written")
+        self.follow_check.toggled.connect(self._on_follow_toggled)
+
+        self.status_label = QLabel()
+
+        self.model = LogTableModel(self.log_tail, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setWordWrap(False)
+        self.table.setShowGrid(False)
+        self.table.setSelectionBehavior(
+            QAbstractItemView.SelectionBehavior.SelectRows)
+        # Fixed row heights keep the view from measuring millions of rows
+        rows = self.table.verticalHeader()
+        rows.hide()
+        rows.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        rows.setDefaultSectionSize(self.fontMetrics().height() + 4)
+        columns = self.table.horizontalHeader()
+        columns.setStretchLastSection(True)
+        metrics = self.fontMetrics()
+        for column, sample in enumerate(("0000-00-00 00:00:00", "CRITICAL",
+                                         "subcontroller_registry")):
+            columns.resizeSection(column, metrics.horizontalAdvance(sample) +
+                                  16)
+        self.table.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+
+    def _create_layout(self):
+        """Define the layout of the dialog."""
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.level_filter)
+        filter_layout.addWidget(self.module_filter)
+        filter_layout.addWidget(self.follow_check)
+        filter_layout.addStretch()
+        filter_layout.addWidget(self.status_label)
+
+        layout = QVBoxLayout()
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def showEvent(self, event):  # pylint: disable=invalid-name
+        """Follow the log file while shown."""
+        super().showEvent(event)
+        self.log_tail.start()
+
+    def done(self, result):
+        """Stop following the log file when closed."""
+        self.log_tail.stop()
+        super().done(result)
+
+    @pyqtSlot()
+    def _apply_filter(self):
+        """Show the lines of the selected level and module."""
+        self.model.set_filter(self.level_filter.currentData(),
+                              self.module_filter.currentData())
+        self._update_status()
+        if self.follow_check.isChecked():
+            self.table.scrollToBottom()
+
+    @pyqtSlot(int, int)
+    def _on_lines_added(self, _first, _count):
+        """Offer new modules as filters and follow the new lines."""
+        known = {self.module_filter.itemData(i)
+                 for i in range(1, self.module_filter.count())}
+        # Inserting before the selected module is no change of filter
+        blocker = QSignalBlocker(self.module_filter)
+        for module in self.log_tail.index.modules():
+            if module not in known:
+                position = 1 + sum(name < module for name in known)
+                self.module_filter.insertItem(position, module, module)
+                known.add(module)
+        blocker.unblock()
+        self._update_status()
+        if self.follow_check.isChecked():
+            self.table.scrollToBottom()
+
+    @pyqtSlot(bool)
+    def _on_follow_toggled(self, checked):
+        """Jump to the last line when following is turned on."""
+        if checked:
+            self.table.scrollToBottom()
+
+    @pyqtSlot(int)
+    def _on_scrolled(self, value):
+        """Follow while scrolled to the bottom, stop when scrolled up."""
+        self.follow_check.setChecked(
+            value == self.table.verticalScrollBar().maximum())
+
+    @pyqtSlot()
+    def _update_status(self):
+        """Show the number of lines shown and indexed."""
+        total = len(self.log_tail.index)
+        shown = self.model.rowCount()
+        text = f"{total:,} lines" if shown == total else \
+            f"{shown:,} of {total:,} lines"
+        if self.log_tail.is_indexing:
+            text += ", indexing..."
+        self.status_label.setText(text)
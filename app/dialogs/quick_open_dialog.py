@@ -0,0 +1,91 @@
+"""Quick-open palette searching the history of opened files.
+
+Every term typed must occur in the path of a file, the results are ranked
+by how often and how recently the file was opened. Up and Down move through
+the results, Enter opens the selected file.
+"""
+
+from PyQt6.QtCore import QSize, Qt, pyqtSlot
+from PyQt6.QtWidgets import (QDialog, QLineEdit, QListWidget, QListWidgetItem,
+                             QVBoxLayout)
+
+
+class QuickOpenDialog(QDialog):
+    """Dialog for finding a previously opened file as you type."""
+
+    # Number of results listed
+    RESULT_LIMIT = 20
+
+    def __init__(self, file_history):
+        super().__init__()
+        self._history = file_history
+        self.selected_file = None
+
+        self.setWindowTitle("Quick Open")
+        self.resize(QSize(600, 400))
+
+        self._create_widgets()
+        self._create_layout()
+
+        if self._history.is_loading:
+            self._history.loaded.connect(self._update_results)
+        self._update_results()
+
+    def _create_widgets(self):
+        """Define all the widgets for the dialog and their functionality."""
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Search opened files")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.textChanged.connect(self._update_results)
+        self.search_field.installEventFilter(self)
+
+        self.results_list = QListWidget()
+        self.results_list.setUniformItemSizes(True)
+        self.results_list.itemActivated.connect(self._open_item)
+
+    def _create_layout(self):
+        """Define the layout of the dialog."""
+        layout = QVBoxLayout()
+        layout.addWidget(self.search_field)
+        layout.addWidget(self.results_list)
+        self.setLayout(layout)
+
+    @pyqtSlot()
+    def _update_results(self):
+        """List the best matches of the search text."""
+        self.results_list.clear()
+        if self._history.is_loading:
+            self.results_list.addItem("Loading file history...")
+            return
+        for path in self._history.search(self.search_field.text(),
+                                         self.RESULT_LIMIT):
+            item = QListWidgetItem(path)
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self.results_list.addItem(item)
+        self.results_list.setCurrentRow(0)
+
+    @pyqtSlot(QListWidgetItem)
+    def _open_item(self, item):
+        """Accept the dialog with the file of `item`."""
+        path = item.data(Qt.ItemDataRole.UserRole)
+        if path is not None:
+            self.selected_file = path
+            self.accept()
+
+    def eventFilter(self, watched, event):  # pylint: disable=invalid-name
+        """Move through the results and open them from the search field."""
+        if watched is self.search_field and \
+                event.type() == event.Type.KeyPress:
+            key = event.key()
+            if key in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+                step = -1 if key == Qt.Key.Key_Up else 1
+                row = self.results_list.currentRow() + step
+                if 0 <= row < self.results_list.count():
+                    self.results_list.setCurrentRow(row)
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                item = self.results_list.currentItem()
+                if item is not None:
+                    self._open_item(item)
+                return True
+        return super().eventFilter(watched, event)
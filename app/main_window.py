@@ -1,54 +1,144 @@
 """main_window.py."""
 import ctypes
 import platform
+import time
 from functools import partial
 
 # from icecream import ic
-from PyQt6.QtCore import pyqtSlot
-from PyQt6.QtGui import QAction, QIcon, QKeySequence
+from PyQt6.QtCore import QEvent, QTimer, pyqtSlot
+from PyQt6.QtGui import QAction, QIcon, QImage, QKeySequence, QPixmap
 from PyQt6.QtWidgets import (QApplication, QFileDialog, QLabel, QMainWindow,
-                             QPushButton, QVBoxLayout, QWidget)
+                             QMenu, QPushButton, QStyle, QVBoxLayout, QWidget)
+
+from core.diagnostics import format_bytes, process_rss
+from core.icon_registry import icon_registry
+from core.logger import logger
+from core.metrics import metrics
+from core.rate_limit import Debouncer
+from core.task_scheduler import Priority
+from core.thumbnail_cache import is_image_file
+
+
+_STARTUP_STAGE_SECONDS = metrics().histogram(
+    "app_startup_stage_seconds", "Time of each stage of the main window "
+    "built after its first paint", ("stage",), unit="seconds")
+_FIRST_PAINT_SECONDS = metrics().gauge(
+    "app_startup_first_paint_seconds",
+    "Time from the start until the main window first painted",
+    unit="seconds")
+_STARTUP_COMPLETE_SECONDS = metrics().gauge(
+    "app_startup_complete_seconds",
+    "Time from the start until the main window was complete",
+    unit="seconds")
+
+
+def recent_file_tooltip(filepath, info=None):
+    """Tooltip of a recent file, with what the file index knows of it."""
+    if info is None:
+        return filepath
+    details = [format_bytes(info.size)]
+    if info.width is not None:
+        details.append(f"{info.width} x {info.height}")
+    details.append(info.mime_type)
+    return f"{filepath}\n{', '.join(details)}"
 
 
 class MainWindow(QMainWindow):
-    """Main window."""
+    """Main window.
 
-    def __init__(self, main_controller):
+    The window is built in stages so that it paints as soon as possible.
+    Only the frame, the theme's palette, a placeholder central widget and
+    the geometry are set up before show(). The stylesheet, the menus, the
+    central widget and the window icon follow after the first paint, one
+    per event-loop turn, see STARTUP_STAGES. The menus are filled with
+    their actions when first shown.
+
+    Several windows can share one controller, see MainController.new_window.
+    Only the first one records the startup metrics, and only the last one
+    to close saves the state of the application.
+
+    Parameters
+    ----------
+    main_controller : MainController
+        Controller of the application.
+    startup_time : float, optional
+        time.perf_counter() at which the startup began, for
+        time_to_first_paint_ms. Defaults to the construction of the window.
+
+    """
+
+    # Methods building the rest of the window after the first paint
+    STARTUP_STAGES = ("_set_stylesheet", "_create_menu", "_setup_ui",
+                      "_set_window_icon")
+
+    # How often the memory use in the status bar is refreshed, besides
+    # whenever the documents' memory changes
+    MEMORY_STATUS_INTERVAL_MS = 5000
+
+    # Quiet time after moving or resizing before the geometry is saved
+    GEOMETRY_SAVE_DELAY_MS = 1000
+
+    def __init__(self, main_controller, startup_time=None):
         super().__init__()
+        self._startup_time = startup_time or time.perf_counter()
 
         if 'windows' in platform.system().lower():
             self.windows_specific_function()
 
         # Define attributes
         self.open_recent_menu = None
+        # Milliseconds from the start until the first paint and until the
+        # last startup stage, None until then
+        self.time_to_first_paint_ms = None
+        self.startup_ms = None
+        self._startup_stages = list(self.STARTUP_STAGES)
+        # Menu title: actions, of the menus not shown yet
+        self._unfilled_menus = {}
+        # Saved once the window stopped moving, not on every move event
+        self._geometry_saver = Debouncer(self._save_geometry,
+                                         self.GEOMETRY_SAVE_DELAY_MS)
 
         self.main_controller = main_controller
-        self.main_controller.window_theme_changed.connect(
-            self._set_stylesheet)
+        # The startup metrics are those of the application's first window
+        self._is_first_window = not main_controller.windows
+        self.main_controller.add_window(self)
+        self.main_controller.recent_files_checked.connect(
+            self._mark_missing_recent_files)
+        self.main_controller.thumbnail_cache.thumbnail_ready.connect(
+            self._show_recent_thumbnail)
+        self.main_controller.documents.memory_changed.connect(
+            self._show_memory_use)
         self._init_ui()
 
     def _init_ui(self):
+        """Set up what the first paint shows, the rest follows later."""
         self.setWindowTitle('Application Title')
 
         self.app = QApplication.instance()
 
-        self._set_stylesheet()
+        # The theme's colors without the cost of the stylesheet
+        self.main_controller.apply_palette()
 
         self.status_bar = self.statusBar()
         # self.status_bar.setSizeGripEnabled(False)
-        self.status_bar.setVisible(False)  # Remove this to use status bar
 
-        self._create_menu()
+        # Memory of the open documents and of the process
+        self.memory_label = QLabel()
+        self.status_bar.addPermanentWidget(self.memory_label)
+        self._show_memory_use()
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setInterval(self.MEMORY_STATUS_INTERVAL_MS)
+        self._memory_timer.timeout.connect(self._show_memory_use)
+        self._memory_timer.start()
 
-        self._setup_ui()
+        # Replaced by _setup_ui
+        self.setCentralWidget(QWidget())
 
         position, size = self.main_controller.get_window_position_size(
             self.app.primaryScreen().availableGeometry())
         self.move(position)
         self.resize(size)
 
-        self.setWindowIcon(QIcon(".\\resources\\icons\\application_icon.svg"))
-
     def _setup_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -59,21 +149,61 @@ class MainWindow(QMainWindow):
 
         # layout.addStretch()
 
-    def _create_menu(self):
-        menu = self.menuBar()
+    def _set_window_icon(self):
+        self.setWindowIcon(
+            icon_registry().icon("icons/application_icon.svg"))
 
-        # File Menu
-        file_menu = menu.addMenu("&File")
-        file_menu.aboutToShow.connect(self._show_hide_recents)
+    def finish_startup(self):
+        """Run the remaining startup stages now, e.g. before first paint."""
+        while self._startup_stages:
+            self._run_next_startup_stage()
+
+    @pyqtSlot()
+    def _run_next_startup_stage(self):
+        """Run one startup stage and schedule the next one."""
+        if not self._startup_stages:
+            return
+        stage = self._startup_stages.pop(0)
+        start = time.perf_counter()
+        getattr(self, stage)()
+        # Later windows are not part of the application's startup
+        if self._is_first_window:
+            _STARTUP_STAGE_SECONDS.labels(stage=stage.lstrip("_")).observe(
+                time.perf_counter() - start)
+        if self._startup_stages:
+            QTimer.singleShot(0, self._run_next_startup_stage)
+        else:
+            self.startup_ms = (time.perf_counter() - self._startup_time) * 1e3
+            if self._is_first_window:
+                _STARTUP_COMPLETE_SECONDS.set(self.startup_ms / 1e3)
+            logger.info("Main window complete after %.1f ms", self.startup_ms)
+
+    def _create_menu(self):
+        """Add the menus and create their actions.
+
+        The actions are only added to their menus when a menu is first
+        shown. They are added to the window too, so that their shortcuts
+        work before.
+        """
+        # File - New Window
+        file_new_window_action = QAction("New &Window", self)
+        file_new_window_action.setShortcut(QKeySequence("Ctrl+Shift+N"))
+        file_new_window_action.triggered.connect(
+            self.main_controller.new_window)
 
         # File - Open
         file_open_action = QAction("&Open...", self)
         file_open_action.setShortcut(QKeySequence.StandardKey.Open)
         file_open_action.triggered.connect(self._open_file)
-        file_menu.addAction(file_open_action)
+
+        # File - Quick Open
+        file_quick_open_action = QAction("&Quick Open...", self)
+        file_quick_open_action.setShortcut(QKeySequence("Ctrl+P"))
+        file_quick_open_action.triggered.connect(
+            self.main_controller.on_quick_open)
 
         # File - Open Recent Menu
-        self.open_recent_menu = file_menu.addMenu("Open &Recent")
+        self.open_recent_menu = QMenu("Open &Recent", self)
         self.open_recent_menu.aboutToShow.connect(
             self._populate_open_recent_menu)
         self.open_recent_menu.setToolTipsVisible(True)
@@ -82,22 +212,18 @@ class MainWindow(QMainWindow):
         file_close_action = QAction("&Close", self)
         file_close_action.setShortcut(QKeySequence.StandardKey.Close)
         file_close_action.triggered.connect(self._close_file)
-        file_menu.addAction(file_close_action)
-
-        # File - Seperator Bar
-        file_menu.addSeparator()
 
         # File - Quit
         file_quit_action = QAction("&Quit", self)
         file_quit_action.setShortcut(QKeySequence.StandardKey.Quit)
         file_quit_action.triggered.connect(self._quit_app)
-        file_menu.addAction(file_quit_action)
 
-        # Edit Menu
-        edit_menu = menu.addMenu("&Edit")
-
-        # Edit - Separator Bar
-        edit_menu.addSeparator()
+        # File Menu, None is a separator bar
+        file_menu = self._add_menu("&File", [
+            file_new_window_action, file_open_action, file_quick_open_action,
+            self.open_recent_menu.menuAction(), file_close_action, None,
+            file_quit_action])
+        file_menu.aboutToShow.connect(self._show_hide_recents)
 
         # Edit - Preferences
         edit_preferences_action = QAction("&Preferences", self)
@@ -105,18 +231,94 @@ class MainWindow(QMainWindow):
             QKeySequence.StandardKey.Preferences)
         edit_preferences_action.triggered.connect(
             self.main_controller.on_edit_preferences)
-        edit_menu.addAction(edit_preferences_action)
 
-        # Help Menu
-        help_menu = menu.addMenu("&Help")
+        # Edit Menu
+        self._add_menu("&Edit", [None, edit_preferences_action])
 
         # Help - About
         help_about_action = QAction("&About...", self)
         help_about_action.triggered.connect(self.main_controller.on_about)
-        help_menu.addAction(help_about_action)
+
+        # Help - Memory Diagnostics
+        help_memory_action = QAction("&Memory Diagnostics", self)
+        help_memory_action.setToolTip(
+            "Write a memory report to the log, run again to see the growth")
+        help_memory_action.triggered.connect(
+            self.main_controller.on_memory_diagnostics)
+
+        # Help - Profile
+        help_profile_action = QAction("&Profile...", self)
+        help_profile_action.setToolTip(
+            "Record where the time goes for a few seconds, to send with a "
+            "report")
+        help_profile_action.triggered.connect(self.main_controller.on_profile)
+
+        # Help - Log
+        help_log_action = QAction("&Log", self)
+        help_log_action.setToolTip("Show the application log as it is written")
+        help_log_action.triggered.connect(self.main_controller.on_log_viewer)
+
+        # Help Menu
+        self._add_menu("&Help", [help_about_action, help_memory_action,
+                                 help_profile_action, help_log_action])
+
+        # Sub-controller actions, including those registered later on
+        subcontrollers = self.main_controller.subcontrollers
+        for spec in subcontrollers.specs():
+            self._add_subcontroller_actions(spec.name)
+        subcontrollers.registered.connect(self._add_subcontroller_actions)
+
+    def _add_menu(self, title, actions):
+        """Add a menu to the menu bar, filled with `actions` when shown."""
+        menu = self.menuBar().addMenu(title)
+        self.addActions([action for action in actions
+                         if action is not None and not action.menu()])
+        self._unfilled_menus[title] = actions
+        menu.aboutToShow.connect(partial(self._fill_menu, menu))
+        return menu
+
+    def _fill_menu(self, menu):
+        """Add the actions of a menu the first time it is needed."""
+        actions = self._unfilled_menus.pop(menu.title(), None)
+        for action in actions or []:
+            if action is None:
+                menu.addSeparator()
+            else:
+                menu.addAction(action)
+
+    @pyqtSlot(str)
+    def _add_subcontroller_actions(self, name):
+        """Add the menu actions of a sub-controller without loading it."""
+        subcontrollers = self.main_controller.subcontrollers
+        spec = next(s for s in subcontrollers.specs() if s.name == name)
+        for declaration in spec.actions:
+            action = QAction(declaration["text"], self)
+            action.triggered.connect(
+                lambda _checked=False, slot=declaration["slot"]:
+                subcontrollers.call(name, slot))
+            self._get_menu(declaration["menu"]).addAction(action)
+
+    def _get_menu(self, title):
+        """Return the menu bar menu called `title`, adding it if needed.
+
+        New menus are inserted before the Help menu.
+        """
+        menu_bar = self.menuBar()
+        menu_actions = menu_bar.actions()
+        for menu_action in menu_actions:
+            if menu_action.text() == title:
+                # After the menu's own actions
+                self._fill_menu(menu_action.menu())
+                return menu_action.menu()
+        menu = menu_bar.addMenu(title)
+        help_action = next((a for a in menu_actions if a.text() == "&Help"),
+                           None)
+        if help_action is not None:
+            menu_bar.insertMenu(help_action, menu)
+        return menu
 
     def _set_stylesheet(self):
-        self.app.setStyleSheet(self.main_controller.get_stylesheet())
+        self.main_controller.apply_theme(self)
 
 ###############################################################################
 #                                Action Slots                                 #
@@ -137,27 +339,49 @@ class MainWindow(QMainWindow):
             if file_dialog.exec():
                 for file in file_dialog.selectedFiles():
                     print(file)
-                    self.config_handler.add_recent_file(file)
+                    self.main_controller.open_file(file)
         else:
-            self.config_handler.add_recent_file(filepath)
+            self.main_controller.open_file(filepath)
             print("Open", filepath)
 
+    @pyqtSlot(list)
+    def open_files(self, filepaths):
+        """Open files from the command line or another launch of the app."""
+        for filepath in filepaths:
+            self._open_file(filepath)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
     @pyqtSlot()
     def _close_file(self):
-        print("Perform close action here...")
+        """Close the active document."""
+        self.main_controller.close_file()
 
     @pyqtSlot()
     def _populate_open_recent_menu(self):
         """Generate entries for "Open Recent" menu with their actions."""
-        # Step 1: Clear the menu of the old entries
+        # Step 1: Clear the menu of the old entries, this deletes the
+        # actions as they are owned by the menu
         self.open_recent_menu.clear()
 
         # Step 2: Create the actions
         actions = []
-        for filename, filepath in self.config_handler.recent_files.items():
-            action = QAction(filename, self)
+        recent_files = self.main_controller.config_handler.recent_files
+        # What is known about the files, in one query and without reading
+        # them, which is slow on network shares
+        infos = self.main_controller.file_index.lookup(recent_files.values())
+        for filename, filepath in recent_files.items():
+            action = QAction(filename, self.open_recent_menu)
             action.triggered.connect(partial(self._open_file, filepath))
-            action.setToolTip(filepath)
+            action.setData(filepath)
+            action.setToolTip(recent_file_tooltip(filepath,
+                                                  infos.get(filepath)))
+            action.setEnabled(
+                filepath not in self.main_controller.missing_recent_files)
+            if is_image_file(filepath):
+                self._set_recent_thumbnail(action, filepath)
             actions.append(action)
 
         # Step 3: Add actions to the menu
@@ -165,31 +389,131 @@ class MainWindow(QMainWindow):
 
         # Step 4: Add clear recents action
         self.open_recent_menu.addSeparator()
-        clear_recents_action = QAction("Clear List...", self)
+        clear_recents_action = QAction("Clear List...",
+                                       self.open_recent_menu)
         clear_recents_action.triggered.connect(self._clear_recent_files)
         self.open_recent_menu.addAction(clear_recents_action)
 
+    def _set_recent_thumbnail(self, action, filepath):
+        """Show the thumbnail in memory or a placeholder, and refresh it."""
+        thumbnail_cache = self.main_controller.thumbnail_cache
+        image = thumbnail_cache.thumbnail(filepath)
+        if image is None:
+            # A pixmap copy: the style's icon can be backed by the platform
+            # icon theme, which crashes if released after the application
+            style = self.style()
+            placeholder = style.standardIcon(QStyle.StandardPixmap.SP_FileIcon)
+            action.setIcon(QIcon(placeholder.pixmap(
+                style.pixelMetric(QStyle.PixelMetric.PM_SmallIconSize))))
+        else:
+            action.setIcon(QIcon(QPixmap.fromImage(image)))
+        thumbnail_cache.request(filepath, Priority.HIGH)
+
+    @pyqtSlot(str, QImage)
+    def _show_recent_thumbnail(self, filepath, image):
+        """Swap the placeholder of a recent file for its thumbnail."""
+        if self.open_recent_menu is None:
+            return
+        for action in self.open_recent_menu.actions():
+            if action.data() == filepath:
+                action.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    @pyqtSlot(set)
+    def _mark_missing_recent_files(self, missing):
+        """Disable the "Open Recent" entries of files that are gone."""
+        if self.open_recent_menu is None:
+            return
+        recent_files = self.main_controller.config_handler.recent_files
+        filepaths = set(recent_files.values())
+        for action in self.open_recent_menu.actions():
+            if action.data() in filepaths:
+                action.setEnabled(action.data() not in missing)
+
+    @pyqtSlot()
+    def _show_memory_use(self):
+        """Show the memory of the open documents and of the process."""
+        documents = self.main_controller.documents
+        self.memory_label.setText(
+            f"Documents: {format_bytes(documents.memory_used)} of "
+            f"{format_bytes(documents.budget_bytes)}    "
+            f"Process: {format_bytes(process_rss())}")
+
     @pyqtSlot()
     def _clear_recent_files(self):
-        self.config_handler.recent_files = {}
+        self.main_controller.config_handler.recent_files = {}
 
     @pyqtSlot()
     def _show_hide_recents(self):
         self.open_recent_menu.menuAction().setVisible(
             len(self.main_controller.config_handler.recent_files) > 0)
+        # Check in the background which recent files still exist
+        self.main_controller.check_recent_files()
+
+    @pyqtSlot()
+    def _save_geometry(self):
+        """Save the geometry the window came to rest at."""
+        if self.isVisible():
+            self.main_controller.save_window_geometry_in_background(self)
 
     @pyqtSlot()
     def _quit_app(self):
-        self.close()
+        """Close every window, the last main window saves the state."""
+        self.app.closeAllWindows()
 
 ###############################################################################
 #                                Catch Events                                 #
 ###############################################################################
+    def paintEvent(self, event):  # pylint: disable=invalid-name
+        """Record the first paint and build the rest of the window after."""
+        super().paintEvent(event)
+        if self.time_to_first_paint_ms is None:
+            self.time_to_first_paint_ms = (
+                time.perf_counter() - self._startup_time) * 1e3
+            if self._is_first_window:
+                _FIRST_PAINT_SECONDS.set(self.time_to_first_paint_ms / 1e3)
+            logger.info("Main window painted after %.1f ms",
+                        self.time_to_first_paint_ms)
+            QTimer.singleShot(0, self._run_next_startup_stage)
+
+    def moveEvent(self, event):  # pylint: disable=invalid-name
+        """Save the position once the window stopped moving."""
+        super().moveEvent(event)
+        # Not the placement of the window when it is shown
+        if self.time_to_first_paint_ms is not None:
+            self._geometry_saver()
+
+    def resizeEvent(self, event):  # pylint: disable=invalid-name
+        """Save the size once the window stopped resizing."""
+        super().resizeEvent(event)
+        if self.time_to_first_paint_ms is not None:
+            self._geometry_saver()
+
+    def showEvent(self, event):  # pylint: disable=invalid-name
+        """Register the window again if it is shown after being closed."""
+        super().showEvent(event)
+        self.main_controller.add_window(self)
+
+    def changeEvent(self, event):  # pylint: disable=invalid-name
+        """Track the active window, which receives forwarded files."""
+        super().changeEvent(event)
+        if (event.type() == QEvent.Type.ActivationChange
+                and self.isActiveWindow()):
+            self.main_controller.activate_window(self)
+
     def closeEvent(self, event):  # pylint: disable=invalid-name
-        """Handle close event to clean up application."""
-        self.main_controller.save_window_position_and_size(self)
+        """Handle close event to clean up application.
+
+        The other windows share the controller and its state, so only the
+        last one to close cleans up and saves its geometry.
+        """
+        self._geometry_saver.cancel()
+        if self.main_controller.remove_window(self):
+            # Nothing may write the config file during the final save
+            self.main_controller.stop_background_tasks()
+
+            self.main_controller.save_window_position_and_size(self)
 
-        self.main_controller.delete_temp_files()
+            self.main_controller.delete_temp_files()
 
         event.accept()
 
@@ -0,0 +1,43 @@
+"""batch.py"""
+import argparse
+import sys
+
+from core.batch import DEFAULT_CONFIG_FILEPATH, run_batch
+
+
+def parse_args(argv):
+    """Parse the command line of the headless batch mode."""
+    parser = argparse.ArgumentParser(
+        description="Process files without a window, e.g. on a server "
+                    "without a display")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="files and directories to process, "
+                             "directories recursively")
+    parser.add_argument("--pattern", metavar="GLOB",
+                        help="only process the files of directories whose "
+                             "name matches, e.g. '*.csv'")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="number of worker processes, defaults to the "
+                             "number of CPU cores")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_FILEPATH,
+                        help="application configuration to use")
+    parser.add_argument("--manifest", metavar="YAML",
+                        help="additional subcontroller manifest")
+    parser.add_argument("--json", action="store_true",
+                        help="write a JSON object per line")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Entry point of the headless batch mode."""
+    args = parse_args(sys.argv[1:])
+    try:
+        status = run_batch(args.paths, args.config, args.manifest,
+                           args.workers, args.pattern, args.json)
+    except FileNotFoundError as error:
+        sys.exit(f"batch.py: {error}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,37 @@ import yaml
 # from icecream import ic
 from PyQt6.QtCore import QPoint, QSize
 
+from core.icon_registry import icon_registry
+from core.metrics import CacheMetrics, metrics
+from core.qss_optimizer import optimize_stylesheet
+from core.qss_parser import format_rules, parse_rules, split_themed_rules
+from core.resource_loader import (RESOURCE_DIR, list_resources, read_text,
+                                  resource_path)
+
+_STYLESHEET_CACHE = CacheMetrics("stylesheets")
+_STYLESHEET_COMPILE_SECONDS = metrics().histogram(
+    "app_stylesheet_compile_seconds",
+    "Time to format and optimize a stylesheet, full or scoped parts",
+    ("kind",), unit="seconds")
+_CONFIG_SAVE_SECONDS = metrics().histogram(
+    "app_config_save_seconds", "Time to write the configuration file",
+    unit="seconds")
+
 
 class ConfigHandler:
     """Handle all configuration file needs."""
 
     # Declare parameters
     _username = None
-    _style_template_path = ".\\resources\\styles\\style_template.qss"
-    _down_arrow_template_path = ".\\resources\\icons\\down-arrow-template.svg"
-    _button_add_icon_path = ".\\resources\\icons\\plus-symbol-template.svg"
-    _button_delete_icon_path = ".\\resources\\icons\\minus-symbol-template.svg"
+    # Resource paths relative to resources/, see core.resource_loader
+    _style_template_path = "styles/style_template.qss"
+    _down_arrow_template_path = "icons/down-arrow-template.svg"
+    _button_add_icon_path = "icons/plus-symbol-template.svg"
+    _button_delete_icon_path = "icons/minus-symbol-template.svg"
+    _theme_dir = "styles"
+
+    # Run formatted stylesheets through core.qss_optimizer
+    _optimize_stylesheets = True
 
     STARTER_CONFIG = {"theme_filename": "colors_light.qss",
                       "window_restore": False,
@@ -28,7 +49,9 @@ class ConfigHandler:
                       "window_width": 1600,
                       "window_height": 1200,
                       "recent_files": {},
-                      "num_recents_to_show": 10}
+                      "num_recents_to_show": 10,
+                      "scoped_theming": True,
+                      "document_memory_mb": 512}
 
     def __init__(self, config_filepath):
         try:
@@ -37,9 +60,16 @@ class ConfigHandler:
             self._username = "DEFAULT"
 
         self.config_filepath = config_filepath
-        self.temp_dir = ".\\resources\\temp\\"
+        self.temp_dir = os.path.join(RESOURCE_DIR, "temp")
         os.makedirs(self.temp_dir, exist_ok=True)
 
+        # Resource text by relative path and formatted stylesheets by theme,
+        # see invalidate_resources
+        self._resource_cache = {}
+        self._stylesheet_cache = {}
+        self._color_sheet_cache = {}
+        self._structural_sheet = None
+
         try:
             with open(self.config_filepath, 'r') as file:
                 self.config = yaml.safe_load(file)
@@ -69,42 +99,170 @@ class ConfigHandler:
         """
         if theme_filename is None:
             theme_filename = self.theme_filename
-        with open(self._style_template_path, 'r') as file:
-            style = file.read()
+        _STYLESHEET_CACHE.record(theme_filename in self._stylesheet_cache)
+        if theme_filename not in self._stylesheet_cache:
+            with _STYLESHEET_COMPILE_SECONDS.labels(kind="full").time():
+                style = self.read_resource(self._style_template_path)
+                self._stylesheet_cache[theme_filename] = self._optimize(
+                    self._apply_theme_colors(style, theme_filename))
+        return self._stylesheet_cache[theme_filename]
+
+    def get_stylesheet_parts(self, theme_filename: str = None) -> tuple:
+        """Retrieve the stylesheet split into a structural and a color part.
+
+        The structural part holds every declaration of the template that
+        does not reference a theme keyword, so it is the same for every
+        theme. The color part holds only the themed declarations, with the
+        keywords replaced by the colors of the theme.
+
+        Parameters
+        ----------
+        theme_filename : str, optional
+            Theme to format the color part with. Defaults to the theme in
+            the config file.
+
+        Returns
+        -------
+        tuple
+            (structural stylesheet, color-only stylesheet).
+
+        """
+        if theme_filename is None:
+            theme_filename = self.theme_filename
+        cached = (self._structural_sheet is not None and
+                  theme_filename in self._color_sheet_cache)
+        _STYLESHEET_CACHE.record(cached)
+        if not cached:
+            with _STYLESHEET_COMPILE_SECONDS.labels(kind="scoped").time():
+                template = self.read_resource(self._style_template_path)
+                structural, themed = split_themed_rules(
+                    parse_rules(template))
+                self._structural_sheet = self._optimize(
+                    format_rules(structural))
+                self._color_sheet_cache[theme_filename] = self._optimize(
+                    self._apply_theme_colors(format_rules(themed),
+                                             theme_filename))
+        return (self._structural_sheet,
+                self._color_sheet_cache[theme_filename])
+
+    def get_theme_colors(self, theme_filename: str = None) -> dict:
+        """Read the keyword to color mapping of a theme.
+
+        Returns
+        -------
+        dict
+            Mapping of the theme keywords (e.g. "@text") to their values, in
+            the order they appear in the theme file.
+
+        """
+        if theme_filename is None:
+            theme_filename = self.theme_filename
+        colors = self.read_resource(f"{self._theme_dir}/{theme_filename}")
+
+        return dict(tuple(part.strip() for part in line.split("=", 1))
+                    for line in colors.split("\n") if "=" in line)
+
+    def read_resource(self, relative_path: str) -> str:
+        """Read a text resource, keeping it cached until it is invalidated.
+
+        Parameters
+        ----------
+        relative_path : str
+            Forward-slash separated path relative to `resources/`.
+
+        Returns
+        -------
+        str
+            Contents of the resource.
+
+        """
+        if relative_path not in self._resource_cache:
+            self._resource_cache[relative_path] = read_text(
+                resource_path(relative_path))
+        return self._resource_cache[relative_path]
+
+    def theme_resources(self) -> list:
+        """Relative paths of every resource the stylesheets are built from."""
+        themes = [f"{self._theme_dir}/{os.path.basename(path)}"
+                  for path in list_resources(self._theme_dir, "colors*.qss")]
+        return ([self._style_template_path] + themes +
+                list(self._svg_templates.values()))
+
+    def invalidate_resources(self, relative_paths) -> set:
+        """Forget the cached copies of changed resources.
 
-        # with open(self._down_arrow_template_path, 'r') as file:
-        #     svg = file.read()
+        Only the stylesheets built from a changed resource are dropped: a
+        theme file invalidates its own theme, the template and the SVG
+        templates invalidate every theme.
+
+        Parameters
+        ----------
+        relative_paths : Iterable
+            Changed resources, relative to `resources/`.
+
+        Returns
+        -------
+        set
+            File names of the themes that have to be formatted again.
 
-        with open(f".\\resources\\styles\\{theme_filename}", 'r') as file:
-            colors = file.read()
+        """
+        cached = set(self._stylesheet_cache) | set(self._color_sheet_cache)
+        themes = set()
+        for path in relative_paths:
+            self._resource_cache.pop(path, None)
+            if path == self._style_template_path:
+                self._structural_sheet = None
+                themes |= cached
+            elif path in self._svg_templates.values():
+                icon_registry().invalidate(path)
+                themes |= cached
+            elif path.startswith(f"{self._theme_dir}/"):
+                themes.add(path.split("/", 1)[1])
+        for theme in themes:
+            self._stylesheet_cache.pop(theme, None)
+            self._color_sheet_cache.pop(theme, None)
+        return themes
+
+    def clear_cache(self):
+        """Forget every cached resource and formatted stylesheet."""
+        self._resource_cache.clear()
+        self._stylesheet_cache.clear()
+        self._color_sheet_cache.clear()
+        self._structural_sheet = None
 
-        color_list = [tuple(line.replace(" = ", "=").split("="))
-                      for line in colors.split("\n")]
+    @property
+    def _svg_templates(self) -> dict:
+        """Theme keywords that refer to an SVG template, and the template."""
+        return {"@button-plus-icon": self._button_add_icon_path,
+                "@button-minus-icon": self._button_delete_icon_path,
+                "@combobox-down-arrow": self._down_arrow_template_path}
+
+    def _optimize(self, style: str) -> str:
+        """Optimize a formatted stylesheet if optimization is enabled."""
+        if self._optimize_stylesheets:
+            return optimize_stylesheet(style)
+        return style
 
-        svg_templates = {
-            "@button-plus-icon": self._button_add_icon_path,
-            "@button-minus-icon": self._button_delete_icon_path,
-            "@combobox-down-arrow": self._down_arrow_template_path
-            }
+    def _apply_theme_colors(self, style: str, theme_filename: str) -> str:
+        """Replace the theme keywords in `style` with the theme's colors.
 
-        processed_svgs = {}
+        Keywords that refer to an SVG template are replaced with the url of
+        the SVG tinted with the theme color, rendered to PNG files by the
+        icon registry for each device pixel ratio of the screens. Every
+        theme gets its own files, so cached stylesheets of other themes stay
+        valid.
+        """
+        svg_templates = self._svg_templates
+        theme_name = os.path.splitext(theme_filename)[0]
 
-        for lbl, clr in color_list:
+        for lbl, clr in self.get_theme_colors(theme_filename).items():
             if lbl in svg_templates:
-                with open(svg_templates[lbl], 'r') as svg_file:
-                    svg_content = svg_file.read()
-                svg_content = svg_content.replace(lbl, clr)
-                svg_path = f"{self.temp_dir}{lbl[1:]}-in-use.svg"
-                with open(svg_path, "w") as temp_file:
-                    temp_file.write(svg_content)
-                url = "url(" + svg_path.replace("\\", "/") + ")"
-                processed_svgs[lbl] = url
-
-        for lbl, clr in color_list:
-            if lbl in processed_svgs:
-                style = style.replace(lbl, processed_svgs[lbl])
-            else:
-                style = style.replace(lbl, clr)
+                png_path = icon_registry().write_pixmaps(
+                    svg_templates[lbl],
+                    os.path.join(self.temp_dir, f"{lbl[1:]}-{theme_name}.png"),
+                    tint={lbl: clr})
+                clr = "url(" + png_path.replace("\\", "/") + ")"
+            style = style.replace(lbl, clr)
 
         return style
 
@@ -158,18 +316,26 @@ class ConfigHandler:
             while len(self.recent_files) > self.num_recents_to_show:
                 self.recent_files.popitem()
 
-    def save_config(self):
+    def save_config(self, config: dict = None):
         """
         Save the current configuration to file.
 
+        Parameters
+        ----------
+        config : dict, optional
+            Snapshot of the configuration to save instead of the live one,
+            e.g. to save from another thread.
+
         Returns
         -------
         None.
 
         """
         if self.username != "DEFAULT":
-            with open(self.config_filepath, 'w') as file:
-                yaml.dump(self.config, file, sort_keys=False)
+            with _CONFIG_SAVE_SECONDS.time(), \
+                    open(self.config_filepath, 'w') as file:
+                yaml.dump(self.config if config is None else config, file,
+                          sort_keys=False)
 
     def get_config_field(self, field: str):
         """Get the value associated with the provided field.
@@ -253,6 +419,15 @@ class ConfigHandler:
 #                     Define property setters and getters                     #
 ###############################################################################
 
+    @property
+    def document_memory_mb(self):
+        """Memory budget of the open documents' decoded data, in MiB."""
+        return self.get_config_field("document_memory_mb")
+
+    @document_memory_mb.setter
+    def document_memory_mb(self, value: int):
+        self.set_config_field("document_memory_mb", value)
+
     @property
     def num_recents_to_show(self):
         """How many recent files should be visible in the menu."""
@@ -271,6 +446,15 @@ class ConfigHandler:
     def recent_files(self, files: dict):
         self.set_config_field("recent_files", files)
 
+    @property
+    def scoped_theming(self):
+        """Apply themes through a palette and color-only stylesheets."""
+        return self.get_config_field('scoped_theming')
+
+    @scoped_theming.setter
+    def scoped_theming(self, scoped: bool):
+        self.set_config_field('scoped_theming', scoped)
+
     @property
     def theme_filename(self):
         """File name of the theme currently in use."""
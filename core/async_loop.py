@@ -0,0 +1,258 @@
+"""
+async_loop.py
+
+Run an asyncio event loop inside the Qt event loop.
+
+Qt owns the main loop (`app.exec()`), so the asyncio loop is stepped from it:
+    - A QSocketNotifier watches the loop's selector, so sockets, pipes and
+      `call_soon_threadsafe` wake the loop as soon as they are ready.
+    - A single-shot QTimer runs the loop again when its next callback or
+      timer is due.
+Between steps nothing is polled, so an idle application does not wake up.
+
+With the loop installed, coroutines can be used as Qt slots through the
+`async_slot` decorator, signals can be awaited with `wait_signal` and
+blocking calls can be moved to a thread with `run_in_executor`.
+
+Do not start a nested Qt event loop (e.g. `QDialog.exec()`) from a
+coroutine; the asyncio loop is paused until the nested loop returns.
+
+Usage:
+    install()               # once, after the QApplication is created
+
+    class Controller(QObject):
+        @async_slot
+        async def on_refresh(self):
+            exists = await run_in_executor(os.path.exists, path)
+            await wait_signal(self.some_signal, timeout=5)
+"""
+
+import asyncio
+import functools
+import inspect
+
+from PyQt6.QtCore import (QCoreApplication, QObject, QSocketNotifier, QTimer,
+                          pyqtSignal)
+
+from core.logger import logger
+
+_bridge = None
+
+
+class QtAsyncioBridge(QObject):
+    """Step an asyncio event loop from the Qt event loop.
+
+    Parameters
+    ----------
+    loop : asyncio.AbstractEventLoop, optional
+        Loop to run. Defaults to a new selector event loop, which is set as
+        the current event loop.
+    parent : QObject, optional
+        Parent of the bridge.
+
+    """
+
+    # How often the loop is stepped if its selector cannot be watched
+    POLL_INTERVAL_MS = 10
+
+    closed = pyqtSignal()
+
+    def __init__(self, loop=None, parent=None):
+        super().__init__(parent)
+        self.loop = loop or asyncio.SelectorEventLoop()
+        asyncio.set_event_loop(self.loop)
+        self._stepping = False
+        self._close_requested = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._step)
+
+        self._notifier = None
+        # pylint: disable=protected-access
+        selector = getattr(self.loop, "_selector", None)
+        try:
+            fileno = selector.fileno()
+        except (AttributeError, NotImplementedError):
+            logger.info("asyncio selector cannot be watched, polling every "
+                        "%d ms", self.POLL_INTERVAL_MS)
+        else:
+            self._notifier = QSocketNotifier(fileno,
+                                             QSocketNotifier.Type.Read, self)
+            self._notifier.activated.connect(self._step)
+        self._schedule(0)
+
+    def _schedule(self, delay_ms):
+        """Step the loop after `delay_ms`, unless it is due earlier."""
+        if not self._timer.isActive() or \
+                self._timer.remainingTime() > delay_ms:
+            self._timer.start(delay_ms)
+
+    def _step(self):
+        """Run one iteration of the asyncio loop and plan the next one."""
+        if self._stepping or self.loop.is_closed():
+            # Reached from a nested Qt event loop started by a callback
+            return
+        self._stepping = True
+        try:
+            self.loop.call_soon(self.loop.stop)
+            self.loop.run_forever()
+        finally:
+            self._stepping = False
+        if self._close_requested:
+            self.close()
+            return
+
+        # pylint: disable=protected-access
+        if self.loop._ready:
+            self._schedule(0)
+        elif self.loop._scheduled:
+            delay = self.loop._scheduled[0].when() - self.loop.time()
+            self._schedule(max(0, int(delay * 1e3) + 1))
+        elif self._notifier is None:
+            self._schedule(self.POLL_INTERVAL_MS)
+
+    def wake_up(self):
+        """Step the loop soon, e.g. after scheduling from Qt code."""
+        self._schedule(0)
+
+    def close(self, timeout: float = 1.0):
+        """Cancel the remaining tasks and close the loop.
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds the cancelled tasks get to finish.
+
+        """
+        if self.loop.is_closed():
+            return
+        if self._stepping:
+            # Called from a callback, e.g. a coroutine quitting the app
+            self._close_requested = True
+            return
+        self._timer.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self.loop.run_until_complete(
+                asyncio.wait(tasks, timeout=timeout))
+        self.loop.run_until_complete(self.loop.shutdown_default_executor())
+        self.loop.close()
+        self.closed.emit()
+
+
+def install(loop=None) -> QtAsyncioBridge:
+    """Run asyncio inside the Qt event loop of the application.
+
+    Safe to call more than once; the loop is only installed the first time.
+    The loop is closed when the application quits.
+    """
+    global _bridge  # pylint: disable=global-statement
+    if _bridge is None or _bridge.loop.is_closed():
+        app = QCoreApplication.instance()
+        if app is None:
+            raise RuntimeError("Create the QApplication before installing "
+                               "the asyncio loop")
+        _bridge = QtAsyncioBridge(loop, app)
+        app.aboutToQuit.connect(_bridge.close)
+    return _bridge
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The asyncio loop running inside Qt, installing it if needed."""
+    return install().loop
+
+
+def create_task(coroutine) -> asyncio.Task:
+    """Schedule a coroutine on the loop; exceptions are logged."""
+    bridge = install()
+    task = bridge.loop.create_task(coroutine)
+    task.add_done_callback(_log_task_exception)
+    bridge.wake_up()
+    return task
+
+
+def _log_task_exception(task):
+    """Log the exception of a task nobody awaited."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Unhandled exception in %r", task,
+                     exc_info=task.exception())
+
+
+def async_slot(func):
+    """Allow a coroutine function to be connected to Qt signals.
+
+    Calling the decorated function schedules the coroutine on the loop and
+    returns its asyncio.Task. Like Qt slots, surplus signal arguments (e.g.
+    the `checked` flag of QAction.triggered) are dropped.
+    """
+    parameters = inspect.signature(func).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        max_args = None
+    else:
+        max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+                       for p in parameters)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if max_args is not None:
+            args = args[:max_args]
+        return create_task(func(*args, **kwargs))
+
+    return wrapper
+
+
+async def wait_signal(signal, timeout: float = None):
+    """Wait until a Qt signal is emitted.
+
+    Parameters
+    ----------
+    signal : pyqtBoundSignal
+        Signal to wait for.
+    timeout : float, optional
+        Seconds to wait before raising asyncio.TimeoutError.
+
+    Returns
+    -------
+    object
+        None for a signal without arguments, its argument if it has one,
+        otherwise a tuple of the arguments.
+
+    """
+    loop = get_loop()
+    future = loop.create_future()
+
+    def resolve(args):
+        if not future.done():
+            future.set_result(args[0] if len(args) == 1 else
+                              (args or None))
+
+    def on_emitted(*args):
+        # Resolving the future only schedules the waiting coroutine, and the
+        # bridge steps the loop again when its selector wakes it up
+        loop.call_soon_threadsafe(resolve, args)
+
+    signal.connect(on_emitted)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    finally:
+        signal.disconnect(on_emitted)
+
+
+async def run_in_executor(func, *args, executor=None, **kwargs):
+    """Run a blocking call in a thread and wait for its result.
+
+    Parameters
+    ----------
+    func : callable
+        Blocking function, it must not touch widgets.
+    executor : concurrent.futures.Executor, optional
+        Executor to run in. Defaults to the loop's thread pool.
+
+    """
+    return await get_loop().run_in_executor(
+        executor, functools.partial(func, *args, **kwargs))
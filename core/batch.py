@@ -0,0 +1,317 @@
+"""
+batch.py
+
+Headless batch mode: run the file processing of MainController over many
+files without a window, e.g. on a Linux server without a display.
+
+Only a QCoreApplication is created and QtWidgets is never imported, in
+this process or in the workers. The files are spread over the worker
+processes of a ProcessPoolService. Each worker builds one headless
+MainController for its first file and hands it every file, see
+MainController.process_file, so the subcontrollers declared for the file
+types do the same work as when the files are opened in the window. Files
+no subcontroller handles are skipped. Results must be picklable.
+
+A line is written to stdout as each file finishes, in the order they
+finish, followed by a summary:
+    [  3/120] ok          12.5 ms  data/run3.csv
+    Processed 120 files in 3.2 s: 117 ok, 2 skipped, 1 failed
+With `json_lines` every line is a JSON object instead, with the result of
+the subcontroller or the error.
+
+Usage:
+    python batch.py data/ --workers 4
+
+    status = run_batch(["data/"], max_workers=4)   # 1 if a file failed
+"""
+
+import fnmatch
+import json
+import os
+import signal
+import sys
+import time
+from functools import partial
+
+from PyQt6.QtCore import (QCoreApplication, QEventLoop, QObject, QTimer,
+                          pyqtSignal)
+
+from core.app_config_handler import ConfigHandler
+from core.logger import logger
+from core.process_pool import ProcessPoolService
+from core.resource_loader import RESOURCE_DIR
+
+OK = "ok"
+SKIPPED = "skipped"
+FAILED = "failed"
+STATUSES = (OK, SKIPPED, FAILED)
+
+DEFAULT_CONFIG_FILEPATH = os.path.join(RESOURCE_DIR, "app_config.yaml")
+
+# Worker side: the application and a controller per (config, manifest)
+_app = None
+_controllers = {}
+
+
+def collect_files(paths, pattern: str = None) -> list:
+    """Expand directories into the files below them.
+
+    Parameters
+    ----------
+    paths : list of str
+        Files and directories. Directories are searched recursively, in
+        sorted order.
+    pattern : str, optional
+        Glob pattern the names of the files found in directories must
+        match, e.g. "*.csv". Files given directly are always kept.
+
+    Raises
+    ------
+    FileNotFoundError
+        If a path does not exist.
+
+    """
+    filepaths = []
+    for path in paths:
+        if os.path.isfile(path):
+            filepaths.append(path)
+        elif os.path.isdir(path):
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                filepaths.extend(
+                    os.path.join(directory, filename)
+                    for filename in sorted(filenames)
+                    if pattern is None or fnmatch.fnmatch(filename, pattern))
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return filepaths
+
+
+def _worker_controller(config_filepath: str, manifest_path: str = None):
+    """Headless MainController of this worker, built on first use."""
+    global _app  # pylint: disable=global-statement
+    key = (config_filepath, manifest_path)
+    if key not in _controllers:
+        # pylint: disable-next=import-outside-toplevel
+        from core.main_controller import MainController
+
+        _app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+        # Ctrl+C reaches the whole process group, the batch cancels itself
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        controller = MainController(config_filepath)
+        # The window loads them once its event loop runs
+        controller.subcontrollers.load_entry_points()
+        if manifest_path is not None:
+            controller.subcontrollers.load_manifest(manifest_path)
+        _controllers[key] = controller
+    return _controllers[key]
+
+
+def process_in_worker(filepath: str, config_filepath: str,
+                      manifest_path: str = None) -> tuple:
+    """Process a file with the worker's headless controller (worker side).
+
+    Returns
+    -------
+    tuple
+        (status, result of the subcontroller, seconds taken), the status
+        is SKIPPED if no subcontroller handles the file type.
+
+    """
+    controller = _worker_controller(config_filepath, manifest_path)
+    start = time.perf_counter()
+    if controller.subcontrollers.handler_for_file(filepath) is None:
+        return SKIPPED, None, 0.0
+    result = controller.process_file(filepath)
+    return OK, result, time.perf_counter() - start
+
+
+class BatchRunner(QObject):
+    """Process files in a process pool and report each one as it finishes.
+
+    Parameters
+    ----------
+    filepaths : list of str
+        Files to process.
+    config_filepath : str
+        Configuration the controllers of the workers are built with.
+    manifest_path : str, optional
+        Subcontroller manifest loaded in addition to the application's.
+    max_workers : int, optional
+        Number of worker processes. Defaults to the number of CPU cores.
+    stream : file, optional
+        Where the progress is written. Defaults to stdout.
+    json_lines : bool
+        Write a JSON object per line instead of text.
+    parent : QObject, optional
+        Parent of the runner.
+
+    """
+
+    # Exit status, 1 if a file failed or the run was cancelled
+    finished = pyqtSignal(int)
+
+    # Tasks queued per worker, enough to keep the workers busy while only
+    # holding a few of a large batch's futures at a time
+    TASKS_PER_WORKER = 4
+
+    def __init__(self, filepaths,
+                 config_filepath: str = DEFAULT_CONFIG_FILEPATH,
+                 manifest_path: str = None, max_workers: int = None,
+                 stream=None, json_lines: bool = False, parent=None):
+        super().__init__(parent)
+        self.filepaths = list(filepaths)
+        self.config_filepath = os.path.abspath(config_filepath)
+        self.manifest_path = (os.path.abspath(manifest_path)
+                              if manifest_path else None)
+        self.stream = stream or sys.stdout
+        self.json_lines = json_lines
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.is_cancelled = False
+        self.is_finished = False
+        self.pool = ProcessPoolService(max_workers, parent=self)
+        self._next_index = 0
+        self._in_flight = 0
+        self._start_time = None
+
+    @property
+    def done(self) -> int:
+        """Number of files finished, whatever their status."""
+        return sum(self.counts.values())
+
+    def start(self):
+        """Submit the first files, the others follow as workers free up."""
+        self._start_time = time.perf_counter()
+        logger.info("Batch of %d files on %d workers", len(self.filepaths),
+                    self.pool.max_workers)
+        self._submit_next()
+        if not self._in_flight:
+            self._finish()
+
+    def cancel(self):
+        """Stop submitting, wait for the running files and finish."""
+        if self._start_time is None or self.is_finished:
+            return
+        self.is_cancelled = True
+        self.pool.shutdown()
+        self._finish()
+
+    def _submit_next(self):
+        """Keep the pool's queue filled with the next files."""
+        limit = self.pool.max_workers * self.TASKS_PER_WORKER
+        while (self._in_flight < limit
+               and self._next_index < len(self.filepaths)):
+            filepath = self.filepaths[self._next_index]
+            self._next_index += 1
+            task = self.pool.submit(process_in_worker, filepath,
+                                    self.config_filepath, self.manifest_path)
+            task.finished.connect(partial(self._on_finished, filepath))
+            task.failed.connect(partial(self._on_failed, filepath))
+            task.cancelled.connect(self._on_task_done)
+            self._in_flight += 1
+
+    def _on_finished(self, filepath, outcome):
+        """Report a file that was processed or skipped."""
+        status, result, seconds = outcome
+        self._report(filepath, status, seconds=seconds, result=result)
+        self._on_task_done()
+
+    def _on_failed(self, filepath, error):
+        """Report a file whose subcontroller raised."""
+        self._report(filepath, FAILED, error=error)
+        self._on_task_done()
+
+    def _on_task_done(self):
+        """Submit the next file, or finish after the last one."""
+        self._in_flight -= 1
+        if self.is_cancelled:
+            return
+        self._submit_next()
+        if not self._in_flight:
+            self._finish()
+
+    def _report(self, filepath, status, seconds=None, result=None,
+                error=None):
+        """Write the progress line of a finished file."""
+        self.counts[status] += 1
+        if self.json_lines:
+            record = {"index": self.done, "total": len(self.filepaths),
+                      "file": filepath, "status": status}
+            if seconds is not None:
+                record["ms"] = round(seconds * 1e3, 3)
+            if status == OK:
+                record["result"] = result
+            if error is not None:
+                record["error"] = f"{type(error).__name__}: {error}"
+            line = json.dumps(record, default=repr)
+        else:
+            width = len(str(len(self.filepaths)))
+            timing = (f"{seconds * 1e3:9.1f} ms" if status == OK
+                      else " " * 12)
+            line = (f"[{self.done:{width}d}/{len(self.filepaths)}] "
+                    f"{status:<8}{timing}  {filepath}")
+            if error is not None:
+                line += f": {type(error).__name__}: {error}"
+        print(line, file=self.stream, flush=True)
+
+    def _finish(self):
+        """Stop the workers, write the summary and emit finished."""
+        self.is_finished = True
+        self.pool.shutdown()
+        seconds = time.perf_counter() - self._start_time
+        status = 1 if self.counts[FAILED] or self.is_cancelled else 0
+        if self.json_lines:
+            line = json.dumps({"summary": dict(
+                self.counts, total=len(self.filepaths),
+                seconds=round(seconds, 3), cancelled=self.is_cancelled)})
+        else:
+            line = (f"Processed {self.done} of {len(self.filepaths)} files "
+                    f"in {seconds:.1f} s: " + ", ".join(
+                        f"{self.counts[key]} {key}" for key in STATUSES))
+            if self.is_cancelled:
+                line += " (cancelled)"
+        print(line, file=self.stream, flush=True)
+        logger.info("Batch finished in %.1f s: %s", seconds, self.counts)
+        self.finished.emit(status)
+
+
+def run_batch(paths, config_filepath: str = DEFAULT_CONFIG_FILEPATH,
+              manifest_path: str = None, max_workers: int = None,
+              pattern: str = None, json_lines: bool = False,
+              stream=None) -> int:
+    """Process files and directories headlessly, see BatchRunner.
+
+    Creates the QCoreApplication if there is none and runs an event loop
+    until every file is done. Ctrl+C lets the running files finish and
+    cancels the rest.
+
+    Returns
+    -------
+    int
+        Exit status, 1 if a file failed or the run was cancelled.
+
+    Raises
+    ------
+    FileNotFoundError
+        If one of the paths does not exist.
+
+    """
+    filepaths = collect_files(paths, pattern)
+    # pylint: disable-next=unused-variable
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    # Write a missing configuration once, not from every worker at once
+    ConfigHandler(config_filepath)
+
+    runner = BatchRunner(filepaths, config_filepath, manifest_path,
+                         max_workers, stream, json_lines)
+    loop = QEventLoop()
+    runner.finished.connect(loop.exit)
+    # Cancelled from the event loop, not from within the slot interrupted
+    previous_handler = signal.signal(
+        signal.SIGINT, lambda *_args: QTimer.singleShot(0, runner.cancel))
+    try:
+        QTimer.singleShot(0, runner.start)
+        return loop.exec()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        runner.deleteLater()
@@ -0,0 +1,237 @@
+"""
+diagnostics.py
+
+On-demand memory diagnostics for long-running sessions.
+
+A report contains:
+    - The top allocation sites that grew since the previous snapshot, from
+      tracemalloc.
+    - The resident set size (RSS) of the process.
+    - The number of live Qt objects by class, and how it changed.
+Reports are written through `core.logger`, so `logs/app.log` can be attached
+to bug reports.
+
+tracemalloc only sees allocations made after it started, so for a full
+picture set the environment variable APP_MEMORY_DIAGNOSTICS to the number
+of stack frames to record (e.g. 1) before starting the application.
+Otherwise tracing starts with the first report (Help > Memory Diagnostics).
+
+Usage:
+    diagnostics = MemoryDiagnostics()
+    diagnostics.start()
+    ...
+    diagnostics.report()    # Snapshot, diff against the previous one, log
+"""
+
+import collections
+import gc
+import os
+import sys
+import tracemalloc
+
+from PyQt6 import sip
+from PyQt6.QtCore import QCoreApplication, QObject
+
+from core.logger import logger
+
+ENV_VAR = "APP_MEMORY_DIAGNOSTICS"
+
+
+def process_rss() -> int:
+    """Resident set size of the process in bytes, or None if unknown.
+
+    Falls back to the peak RSS where the current one is not available.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        return _windows_rss()
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _windows_rss() -> int:
+    """Working set size of the process on Windows."""
+    # pylint: disable=import-outside-toplevel
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        """PROCESS_MEMORY_COUNTERS of the Windows API."""
+
+        _fields_ = [("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def live_qobjects() -> list:
+    """Every live QObject reachable from Python or from the application.
+
+    Qt keeps no registry of its objects, so this collects the objects
+    wrapped by Python and everything in their object trees, including
+    children created by Qt itself.
+    """
+    # Only the parentless objects are walked, their trees hold the others
+    roots = [obj for obj in gc.get_objects()
+             if isinstance(obj, QObject) and not sip.isdeleted(obj) and
+             obj.parent() is None]
+    app = QCoreApplication.instance()
+    if app is not None:
+        roots.append(app)
+        top_level_widgets = getattr(app, "topLevelWidgets", None)
+        if top_level_widgets is not None:
+            roots.extend(top_level_widgets())
+
+    objects = {}
+    for root in roots:
+        for obj in [root] + root.findChildren(QObject):
+            objects.setdefault(sip.unwrapinstance(obj), obj)
+    return list(objects.values())
+
+
+def qobject_counts() -> collections.Counter:
+    """Number of live QObjects by class name."""
+    return collections.Counter(type(obj).__name__ for obj in live_qobjects())
+
+
+def format_bytes(size) -> str:
+    """Human-readable size, e.g. "12.3 MiB"."""
+    if size is None:
+        return "unknown"
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class MemoryDiagnostics:
+    """tracemalloc snapshots and Qt object counts, reported to the log.
+
+    Parameters
+    ----------
+    frames : int
+        Number of stack frames tracemalloc records per allocation. More
+        frames show the callers of an allocation site, but cost more.
+
+    """
+
+    # Number of allocation sites and Qt classes listed in a report
+    TOP_LIMIT = 15
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._snapshot = None
+        self._qobject_counts = collections.Counter()
+
+    @classmethod
+    def from_environment(cls):
+        """Start diagnostics if APP_MEMORY_DIAGNOSTICS is set, else None."""
+        value = os.environ.get(ENV_VAR, "")
+        if not value or value == "0":
+            return None
+        try:
+            frames = max(1, int(value))
+        except ValueError:
+            frames = 1
+        diagnostics = cls(frames)
+        diagnostics.start()
+        return diagnostics
+
+    @property
+    def is_tracing(self) -> bool:
+        """Whether tracemalloc is tracing allocations."""
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Start tracing allocations and take the baseline snapshot."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info("Memory diagnostics started, recording %d frame(s)",
+                        self.frames)
+        self.take_snapshot()
+
+    def stop(self):
+        """Stop tracing and drop the snapshots."""
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        """Snapshot the traced allocations, excluding tracemalloc's own."""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        self._snapshot = snapshot
+        return snapshot
+
+    def report(self, limit: int = TOP_LIMIT) -> str:
+        """Log a report and make the new snapshot the next baseline.
+
+        Tracing is started first if needed, in which case the report has
+        no allocation sites yet.
+
+        Returns
+        -------
+        str
+            The report, as written to the log.
+
+        """
+        if not self.is_tracing or self._snapshot is None:
+            self.start()
+        previous = self._snapshot
+        snapshot = self.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        lines = ["Memory report",
+                 f"  RSS: {format_bytes(process_rss())}",
+                 f"  Traced Python memory: {format_bytes(current)} "
+                 f"(peak {format_bytes(peak)})"]
+
+        lines.append(f"  Top {limit} allocation sites since the last "
+                     "snapshot:")
+        stats = snapshot.compare_to(previous, "traceback")
+        for stat in stats[:limit]:
+            # Most recent call first, then its callers
+            frames = list(reversed(stat.traceback))
+            lines.append(f"    {format_bytes(stat.size_diff):>12} "
+                         f"{stat.count_diff:+8d} blocks  "
+                         f"{frames[0].filename}:{frames[0].lineno}")
+            for frame in frames[1:]:
+                lines.append(f"{'':30}called from "
+                             f"{frame.filename}:{frame.lineno}")
+
+        counts = qobject_counts()
+        lines.append(f"  Live Qt objects: {sum(counts.values())}, top "
+                     f"{limit} classes:")
+        for name, count in counts.most_common(limit):
+            change = count - self._qobject_counts.get(name, 0)
+            lines.append(f"    {count:8d} ({change:+d})  {name}")
+        self._qobject_counts = counts
+
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
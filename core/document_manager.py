@@ -0,0 +1,403 @@
+"""
+document_manager.py
+
+Open documents, with their decoded data held within a memory budget.
+
+Every opened file gets a lightweight Document handle that stays valid while
+the file is open. The decoded data behind it, i.e. a QImage for the image
+formats Qt reads and the raw bytes of any other file, is what takes the
+memory. Once the data of all documents exceeds the budget, the data of the
+least recently used documents is evicted, never that of the active one.
+An evicted document keeps its handle and is decoded again the next time
+its data is asked for.
+
+Given a task scheduler, `open_in_background` decodes on its "documents"
+category, so that a large file does not block the UI; `loaded` is emitted
+once the data is in. Non-image files of MAP_THRESHOLD_BYTES or more are
+memory-mapped rather than read: the OS pages them in as they are used and
+drops the pages under pressure, so they do not count against the budget.
+Given a process pool as well, images are decoded in its worker processes
+instead, and handed over through shared memory.
+
+The data must not be kept beyond its use, e.g. by a widget, or evicting it
+frees nothing.
+
+Usage:
+    documents = DocumentManager(budget_bytes=512 * 1024 * 1024,
+                                task_scheduler=task_scheduler,
+                                process_pool=process_pool)
+    documents.memory_changed.connect(on_memory_changed)  # (used, budget)
+    document = documents.open(path)     # Becomes the active document
+    documents.open_in_background(path)  # Same, decoded on a thread
+    image = document.data               # Reloaded if it was evicted
+    documents.close(path)
+"""
+
+import collections
+import mmap
+import os
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImageReader
+
+from core.logger import logger
+from core.process_pool import SharedImage, decode_image
+from core.task_scheduler import Priority
+from core.thumbnail_cache import is_image_file
+
+MIB = 1024 * 1024
+TASK_CATEGORY = "documents"
+# Non-image files from this size on are mapped instead of read
+MAP_THRESHOLD_BYTES = 4 * MIB
+
+
+def load_document_data(filepath: str, is_image: bool = None) -> tuple:
+    """Decode a document's file.
+
+    Parameters
+    ----------
+    filepath : str
+        File of the document.
+    is_image : bool, optional
+        Whether to decode the file as an image, by default by its suffix.
+        Decide it on the GUI thread for tasks, as the first lookup of the
+        image formats loads Qt's plugins.
+
+    Returns
+    -------
+    tuple
+        (data, bytes held by it), the data being a QImage for images, a
+        read-only mmap of large files, holding 0 bytes, and the file's
+        bytes otherwise.
+
+    Raises
+    ------
+    OSError
+        If the file cannot be read or decoded.
+
+    """
+    if is_image is None:
+        is_image = is_image_file(filepath)
+    if is_image:
+        reader = QImageReader(filepath)
+        reader.setAutoTransform(True)
+        image = reader.read()
+        if image.isNull():
+            raise OSError(f"Could not decode {filepath}: "
+                          f"{reader.errorString()}")
+        return image, image.sizeInBytes()
+    with open(filepath, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size >= MAP_THRESHOLD_BYTES:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), 0
+        data = file.read()
+    return data, len(data)
+
+
+class Document:
+    """Handle of an open document, valid until the document is closed.
+
+    Parameters
+    ----------
+    filepath : str
+        File of the document.
+    manager : DocumentManager
+        Manager that loads and evicts the document's data.
+
+    """
+
+    def __init__(self, filepath: str, manager):
+        self.filepath = filepath
+        # Bytes held by the decoded data, 0 while evicted
+        self.nbytes = 0
+        # Times the data was decoded, more than once if it was evicted
+        self.loads = 0
+        self._data = None
+        self._manager = manager
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the decoded data is in memory."""
+        return self._data is not None
+
+    @property
+    def data(self):
+        """The decoded data, reloaded from the file if it was evicted.
+
+        Raises
+        ------
+        OSError
+            If the data has to be reloaded and the file cannot be read.
+
+        """
+        return self._manager.data(self.filepath)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "evicted"
+        return f"<Document {self.filepath!r} {state}>"
+
+
+def _adopt_shared_image(shared: SharedImage) -> tuple:
+    """Copy an image out of the shared memory of a worker and free it."""
+    with shared:
+        image = shared.image.copy()
+    return image, image.sizeInBytes()
+
+
+class DocumentManager(QObject):
+    """Open documents whose decoded data is evicted under a memory budget.
+
+    Parameters
+    ----------
+    budget_bytes : int
+        Memory the decoded data of all documents may take. The active
+        document is kept even if it alone exceeds the budget.
+    task_scheduler : TaskScheduler, optional
+        Scheduler decoding in the background, on its TASK_CATEGORY
+        category. Without one, documents are decoded on the calling thread.
+    process_pool : ProcessPoolService, optional
+        Pool decoding the images opened in the background, together with a
+        task scheduler, which decodes the other files.
+    parent : QObject, optional
+        Parent of the manager.
+
+    """
+
+    # Bytes held by the documents' decoded data, and the budget
+    memory_changed = pyqtSignal("qint64", "qint64")
+    # Path of a document whose data was evicted
+    evicted = pyqtSignal(str)
+    # Path of a document whose data was decoded in the background
+    loaded = pyqtSignal(str)
+    # Path of a document closed as its file could not be decoded, and why
+    load_failed = pyqtSignal(str, str)
+
+    DEFAULT_BUDGET_BYTES = 512 * MIB
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES,
+                 task_scheduler=None, process_pool=None, parent=None):
+        super().__init__(parent)
+        self._budget_bytes = budget_bytes
+        self._task_scheduler = task_scheduler
+        self._process_pool = process_pool
+        # path: Document, least recently used first
+        self._documents = collections.OrderedDict()
+        # path: TaskHandle or ProcessTask of the documents being decoded
+        self._loading = {}
+        self.active = None
+        self.memory_used = 0
+
+    @property
+    def budget_bytes(self) -> int:
+        """Memory the decoded data may take, evicting at once if lowered."""
+        return self._budget_bytes
+
+    @budget_bytes.setter
+    def budget_bytes(self, budget_bytes: int):
+        self._budget_bytes = budget_bytes
+        self._enforce_budget()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, filepath) -> bool:
+        return filepath in self._documents
+
+    def documents(self) -> list:
+        """Handles of the open documents, least recently used first."""
+        return list(self._documents.values())
+
+    def get(self, filepath: str):
+        """Handle of an open document, None if it is not open."""
+        return self._documents.get(filepath)
+
+    def open(self, filepath: str) -> Document:
+        """Open a document, or return it if it is open, and activate it.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be read or decoded.
+
+        """
+        document = self._documents.get(filepath)
+        if document is None:
+            document = Document(filepath, self)
+            self._load(document)
+            self._documents[filepath] = document
+        self.activate(filepath)
+        return document
+
+    def open_in_background(self, filepath: str) -> Document:
+        """Open a document and activate it, decoding it in the background.
+
+        The handle is returned at once, its data follows with `loaded`. If
+        the file cannot be decoded, the document is closed again and
+        `load_failed` emitted. Without a task scheduler this is `open`.
+
+        Raises
+        ------
+        OSError
+            Without a task scheduler, if the file cannot be decoded.
+
+        """
+        if self._task_scheduler is None:
+            return self.open(filepath)
+        document = self._documents.get(filepath)
+        if document is None:
+            document = Document(filepath, self)
+            self._documents[filepath] = document
+        self._documents.move_to_end(filepath)
+        self.active = filepath
+        self._load_in_background(document)
+        return document
+
+    def is_loading(self, filepath: str) -> bool:
+        """Whether a document is being decoded in the background."""
+        return filepath in self._loading
+
+    def activate(self, filepath: str):
+        """Make an open document the active one, reloading its data.
+
+        With a task scheduler, evicted data is reloaded in the background.
+
+        Raises
+        ------
+        KeyError
+            If the document is not open.
+
+        """
+        if filepath not in self._documents:
+            raise KeyError(filepath)
+        self.active = filepath
+        if self._task_scheduler is None:
+            self.data(filepath)
+        else:
+            self._documents.move_to_end(filepath)
+            self._load_in_background(self._documents[filepath])
+
+    def data(self, filepath: str):
+        """Decoded data of an open document, reloaded if it was evicted.
+
+        Raises
+        ------
+        KeyError
+            If the document is not open.
+        OSError
+            If the data has to be reloaded and the file cannot be read.
+
+        """
+        document = self._documents[filepath]
+        if not document.is_loaded:
+            self._load(document)
+        self._documents.move_to_end(filepath)
+        # Held by the caller anyway, so evict the others
+        data = document._data  # pylint: disable=protected-access
+        self._enforce_budget(keep=filepath)
+        return data
+
+    def close(self, filepath: str):
+        """Close a document and free its data.
+
+        The most recently used of the others becomes the active one.
+        """
+        document = self._documents.pop(filepath, None)
+        if document is None:
+            return
+        self._cancel_loading(filepath)
+        self._unload(document)
+        if self.active == filepath:
+            self.active = next(reversed(self._documents), None)
+        self.memory_changed.emit(self.memory_used, self._budget_bytes)
+
+    def close_all(self):
+        """Close every document."""
+        for filepath, document in list(self._documents.items()):
+            self._cancel_loading(filepath)
+            self._unload(document)
+        self._documents.clear()
+        self.active = None
+        self.memory_changed.emit(self.memory_used, self._budget_bytes)
+
+    # pylint: disable=protected-access
+    def _load(self, document):
+        """Decode a document's data and account for it."""
+        document._data, document.nbytes = load_document_data(
+            document.filepath)
+        document.loads += 1
+        self.memory_used += document.nbytes
+
+    def _unload(self, document):
+        """Drop a document's data."""
+        self.memory_used -= document.nbytes
+        document._data = None
+        document.nbytes = 0
+
+    def _load_in_background(self, document):
+        """Decode a document's data on the task scheduler, unless it is in."""
+        filepath = document.filepath
+        if document.is_loaded or filepath in self._loading:
+            return
+        is_image = is_image_file(filepath)
+        if is_image and self._process_pool is not None:
+            handle = self._process_pool.submit(decode_image, filepath)
+            handle.finished.connect(
+                lambda shared, path=filepath: self._on_loaded(
+                    path, _adopt_shared_image(shared)))
+        else:
+            handle = self._task_scheduler.submit(
+                load_document_data, filepath, is_image,
+                key=(TASK_CATEGORY, filepath),
+                category=TASK_CATEGORY, priority=Priority.HIGH)
+            handle.finished.connect(
+                lambda result, path=filepath: self._on_loaded(path, result))
+        self._loading[filepath] = handle
+        handle.failed.connect(
+            lambda error, path=filepath: self._on_load_failed(path, error))
+        handle.cancelled.connect(
+            lambda path=filepath: self._forget_loading(path, handle))
+
+    def _on_loaded(self, filepath, result):
+        """Adopt data decoded in the background."""
+        self._loading.pop(filepath, None)
+        document = self._documents.get(filepath)
+        # Closed meanwhile, or read through `data`
+        if document is None or document.is_loaded:
+            return
+        document._data, document.nbytes = result
+        document.loads += 1
+        self.memory_used += document.nbytes
+        self._enforce_budget(keep=filepath)
+        self.loaded.emit(filepath)
+
+    def _on_load_failed(self, filepath, error):
+        """Close a document whose file could not be decoded."""
+        self._loading.pop(filepath, None)
+        logger.warning("Could not load %s: %s", filepath, error)
+        self.close(filepath)
+        self.load_failed.emit(filepath, str(error))
+
+    def _forget_loading(self, filepath, handle):
+        """Drop a cancelled load, unless the file was reopened meanwhile."""
+        if self._loading.get(filepath) is handle:
+            del self._loading[filepath]
+
+    def _cancel_loading(self, filepath):
+        handle = self._loading.pop(filepath, None)
+        if handle is not None:
+            handle.cancel()
+    # pylint: enable=protected-access
+
+    def _enforce_budget(self, keep: str = None):
+        """Evict the least recently used data until within the budget."""
+        for filepath, document in list(self._documents.items()):
+            if self.memory_used <= self._budget_bytes:
+                break
+            if filepath in (keep, self.active) or not document.is_loaded:
+                continue
+            nbytes = document.nbytes
+            self._unload(document)
+            logger.info("Evicted %s (%.1f MiB), documents hold %.1f MiB",
+                        filepath, nbytes / MIB, self.memory_used / MIB)
+            self.evicted.emit(filepath)
+        self.memory_changed.emit(self.memory_used, self._budget_bytes)
@@ -0,0 +1,412 @@
+"""
+file_history.py
+
+Unbounded history of opened files with an index for quick-open searches.
+
+The "Open Recent" menu shows a handful of files from the configuration; this
+history keeps every file ever opened, in its own file next to the
+configuration, so it can grow to hundreds of thousands of entries.
+
+Storage:
+    An append-only text file. Every line reads "last_open<TAB>count<TAB>path"
+    and means "opened `count` times, last at `last_open`". Opening a file
+    appends a line; loading sums the counts per path. Paths containing line
+    breaks are not recorded. Once the file holds many more lines than
+    paths, the background load rewrites it with one line per path.
+
+Ranking:
+    Entries are ranked by "frecency": the number of opens, decayed by the
+    time since the last one with a half-life of HALF_LIFE_DAYS. As the decay
+    is exponential, the ordering does not change while time passes, so the
+    entries are kept sorted by a static key and only re-sorted when a file
+    is opened.
+
+Search:
+    The query is split into terms that must all occur in the path, case
+    insensitively. The trigrams of the terms select candidates through an
+    inverted index; one or two letter queries use an index of file name
+    prefixes. The candidates are then verified and the best ranked returned,
+    scanning in rank order when there are many.
+
+Usage:
+    history = FileHistory(os.path.join(config_dir, "file_history.txt"))
+    history.record("/path/to/file.png")
+    history.search("file png")      # Best ranked paths, best first
+"""
+
+import bisect
+import heapq
+import math
+import os
+import time
+from array import array
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from core.logger import logger
+
+HALF_LIFE_DAYS = 14
+
+
+def trigrams(text: str) -> set:
+    """Distinct three-letter substrings of `text`."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def rank_key(count: int, last_open: float) -> float:
+    """Static ranking key, higher is better.
+
+    log2(frecency) up to a constant, where frecency is
+    `count * 0.5 ** (age / half-life)`.
+    """
+    return math.log2(count) + last_open / (HALF_LIFE_DAYS * 86400)
+
+
+class HistoryIndex:
+    """In-memory history entries and their search indexes.
+
+    Plain Python data, so it can be built on another thread and handed over.
+    """
+
+    # Candidates above which the ranked entries are scanned instead of
+    # sorting the candidates
+    SCAN_THRESHOLD = 2000
+    # Best ranked entries checked before narrowing down common trigrams,
+    # in chunks of SCAN_CHUNK
+    SCAN_LIMIT = 5000
+    SCAN_CHUNK = 500
+
+    def __init__(self):
+        self.paths = []
+        self.counts = []
+        self.last_opens = []
+        self._search_texts = []
+        self._keys = []
+        self._ids = {}
+        self._trigrams = {}
+        self._prefixes = {}
+        # Entry ids, best ranked first
+        self._ranked = []
+        # Lines of the history file the index was read from
+        self.line_count = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, path) -> bool:
+        return path in self._ids
+
+    def add(self, path: str, last_open: float, count: int = 1):
+        """Record `count` opens of `path`, the last at `last_open`."""
+        entry_id = self._ids.get(path)
+        if entry_id is None:
+            self._add_entry(path, last_open, count)
+            return
+        self._ranked.pop(self._position(entry_id))
+        self.counts[entry_id] += count
+        self.last_opens[entry_id] = max(self.last_opens[entry_id], last_open)
+        self._keys[entry_id] = rank_key(self.counts[entry_id],
+                                        self.last_opens[entry_id])
+        self._insert_ranked(entry_id)
+
+    def add_many(self, entries):
+        """Add (path, last_open, count) tuples, faster than `add`."""
+        for path, last_open, count in entries:
+            entry_id = self._ids.get(path)
+            if entry_id is None:
+                self._add_entry(path, last_open, count, ranked=False)
+            else:
+                self.counts[entry_id] += count
+                self.last_opens[entry_id] = max(self.last_opens[entry_id],
+                                                last_open)
+                self._keys[entry_id] = rank_key(self.counts[entry_id],
+                                                self.last_opens[entry_id])
+        self._ranked = sorted(range(len(self.paths)),
+                              key=self._keys.__getitem__, reverse=True)
+
+    def entries(self):
+        """(path, last_open, count) of every entry."""
+        return zip(self.paths, self.last_opens, self.counts)
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Paths containing every term of `query`, best ranked first.
+
+        A query of only one or two letter terms matches file names starting
+        with the first term.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return [self.paths[i] for i in self._ranked[:limit]]
+
+        grams = set().union(*(trigrams(term) for term in terms))
+        if not grams:
+            prefix = os.path.basename(terms[0])[:2]
+            candidates = self._prefixes.get(prefix, set())
+            if len(candidates) <= self.SCAN_THRESHOLD:
+                return self._best(candidates, terms, limit)
+            return self._scan(terms, limit, candidates)
+        postings = sorted((self._trigrams.get(gram, ()) for gram in grams),
+                          key=len)
+        if len(postings[0]) <= self.SCAN_THRESHOLD:
+            return self._best(postings[0], terms, limit)
+
+        # Common trigrams: the best ranked matches are usually found early
+        results = self._scan(terms, limit, stop=self.SCAN_LIMIT)
+        if len(results) == limit:
+            return results
+        # The terms are rare together, check the entries in the two
+        # smallest postings
+        candidates = postings[0]
+        if len(postings) > 1:
+            candidates = set(candidates).intersection(postings[1])
+        return self._best(candidates, terms, limit)
+
+    def _matches(self, ids, terms) -> list:
+        """The ids whose entries contain every term."""
+        texts = self._search_texts
+        for term in terms:
+            ids = [i for i in ids if term in texts[i]]
+        return ids
+
+    def _best(self, candidates, terms, limit) -> list:
+        """Best ranked of the candidates that contain every term."""
+        best = heapq.nlargest(limit, self._matches(candidates, terms),
+                              key=self._keys.__getitem__)
+        return [self.paths[i] for i in best]
+
+    def _scan(self, terms, limit, candidates=None, stop=None) -> list:
+        """Matches in rank order, among the first `stop` ranked entries."""
+        results = []
+        stop = len(self._ranked) if stop is None else stop
+        for start in range(0, stop, self.SCAN_CHUNK):
+            chunk = self._ranked[start:min(start + self.SCAN_CHUNK, stop)]
+            if candidates is not None:
+                chunk = [i for i in chunk if i in candidates]
+            results.extend(self._matches(chunk, terms))
+            if len(results) >= limit:
+                break
+        return [self.paths[i] for i in results[:limit]]
+
+    def _add_entry(self, path, last_open, count, ranked=True):
+        """Append a new entry and index it."""
+        entry_id = len(self.paths)
+        text = path.lower()
+        self._ids[path] = entry_id
+        self.paths.append(path)
+        self.counts.append(count)
+        self.last_opens.append(last_open)
+        self._search_texts.append(text)
+        self._keys.append(rank_key(count, last_open))
+        postings = self._trigrams
+        for gram in trigrams(text):
+            try:
+                postings[gram].append(entry_id)
+            except KeyError:
+                # Arrays of ids take half the memory of lists
+                postings[gram] = array("I", (entry_id,))
+        name = os.path.basename(text)
+        for prefix in {name[:1], name[:2]}:
+            self._prefixes.setdefault(prefix, set()).add(entry_id)
+        if ranked:
+            self._insert_ranked(entry_id)
+
+    def _insert_ranked(self, entry_id):
+        """Insert an entry into the ranked list at its position."""
+        key = self._keys[entry_id]
+        position = bisect.bisect_left(self._ranked, -key,
+                                      key=lambda i: -self._keys[i])
+        self._ranked.insert(position, entry_id)
+
+    def _position(self, entry_id) -> int:
+        """Position of an entry in the ranked list."""
+        key = self._keys[entry_id]
+        position = bisect.bisect_left(self._ranked, -key,
+                                      key=lambda i: -self._keys[i])
+        return self._ranked.index(entry_id, position)
+
+
+def read_history(filepath: str) -> HistoryIndex:
+    """Read a history file into a new index; missing files are empty.
+
+    Malformed lines, e.g. one cut short by a crash, are skipped.
+    """
+    entries = []
+    skipped = 0
+    try:
+        with open(filepath, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    last_open, count, path = line.rstrip("\n").split("\t", 2)
+                    entries.append((path, float(last_open), int(count)))
+                except ValueError:
+                    skipped += 1
+    except FileNotFoundError:
+        pass
+    if skipped:
+        logger.warning("Skipped %d malformed lines of %s", skipped, filepath)
+    index = HistoryIndex()
+    index.add_many(entries)
+    index.line_count = len(entries) + skipped
+    return index
+
+
+def write_history(filepath: str, index: HistoryIndex):
+    """Replace a history file with one line per entry of an index.
+
+    Raises
+    ------
+    OSError, UnicodeEncodeError
+        If the file cannot be written; it is then left as it was.
+
+    """
+    temp_path = f"{filepath}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        for path, last_open, count in index.entries():
+            file.write(f"{last_open:.0f}\t{count}\t{path}\n")
+    os.replace(temp_path, filepath)
+    index.line_count = len(index)
+
+
+def load_history(filepath: str, compact_factor: int,
+                 compact_min_lines: int) -> HistoryIndex:
+    """Read a history file, compacting it if it is long (task side).
+
+    The file is rewritten with one line per path once it has at least
+    `compact_min_lines` lines and `compact_factor` times more lines than
+    paths.
+    """
+    index = read_history(filepath)
+    if index.line_count >= max(compact_min_lines,
+                               compact_factor * len(index)):
+        try:
+            write_history(filepath, index)
+        except (OSError, UnicodeEncodeError):
+            logger.exception("Could not compact the file history")
+    return index
+
+
+class FileHistory(QObject):
+    """Persistent, unbounded history of opened files.
+
+    The history file is read on first use, or in the background through
+    `load_in_background`, which also compacts it. Files recorded while it
+    is read in the background are written to it once the reading finished.
+    A history file that cannot be read leaves the history empty for the
+    session, and is not rewritten.
+
+    Parameters
+    ----------
+    filepath : str
+        History file, created on the first recorded file.
+    parent : QObject, optional
+        Parent of the history.
+
+    """
+
+    # Emitted once the history file has been read
+    loaded = pyqtSignal()
+
+    # Rewrite the file once it has this many times more lines than paths
+    COMPACT_FACTOR = 2
+    COMPACT_MIN_LINES = 1000
+
+    def __init__(self, filepath: str, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self._index = None
+        self._pending = []
+        self._loading = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the history file has been read."""
+        return self._index is not None
+
+    @property
+    def is_loading(self) -> bool:
+        """Whether the history file is being read in the background."""
+        return self._loading is not None
+
+    def __len__(self) -> int:
+        return len(self._ensure_loaded())
+
+    def record(self, filepath: str, timestamp: float = None):
+        """Record that a file was opened.
+
+        Paths containing line breaks are logged and skipped, as they would
+        break the lines of the history file.
+        """
+        if "\n" in filepath or "\r" in filepath:
+            logger.warning("Not recording %r in the file history: it "
+                           "contains a line break", filepath)
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._loading is not None:
+            self._pending.append((filepath, timestamp, 1))
+            return
+        self._append([(filepath, timestamp, 1)])
+        if self._index is not None:
+            self._index.add(filepath, timestamp)
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Best ranked paths containing every term of `query`."""
+        return self._ensure_loaded().search(query, limit)
+
+    def load(self):
+        """Read the history file now, if it has not been read yet."""
+        self._ensure_loaded()
+
+    def load_in_background(self, task_scheduler):
+        """Read and compact the history file on the task scheduler."""
+        if self._index is not None or self._loading is not None:
+            return
+        self._loading = task_scheduler.submit(
+            load_history, self.filepath, self.COMPACT_FACTOR,
+            self.COMPACT_MIN_LINES, key=("file_history", self.filepath),
+            category="io")
+        self._loading.finished.connect(self._adopt)
+        self._loading.failed.connect(self._on_load_failed)
+        self._loading.cancelled.connect(self._on_load_cancelled)
+
+    def _ensure_loaded(self) -> HistoryIndex:
+        """The index, reading the history file first if needed."""
+        if self._index is None:
+            try:
+                self._adopt(read_history(self.filepath))
+            except (OSError, UnicodeDecodeError) as error:
+                self._on_load_failed(error)
+        return self._index
+
+    def _on_load_failed(self, error):
+        """Start from an empty index if the history file cannot be read."""
+        logger.error("Could not read the file history %s: %s", self.filepath,
+                     error)
+        self._adopt(HistoryIndex())
+
+    def _on_load_cancelled(self):
+        """Read the history file now instead."""
+        self._loading = None
+        self._ensure_loaded()
+
+    def _adopt(self, index):
+        """Use an index read from the history file."""
+        self._loading = None
+        if self._index is not None:
+            return
+        self._index = index
+        logger.info("Loaded %d file history entries", len(index))
+        if self._pending:
+            index.add_many(self._pending)
+            self._append(self._pending)
+            self._pending = []
+        self.loaded.emit()
+
+    def _append(self, entries):
+        """Append (path, last_open, count) lines to the history file."""
+        try:
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            with open(self.filepath, "a", encoding="utf-8") as file:
+                for path, last_open, count in entries:
+                    file.write(f"{last_open:.0f}\t{count}\t{path}\n")
+        except (OSError, UnicodeEncodeError):
+            logger.exception("Could not write the file history")
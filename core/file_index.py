@@ -0,0 +1,289 @@
+"""
+file_index.py
+
+Persistent index of what is known about the opened files.
+
+Tooltips, existence checks and metadata displays would otherwise stat or
+read the files again, which is slow on network shares. The index keeps a
+row per file in an SQLite database next to the configuration, keyed by
+(path, size, mtime): the size, the image dimensions, the MIME type, a hash
+of the content and the time the file was last opened. A file that changed
+gets a new row in place of its old one.
+
+Rows are written on the task scheduler when a file is opened, and the
+content is only read again if the size or mtime changed. Reading the index
+never touches the files, so the UI looks up many paths with one query,
+e.g. every entry of a menu. What it returns is what was true when the file
+was last opened.
+
+Every thread uses its own connection, and the database is in WAL mode so
+that the GUI thread reads while a task writes.
+
+Usage:
+    index = FileIndex(os.path.join(config_dir, "file_index.sqlite3"),
+                      task_scheduler)
+    index.info_ready.connect(on_info)   # (FileInfo)
+    index.record(path)                  # In the background
+    infos = index.lookup(paths)         # {path: FileInfo}, indexed only
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import NamedTuple
+
+from PyQt6.QtCore import QMimeDatabase, QObject, pyqtSignal
+from PyQt6.QtGui import QImageReader
+
+from core.logger import logger
+from core.task_scheduler import Priority
+from core.thumbnail_cache import is_image_file
+
+TASK_CATEGORY = "file_index"
+SCHEMA_VERSION = 1
+# Bytes read at a time when hashing
+HASH_CHUNK_BYTES = 1024 * 1024
+# Paths per query of a bulk lookup, below SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    mime_type TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    last_open REAL NOT NULL,
+    PRIMARY KEY (path, size, mtime_ns)
+) WITHOUT ROWID
+"""
+_COLUMNS = ("path, size, mtime_ns, width, height, mime_type, content_hash, "
+            "last_open")
+
+
+class FileInfo(NamedTuple):
+    """What the index knows about a file."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    # Pixels of images, None for other files
+    width: int
+    height: int
+    mime_type: str
+    # SHA-256 of the content, hexadecimal
+    content_hash: str
+    # time.time() of the last open
+    last_open: float
+
+
+def _schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open the index database, creating its table if needed."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    if _schema_version(connection) != SCHEMA_VERSION:
+        # sqlite3 starts no transaction for DDL, so take the write lock
+        # first: the GUI and a task may both open a new database, and
+        # whichever comes second must not drop what the first wrote
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if _schema_version(connection) != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS files")
+                connection.execute(_SCHEMA)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return connection
+
+
+def hash_file(filepath: str) -> str:
+    """SHA-256 of a file's content, hexadecimal."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_file(filepath: str, stat=None, last_open: float = None,
+              is_image: bool = None) -> FileInfo:
+    """Read what the index holds about a file from the file itself.
+
+    Images are only read up to their header for the dimensions. Whether
+    the file is one is decided by its suffix, unless `is_image` is given;
+    tasks get it from the GUI thread, as the first lookup of the image
+    formats loads Qt's plugins.
+
+    Raises
+    ------
+    OSError
+        If the file cannot be read.
+
+    """
+    stat = stat or os.stat(filepath)
+    width = height = None
+    if is_image is None:
+        is_image = is_image_file(filepath)
+    if is_image:
+        size = QImageReader(filepath).size()
+        if size.isValid():
+            width, height = size.width(), size.height()
+    mime_type = QMimeDatabase().mimeTypeForFile(filepath).name()
+    return FileInfo(filepath, stat.st_size, stat.st_mtime_ns, width, height,
+                    mime_type, hash_file(filepath),
+                    time.time() if last_open is None else last_open)
+
+
+def index_file(db_path: str, filepath: str, last_open: float,
+               is_image: bool):
+    """Index an opened file (task side).
+
+    The content is only scanned if the index has no row of the file's
+    current size and mtime; otherwise the last open time is updated.
+    `is_image` is passed on to scan_file.
+
+    Returns
+    -------
+    FileInfo or None
+        The file's row, None if the file cannot be read.
+
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    connection = connect(db_path)
+    try:
+        with connection:
+            row = connection.execute(
+                f"SELECT {_COLUMNS} FROM files WHERE path = ? AND size = ? "
+                "AND mtime_ns = ?",
+                (filepath, stat.st_size, stat.st_mtime_ns)).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE files SET last_open = ? WHERE path = ? AND "
+                    "size = ? AND mtime_ns = ?",
+                    (last_open, filepath, stat.st_size, stat.st_mtime_ns))
+                return FileInfo(*row)._replace(last_open=last_open)
+        try:
+            info = scan_file(filepath, stat, last_open, is_image)
+        except OSError as error:
+            logger.debug("Could not index %s: %s", filepath, error)
+            return None
+        with connection:
+            # The rows of earlier versions of the file are stale
+            connection.execute("DELETE FROM files WHERE path = ?",
+                               (filepath,))
+            connection.execute(
+                f"INSERT INTO files ({_COLUMNS}) VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?)", info)
+        return info
+    finally:
+        connection.close()
+
+
+class FileIndex(QObject):
+    """SQLite index of the opened files, written in the background.
+
+    Parameters
+    ----------
+    db_path : str
+        Database file, created on first use.
+    task_scheduler : TaskScheduler
+        Scheduler running the indexing, on its TASK_CATEGORY category.
+    parent : QObject, optional
+        Parent of the index.
+
+    """
+
+    # FileInfo of a file that was indexed or opened again
+    info_ready = pyqtSignal(object)
+
+    def __init__(self, db_path: str, task_scheduler, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self._task_scheduler = task_scheduler
+        # The GUI thread's connection, opened on first lookup
+        self._connection = None
+        # path: TaskHandle of the files being indexed
+        self._requests = {}
+
+    def record(self, filepath: str, timestamp: float = None,
+               priority: int = Priority.LOW):
+        """Index a file that was opened, in the background.
+
+        Emits info_ready with the file's row once it is written.
+        """
+        if filepath in self._requests:
+            return self._requests[filepath]
+        handle = self._task_scheduler.submit(
+            index_file, self.db_path, filepath,
+            time.time() if timestamp is None else timestamp,
+            is_image_file(filepath),
+            key=(TASK_CATEGORY, self.db_path, filepath),
+            category=TASK_CATEGORY, priority=priority)
+        self._requests[filepath] = handle
+        handle.finished.connect(
+            lambda info, path=filepath: self._on_indexed(path, info))
+        handle.failed.connect(
+            lambda error, path=filepath: self._on_failed(path, error))
+        handle.cancelled.connect(
+            lambda path=filepath: self._requests.pop(path, None))
+        return handle
+
+    def lookup(self, filepaths) -> dict:
+        """Rows of many files, without touching the files.
+
+        Returns
+        -------
+        dict
+            path: FileInfo of the files in the index.
+
+        """
+        filepaths = list(dict.fromkeys(filepaths))
+        infos = {}
+        try:
+            connection = self._connect()
+            for start in range(0, len(filepaths), LOOKUP_CHUNK):
+                chunk = filepaths[start:start + LOOKUP_CHUNK]
+                rows = connection.execute(
+                    f"SELECT {_COLUMNS} FROM files WHERE path IN "
+                    f"({', '.join('?' * len(chunk))})", chunk)
+                for row in rows:
+                    info = FileInfo(*row)
+                    known = infos.get(info.path)
+                    if known is None or info.last_open > known.last_open:
+                        infos[info.path] = info
+        except sqlite3.Error:
+            logger.exception("Could not read the file index")
+        return infos
+
+    def get(self, filepath: str):
+        """Row of a file, None if it is not in the index."""
+        return self.lookup([filepath]).get(filepath)
+
+    def close(self):
+        """Close the GUI thread's connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect(self.db_path)
+        return self._connection
+
+    def _on_indexed(self, filepath, info):
+        self._requests.pop(filepath, None)
+        if info is not None:
+            self.info_ready.emit(info)
+
+    def _on_failed(self, filepath, error):
+        self._requests.pop(filepath, None)
+        logger.warning("Could not index %s: %s", filepath, error)
@@ -0,0 +1,330 @@
+"""
+icon_registry.py
+
+Rasterised icons, rendered once per (icon, tint, size, device pixel ratio).
+
+Building a QIcon or QPixmap from an SVG file parses and renders it again in
+every place that does so. The registry is the one place icons come from:
+    - `pixmap` renders an icon at a logical size for a device pixel ratio
+      and keeps the result in QPixmapCache, within its memory budget.
+    - `icon` returns a QIcon that asks the registry for the exact size and
+      ratio Qt paints it at, so an icon moved to a screen with another
+      ratio is rendered once for that ratio and never again for the old one.
+    - `write_pixmaps` renders an icon to PNG files for the stylesheet, one
+      per ratio of the connected screens ("name.png", "name@2x.png", ...).
+      Qt picks the file matching the screen, so it no longer rasterises
+      SVGs whenever a widget is polished.
+A tint maps keywords of an SVG template to colors, e.g. the theme colors
+of the stylesheet icons.
+
+Usage:
+    from core.icon_registry import icon_registry
+
+    window.setWindowIcon(icon_registry().icon("icons/application_icon.svg"))
+    label.setPixmap(icon_registry().pixmap(
+        "icons/application_icon.svg", QSize(100, 100),
+        label.devicePixelRatioF()))
+"""
+
+import math
+import os
+
+from PyQt6.QtCore import QByteArray, QObject, QRectF, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import (QGuiApplication, QIcon, QIconEngine, QImage,
+                         QPainter, QPixmap, QPixmapCache)
+from PyQt6.QtSvg import QSvgRenderer
+
+from core.logger import logger
+from core.metrics import CacheMetrics
+from core.resource_loader import read_text, resource_path
+
+_registry = None
+_CACHE = CacheMetrics("icons")
+
+
+def icon_registry():
+    """The registry shared by every window and dialog."""
+    global _registry  # pylint: disable=global-statement
+    if _registry is None:
+        _registry = IconRegistry()
+    return _registry
+
+
+def _tint_key(tint) -> tuple:
+    """Hashable, ordered form of a tint mapping."""
+    return tuple(sorted(dict(tint).items())) if tint else ()
+
+
+class IconRegistry(QObject):
+    """Render icons from their resources once and share the results.
+
+    Icons are named by their path relative to `resources/`. Only SVG icons
+    are scalable; other images are scaled smoothly from the file.
+    """
+
+    # The ratios of the connected screens changed, see `pixel_ratios`
+    pixel_ratios_changed = pyqtSignal()
+
+    # Budget of QPixmapCache in KiB; raised to it if Qt's default is lower
+    CACHE_LIMIT_KB = 20 * 1024
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # name: SVG source with the tint keywords still in it
+        self._sources = {}
+        self._default_sizes = {}
+        # name: QPixmapCache keys of its renders
+        self._cache_keys = {}
+        # PNG path: (name, tint, size) for the files written for stylesheets
+        self._written = {}
+        self._ratios = None
+        self._watched_screens = set()
+        # Renders done, the cache hits are not counted
+        self.render_count = 0
+        if QPixmapCache.cacheLimit() < self.CACHE_LIMIT_KB:
+            QPixmapCache.setCacheLimit(self.CACHE_LIMIT_KB)
+
+    def default_size(self, name: str) -> QSize:
+        """Size of an icon as drawn by its author."""
+        if name not in self._default_sizes:
+            source = self._source(name)
+            if source is None:
+                size = QImage(resource_path(name)).size()
+            else:
+                size = QSvgRenderer(
+                    QByteArray(source.encode("utf-8"))).defaultSize()
+            self._default_sizes[name] = size
+        return QSize(self._default_sizes[name])
+
+    def pixmap(self, name: str, size: QSize = None,
+               device_pixel_ratio: float = 1.0, tint=None) -> QPixmap:
+        """Icon rendered at `size` logical pixels for a device pixel ratio.
+
+        Parameters
+        ----------
+        name : str
+            Icon path relative to `resources/`.
+        size : QSize, optional
+            Logical size, the icon's default size if omitted.
+        device_pixel_ratio : float
+            Ratio of the screen the pixmap is shown on.
+        tint : dict, optional
+            Keywords of the SVG source and the colors replacing them.
+
+        Returns
+        -------
+        QPixmap
+            Pixmap of `size * device_pixel_ratio` pixels, with that device
+            pixel ratio set. Null if the icon cannot be read.
+
+        """
+        size = self.default_size(name) if size is None else size
+        tint = _tint_key(tint)
+        key = (f"icon_registry:{name}:{tint}:{size.width()}x{size.height()}"
+               f"@{device_pixel_ratio:g}")
+        pixmap = QPixmapCache.find(key)
+        _CACHE.record(pixmap is not None)
+        if pixmap is not None:
+            return pixmap
+        pixmap = QPixmap.fromImage(
+            self._render(name, size, device_pixel_ratio, tint))
+        if not pixmap.isNull():
+            QPixmapCache.insert(key, pixmap)
+            self._cache_keys.setdefault(name, set()).add(key)
+        return pixmap
+
+    def icon(self, name: str, tint=None) -> QIcon:
+        """QIcon rendered by the registry at whatever size Qt needs."""
+        return QIcon(RegistryIconEngine(self, name, _tint_key(tint)))
+
+    def write_pixmaps(self, name: str, filepath: str, tint=None,
+                      size: QSize = None) -> str:
+        """Render an icon to a PNG file per ratio of the connected screens.
+
+        `filepath` gets the icon at ratio 1, "stem@Nx.png" next to it at
+        ratio N. Files already written for the same icon, tint and size are
+        left as they are.
+
+        Returns
+        -------
+        str
+            `filepath`, for the stylesheet's url().
+
+        """
+        size = self.default_size(name) if size is None else size
+        spec = (name, _tint_key(tint), QSize(size))
+        if self._written.get(filepath) != spec or \
+                not os.path.exists(filepath):
+            self._written[filepath] = spec
+            for ratio in self.pixel_ratios():
+                self._write_file(filepath, spec, ratio, overwrite=True)
+        return filepath
+
+    def pixel_ratios(self) -> list:
+        """Integer device pixel ratios to write stylesheet files for.
+
+        Fractional ratios are rounded up, as Qt picks the "@Nx" file of the
+        next integer ratio and scales it down.
+        """
+        self._watch_screens()
+        if self._ratios is None:
+            self._ratios = self._screen_ratios()
+        return self._ratios
+
+    def invalidate(self, name: str):
+        """Forget the renders of an icon whose resource changed."""
+        self._sources.pop(name, None)
+        self._default_sizes.pop(name, None)
+        for key in self._cache_keys.pop(name, ()):
+            QPixmapCache.remove(key)
+        for filepath, spec in list(self._written.items()):
+            if spec[0] == name:
+                del self._written[filepath]
+
+    def _source(self, name):
+        """SVG source of an icon, None if it is not an SVG."""
+        if not name.lower().endswith(".svg"):
+            return None
+        if name not in self._sources:
+            try:
+                self._sources[name] = read_text(resource_path(name))
+            except FileNotFoundError:
+                logger.warning("Icon %s not found", name)
+                self._sources[name] = ""
+        return self._sources[name]
+
+    def _render(self, name, size, device_pixel_ratio, tint) -> QImage:
+        """Rasterise an icon, the only place icons are rendered."""
+        self.render_count += 1
+        pixels = QSize(max(1, round(size.width() * device_pixel_ratio)),
+                       max(1, round(size.height() * device_pixel_ratio)))
+        source = self._source(name)
+        if source is None:
+            image = QImage(resource_path(name))
+            if image.isNull():
+                logger.warning("Could not read icon %s", name)
+                return image
+            image = image.scaled(pixels, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        else:
+            for keyword, color in tint:
+                source = source.replace(keyword, color)
+            renderer = QSvgRenderer(QByteArray(source.encode("utf-8")))
+            if not renderer.isValid():
+                logger.warning("Could not render icon %s", name)
+                return QImage()
+            image = QImage(pixels, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(image)
+            renderer.render(painter, QRectF(0, 0, pixels.width(),
+                                            pixels.height()))
+            painter.end()
+        image.setDevicePixelRatio(device_pixel_ratio)
+        return image
+
+    def _write_file(self, filepath, spec, ratio, overwrite=False):
+        """Write one ratio's PNG of a stylesheet icon."""
+        if ratio != 1:
+            stem, suffix = os.path.splitext(filepath)
+            filepath = f"{stem}@{ratio}x{suffix}"
+        if not overwrite and os.path.exists(filepath):
+            return
+        name, tint, size = spec
+        image = self._render(name, size, ratio, tint)
+        if image.isNull() or not image.save(filepath, "PNG"):
+            logger.warning("Could not write icon %s", filepath)
+
+    def _screen_ratios(self) -> list:
+        """Rounded-up ratios of the connected screens, always with 1."""
+        app = QGuiApplication.instance()
+        # A QCoreApplication in headless runs, without screens
+        screens = (app.screens() if isinstance(app, QGuiApplication)
+                   else [])
+        return sorted({1} | {math.ceil(screen.devicePixelRatio())
+                             for screen in screens})
+
+    def _watch_screens(self):
+        """Follow screens being added and changing their ratio."""
+        app = QGuiApplication.instance()
+        if not isinstance(app, QGuiApplication):
+            return
+        if not self._watched_screens:
+            app.screenAdded.connect(self._on_screens_changed)
+            app.screenRemoved.connect(self._on_screens_changed)
+        for screen in app.screens():
+            if screen not in self._watched_screens:
+                self._watched_screens.add(screen)
+                screen.logicalDotsPerInchChanged.connect(
+                    self._on_screens_changed)
+                screen.destroyed.connect(self._forget_screen)
+
+    def _forget_screen(self, screen):
+        """Stop tracking a screen that is gone."""
+        self._watched_screens.discard(screen)
+
+    def _on_screens_changed(self, *_args):
+        """Write the stylesheet files of ratios that were not shown yet."""
+        self._watch_screens()
+        ratios = self._screen_ratios()
+        if ratios == self._ratios:
+            return
+        added = set(ratios) - set(self._ratios or ())
+        self._ratios = ratios
+        logger.info("Screen pixel ratios changed to %s", ratios)
+        for filepath, spec in self._written.items():
+            for ratio in added:
+                self._write_file(filepath, spec, ratio)
+        self.pixel_ratios_changed.emit()
+
+
+class RegistryIconEngine(QIconEngine):
+    """Icon engine drawing a registry icon at the size and ratio asked for."""
+
+    def __init__(self, registry, name, tint=()):
+        super().__init__()
+        self._registry = registry
+        self._name = name
+        self._tint = tint
+
+    def key(self) -> str:  # pylint: disable=missing-function-docstring
+        return "IconRegistry"
+
+    def clone(self):  # pylint: disable=missing-function-docstring
+        return RegistryIconEngine(self._registry, self._name, self._tint)
+
+    def isNull(self) -> bool:  # pylint: disable=invalid-name
+        """Whether the icon's resource cannot be read."""
+        return self._registry.default_size(self._name).isEmpty()
+
+    def actualSize(self, size, mode, state):  # pylint: disable=invalid-name
+        """Largest size within `size` keeping the icon's aspect ratio."""
+        default = self._registry.default_size(self._name)
+        if default.isEmpty():
+            return QSize()
+        return default.scaled(size, Qt.AspectRatioMode.KeepAspectRatio)
+
+    def pixmap(self, size, mode, state):
+        """Icon for a device pixel ratio of 1."""
+        return self.scaledPixmap(size, mode, state, 1.0)
+
+    # pylint: disable-next=invalid-name
+    def scaledPixmap(self, size, mode, state, scale):
+        """Icon at `size` logical pixels for a device pixel ratio."""
+        pixmap = self._registry.pixmap(
+            self._name, self.actualSize(size, mode, state), scale,
+            self._tint)
+        if mode == QIcon.Mode.Disabled and not pixmap.isNull():
+            # Only widgets paint disabled icons, headless runs never get here
+            # pylint: disable-next=import-outside-toplevel
+            from PyQt6.QtWidgets import QApplication, QStyleOption
+
+            if isinstance(QApplication.instance(), QApplication):
+                pixmap = QApplication.style().generatedIconPixmap(
+                    mode, pixmap, QStyleOption())
+        return pixmap
+
+    def paint(self, painter, rect, mode, state):
+        """Draw the icon for the painter's device pixel ratio."""
+        ratio = painter.device().devicePixelRatioF()
+        painter.drawPixmap(rect, self.scaledPixmap(rect.size(), mode, state,
+                                                   ratio))
@@ -0,0 +1,344 @@
+"""
+log_index.py
+
+Line index over the application log, for viewing files of hundreds of MB.
+
+The log file is never read into memory as a whole. It is indexed in chunks
+of CHUNK_BYTES on the task scheduler, each chunk adding:
+    - The byte offset of every line, so any line can be read from the
+      memory-mapped file on demand.
+    - For every (level, module) pair, the numbers of the lines it logged.
+      Lines without a record header, e.g. tracebacks, belong to the record
+      above them. Filtering by level or module merges these lists instead
+      of reading the file again.
+Only complete lines are indexed; the file is polled for growth and the new
+lines are indexed like `tail -f`. A file that shrank, e.g. truncated, is
+indexed again from the start.
+
+Usage:
+    tail = LogTail(LOG_FILE, task_scheduler)
+    tail.lines_added.connect(on_lines_added)    # (first line, count)
+    tail.start()
+    tail.line(0)                                # Text of the first line
+    tail.index.rows(min_level=logging.WARNING)  # Lines to show, in order
+"""
+
+import bisect
+import itertools
+import logging
+import mmap
+import os
+import re
+from array import array
+from typing import NamedTuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.logger import logger
+
+TASK_CATEGORY = "logs"
+# Bytes indexed per task, small enough to show the first lines quickly
+CHUNK_BYTES = 8 * 1024 * 1024
+# (level, module) of the lines before the first record header
+NO_RECORD = ("", "")
+
+# Header written by core.logger: "asctime - levelname - module - message"
+_HEADER = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d - ([A-Z]+) - (\w+) - ")
+_RECORD = re.compile(
+    r"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) - ([A-Z]+) - (\w+) - (.*)", re.DOTALL)
+
+
+def level_number(level_name: str) -> int:
+    """Numeric value of a level name, 0 for unknown names."""
+    number = logging.getLevelName(level_name)
+    return number if isinstance(number, int) else 0
+
+
+def split_record(line: str) -> tuple:
+    """(time, level, module, message) of a line.
+
+    Lines that do not start a record, e.g. of a traceback, only have a
+    message.
+    """
+    match = _RECORD.match(line)
+    return match.groups() if match is not None else ("", "", "", line)
+
+
+class LogChunk(NamedTuple):
+    """Index of the complete lines of a range of the log file."""
+
+    start: int
+    # Offset after the last complete line, where the next chunk starts
+    end: int
+    # Offset of the start of every line
+    offsets: array
+    # (level, module): array of the line numbers, counted from first_line
+    postings: dict
+    # (level, module) of the last record, continued by the next chunk
+    last_key: tuple
+
+
+def index_log(filepath: str, start: int = 0, first_line: int = 0,
+              last_key: tuple = NO_RECORD,
+              max_bytes: int = CHUNK_BYTES) -> LogChunk:
+    """Index the complete lines from byte `start` on (task side).
+
+    Parameters
+    ----------
+    filepath : str
+        Log file.
+    start : int
+        Offset of the first line to index.
+    first_line : int
+        Number of the line at `start`.
+    last_key : tuple
+        (level, module) of the record the lines at `start` may continue.
+    max_bytes : int
+        Bytes to index at most, unless a single line is longer.
+
+    Returns
+    -------
+    LogChunk
+        Index of the lines. Its `end` equals `start` if there is no new
+        complete line.
+
+    """
+    empty = LogChunk(start, start, array("Q"), {}, last_key)
+    try:
+        with open(filepath, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size <= start:
+                return empty
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = data.rfind(b"\n", start, min(start + max_bytes, size))
+                if end < 0:
+                    # A line longer than max_bytes, or not complete yet
+                    end = data.find(b"\n", start + max_bytes, size)
+                    if end < 0:
+                        return empty
+                chunk = data[start:end + 1]
+    except (FileNotFoundError, ValueError):
+        return empty
+
+    lines = chunk.split(b"\n")
+    lines.pop()
+    offsets = array("Q", itertools.accumulate(
+        map((1).__add__, map(len, lines[:-1])), initial=start))
+
+    key = tuple(part.encode() for part in last_key)
+    postings = {key: array("I")}
+    current = postings[key]
+    line_number = first_line
+    for match in map(_HEADER.match, lines):
+        if match is not None:
+            header = match.group(1, 2)
+            if header != key:
+                key = header
+                current = postings.get(key)
+                if current is None:
+                    current = postings[key] = array("I")
+        current.append(line_number)
+        line_number += 1
+    postings = {(level.decode(), module.decode()): numbers
+                for (level, module), numbers in postings.items() if numbers}
+    return LogChunk(start, start + len(chunk), offsets, postings,
+                    (key[0].decode(), key[1].decode()))
+
+
+class LogIndex:
+    """Line offsets and (level, module) line lists of an indexed log.
+
+    Plain Python data, grown by the LogChunks indexed in order.
+    """
+
+    def __init__(self):
+        self.offsets = array("Q")
+        # Offset after the last indexed line
+        self.end = 0
+        self.postings = {}
+        self.last_key = NO_RECORD
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def extend(self, chunk: LogChunk):
+        """Add the lines of the chunk starting where the index ends."""
+        self.offsets.extend(chunk.offsets)
+        for key, numbers in chunk.postings.items():
+            if key in self.postings:
+                self.postings[key].extend(numbers)
+            else:
+                self.postings[key] = numbers
+        self.end = chunk.end
+        self.last_key = chunk.last_key
+
+    def span(self, line: int) -> tuple:
+        """(start, stop) offsets of a line, without its line break."""
+        stop = self.offsets[line + 1] if line + 1 < len(self.offsets) \
+            else self.end
+        return self.offsets[line], stop - 1
+
+    def modules(self) -> list:
+        """Modules that logged, sorted."""
+        return sorted({module for _, module in self.postings if module})
+
+    def rows(self, min_level: int = 0, module: str = None,
+             first_line: int = 0):
+        """Numbers of the lines passing a filter, in file order.
+
+        Parameters
+        ----------
+        min_level : int
+            Lowest level shown, e.g. logging.WARNING. 0 shows every line,
+            including those before the first record.
+        module : str, optional
+            Only show the lines of this module.
+        first_line : int
+            Only consider the lines from this one on.
+
+        Returns
+        -------
+        array or None
+            Line numbers, None if every line passes.
+
+        """
+        if min_level <= 0 and module is None:
+            return None
+        parts = []
+        for (level, key_module), numbers in self.postings.items():
+            if level_number(level) >= min_level and \
+                    module in (None, key_module):
+                start = bisect.bisect_left(numbers, first_line) \
+                    if first_line else 0
+                if start < len(numbers):
+                    parts.append(numbers[start:])
+        if len(parts) == 1:
+            return parts[0]
+        # The parts are sorted runs, which sorted() merges in linear time
+        return array("I", sorted(itertools.chain.from_iterable(parts)))
+
+
+class LogTail(QObject):
+    """Index a log file in the background and follow its growth.
+
+    Parameters
+    ----------
+    filepath : str
+        Log file, which does not need to exist yet.
+    task_scheduler : TaskScheduler
+        Scheduler indexing the file, in the "logs" category.
+    poll_interval_ms : int
+        How often to check the file for new lines.
+    parent : QObject, optional
+        Parent of the tail.
+
+    """
+
+    # Number of the first new line and the number of new lines
+    lines_added = pyqtSignal(int, int)
+    # The file shrank and is indexed again from the start
+    reset = pyqtSignal()
+
+    POLL_INTERVAL_MS = 500
+
+    def __init__(self, filepath: str, task_scheduler,
+                 poll_interval_ms: int = POLL_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self.index = LogIndex()
+        self._scheduler = task_scheduler
+        self._indexing = None
+        self._map = None
+        self._file = None
+
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(poll_interval_ms)
+        self._poll_timer.timeout.connect(self._poll)
+
+    @property
+    def is_indexing(self) -> bool:
+        """Whether a chunk of the file is being indexed."""
+        return self._indexing is not None
+
+    def start(self):
+        """Index the file and follow it."""
+        self._poll_timer.start()
+        self._poll()
+
+    def stop(self):
+        """Stop following the file and release it."""
+        self._poll_timer.stop()
+        if self._indexing is not None:
+            self._indexing.cancel()
+            self._indexing = None
+        self._unmap()
+
+    def line(self, number: int) -> str:
+        """Text of an indexed line."""
+        start, stop = self.index.span(number)
+        if self._map is None or len(self._map) < stop:
+            self._remap()
+        if self._map is None:
+            return ""
+        return self._map[start:stop].decode("utf-8", "replace").rstrip("\r")
+
+    def _poll(self):
+        """Index the lines written since the last poll."""
+        if self._indexing is not None:
+            return
+        try:
+            size = os.path.getsize(self.filepath)
+        except OSError:
+            size = 0
+        if size < self.index.end:
+            logger.info("%s shrank, indexing it again", self.filepath)
+            self._unmap()
+            self.index = LogIndex()
+            self.reset.emit()
+        if size <= self.index.end:
+            return
+        self._indexing = self._scheduler.submit(
+            index_log, self.filepath, self.index.end, len(self.index),
+            self.index.last_key, key=(TASK_CATEGORY, self.filepath),
+            category=TASK_CATEGORY)
+        self._indexing.finished.connect(self._on_indexed)
+        self._indexing.failed.connect(self._on_failed)
+
+    def _on_indexed(self, chunk):
+        """Add an indexed chunk and index the next one."""
+        self._indexing = None
+        if chunk.start != self.index.end:
+            # Indexed before a reset
+            self._poll()
+            return
+        if chunk.end == chunk.start:
+            return
+        first = len(self.index)
+        self.index.extend(chunk)
+        if self._poll_timer.isActive():
+            self._poll()
+        self.lines_added.emit(first, len(self.index) - first)
+
+    def _on_failed(self, error):
+        """Log an indexing error, the next poll tries again."""
+        self._indexing = None
+        logger.error("Could not index %s: %s", self.filepath, error)
+
+    def _remap(self):
+        """Map the file again, to include the lines written since."""
+        self._unmap()
+        try:
+            self._file = open(self.filepath, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._unmap()
+
+    def _unmap(self):
+        """Release the mapping of the file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,31 +1,211 @@
 """core\\main_controller.py."""
 
+import asyncio
+import copy
 import os
+import time
 from glob import glob
 
 # from icecream import ic
-from PyQt6.QtCore import QObject, pyqtSignal
+# QtWidgets and the dialogs are imported by the slots that show them, so
+# the headless batch mode (core/batch.py) runs without them
+from PyQt6.QtCore import (QCoreApplication, QObject, QPoint, Qt, QTimer,
+                          pyqtSignal)
+from PyQt6.QtGui import QColor, QPalette
 
-from app.dialogs.config_dialog import ConfigDialog
-from app.dialogs.about_dialog import AboutDialog
 from core.app_config_handler import ConfigHandler
+from core.async_loop import async_slot, run_in_executor
+from core.diagnostics import MemoryDiagnostics
+from core.document_manager import MIB, DocumentManager
+from core.file_history import FileHistory
+from core.file_index import FileIndex
+from core.icon_registry import icon_registry
+from core.logger import LOG_FILE, logger
+from core.metrics import metrics
+from core.process_pool import ProcessPoolService
+from core.profiler import DEFAULT_SECONDS, Profiler
+from core.resource_loader import RESOURCE_DIR
+from core.subcontroller_registry import SubcontrollerRegistry
+from core.task_scheduler import TaskScheduler
+from core.thumbnail_cache import ThumbnailCache, is_image_file
+from core.theme_watcher import ThemeWatcher
+
+
+_THEME_APPLY_SECONDS = metrics().histogram(
+    "app_theme_apply_seconds", "Time to apply a theme to the application",
+    unit="seconds")
 
 
 class MainController(QObject):
-    """Main controller logic layer for application."""
+    """Main controller logic layer for application.
+
+    One controller serves every main window of the process, so the windows
+    share its configuration, documents and caches. The windows register
+    themselves, see add_window, and the last one to close saves the state.
+    """
 
     window_theme_changed = pyqtSignal()
+    # Recent files that no longer exist, see check_recent_files
+    recent_files_checked = pyqtSignal(set)
+
+    DEFAULT_CONFIG_FILEPATH = os.path.join(RESOURCE_DIR, "app_config.yaml")
+
+    # Concurrency limit of the background task categories, "io" tasks
+    # write files so they run one at a time and in order
+    TASK_CATEGORY_LIMITS = {"io": 1, "thumbnails": 2, "logs": 1,
+                            "file_index": 1, "documents": 1}
 
-    def __init__(self):
+    # Offset of a new window from the active one
+    WINDOW_CASCADE_OFFSET = 30
+
+    # Dynamic property holding the theme a top-level window is styled with
+    THEME_PROPERTY = "themeFilename"
+
+    # Palette roles and the theme keywords that color them
+    PALETTE_ROLES = {
+        QPalette.ColorRole.Window: "@main-background",
+        QPalette.ColorRole.WindowText: "@text",
+        QPalette.ColorRole.Base: "@widget-background",
+        QPalette.ColorRole.AlternateBase: "@widget-alternate-background",
+        QPalette.ColorRole.Button: "@widget-alternate-background",
+        QPalette.ColorRole.ButtonText: "@text",
+        QPalette.ColorRole.Text: "@text",
+        QPalette.ColorRole.ToolTipBase: "@widget-background",
+        QPalette.ColorRole.ToolTipText: "@text",
+        QPalette.ColorRole.Highlight: "@selected-background",
+        QPalette.ColorRole.HighlightedText: "@selected-color",
+        QPalette.ColorRole.PlaceholderText: "@widget-disabled-foreground",
+        }
+    DISABLED_PALETTE_ROLES = {
+        QPalette.ColorRole.WindowText: "@widget-disabled-foreground",
+        QPalette.ColorRole.Text: "@widget-disabled-foreground",
+        QPalette.ColorRole.ButtonText: "@widget-disabled-foreground",
+        QPalette.ColorRole.Base: "@widget-disabled-background",
+        QPalette.ColorRole.Button: "@widget-disabled-background",
+        }
+
+    def __init__(self, config_filepath=DEFAULT_CONFIG_FILEPATH,
+                 memory_diagnostics=None, profiler=None):
         super().__init__()
-        self.config_handler = ConfigHandler(".\\resources\\app_config.yaml")
+        self.config_handler = ConfigHandler(config_filepath)
+        # Started at launch by APP_MEMORY_DIAGNOSTICS, else on first report
+        self.memory_diagnostics = memory_diagnostics or MemoryDiagnostics()
+        # Already recording if started at launch by --profile
+        self.profiler = profiler or Profiler(parent=self)
+        self.profiler.finished.connect(self.on_profile_written)
+        self.last_theme_switch_ms = None
+        self.theme_watcher = None
+        self.missing_recent_files = set()
+        self.log_viewer = None
+        # Open main windows, the most recently active last
+        self.windows = []
+        self.task_scheduler = TaskScheduler(self.TASK_CATEGORY_LIMITS,
+                                            parent=self)
+        # CPU-heavy work such as image decoding, workers start on first use
+        self.process_pool = ProcessPoolService(parent=self)
+
+        # Every file ever opened, for the quick-open palette. The menu only
+        # shows the few recent_files of the configuration
+        self.file_history = FileHistory(
+            os.path.join(os.path.dirname(config_filepath), "file_history.txt"),
+            parent=self)
+        QTimer.singleShot(0, self.load_file_history)
+
+        # Decoded data of the open documents, evicted beyond the budget and
+        # decoded in the background, images in the worker processes
+        self.documents = DocumentManager(
+            self.config_handler.document_memory_mb * MIB,
+            self.task_scheduler, self.process_pool, parent=self)
+
+        # Size, dimensions, type and hash of the opened files, so the UI
+        # does not read them again
+        self.file_index = FileIndex(
+            os.path.join(os.path.dirname(config_filepath),
+                         "file_index.sqlite3"),
+            self.task_scheduler, parent=self)
+
+        # Thumbnails of the recent and opened images
+        self.thumbnail_cache = ThumbnailCache(
+            os.path.join(os.path.dirname(config_filepath), "thumbnails"),
+            self.task_scheduler, parent=self)
+
+        # Restyle every window once, not once per window
+        self.window_theme_changed.connect(self.apply_theme)
+
+        # A screen with a new pixel ratio gets its own stylesheet icons
+        icon_registry().pixel_ratios_changed.connect(
+            self.on_pixel_ratios_changed)
+
+        # Declare the sub-controllers, they are constructed on first use.
+        # Add them to resources/subcontrollers.yaml
+        self.subcontrollers = SubcontrollerRegistry(self)
+        self.subcontrollers.load_manifest()
+        QTimer.singleShot(0, self.subcontrollers.load_entry_points)
+
+    def add_window(self, window):
+        """Register a main window sharing this controller.
+
+        The window is the active one until another is activated. It is
+        forgotten when it closes, see remove_window, or is deleted.
+        """
+        if window in self.windows:
+            return
+        self.windows.append(window)
+        window.destroyed.connect(lambda: self.remove_window(window))
 
-        # Launch sub-controllers and conncect their signals
-        # TODO Add any needed subcontrollers here
+    def remove_window(self, window):
+        """Forget a main window.
+
+        Returns
+        -------
+        bool
+            True if it was the last main window, which should save the
+            state of the application.
+
+        """
+        if window not in self.windows:
+            return False
+        self.windows.remove(window)
+        return not self.windows
+
+    def activate_window(self, window):
+        """Make a registered main window the active one."""
+        if window in self.windows:
+            self.windows.remove(window)
+            self.windows.append(window)
+
+    def active_window(self):
+        """The most recently active main window, None if there is none."""
+        return self.windows[-1] if self.windows else None
+
+    def new_window(self):
+        """Show another main window sharing this controller.
+
+        The window is cascaded from the active one and deleted when
+        closed. Nothing is loaded again: the configuration, the compiled
+        stylesheet, the icons and the documents are shared.
+        """
+        # pylint: disable-next=import-outside-toplevel
+        from app.main_window import MainWindow
+
+        active = self.active_window()
+        window = MainWindow(self)
+        window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        if active is not None:
+            offset = self.WINDOW_CASCADE_OFFSET
+            window.move(active.pos() + QPoint(offset, offset))
+            window.resize(active.size())
+        window.show()
+        return window
+
+    def open_files(self, filepaths):
+        """Open files in the active window, e.g. from another launch."""
+        window = self.active_window() or self.new_window()
+        window.open_files(filepaths)
 
     def delete_temp_files(self):
         """Delete all files in the temporary resources directory."""
-        files = glob(".\\resources\\temp\\*")
+        files = glob(os.path.join(self.config_handler.temp_dir, "*"))
         for file in files:
             os.remove(file)
 
@@ -33,6 +213,165 @@ class MainController(QObject):
         """Retrieve stylesheet."""
         return self.config_handler.get_stylesheet()
 
+    def get_palette(self, theme_filename=None):
+        """Build the application palette from the colors of a theme."""
+        colors = self.config_handler.get_theme_colors(theme_filename)
+        palette = QPalette()
+        for role, keyword in self.PALETTE_ROLES.items():
+            if keyword in colors:
+                palette.setColor(role, QColor(colors[keyword]))
+        for role, keyword in self.DISABLED_PALETTE_ROLES.items():
+            if keyword in colors:
+                palette.setColor(QPalette.ColorGroup.Disabled, role,
+                                 QColor(colors[keyword]))
+        return palette
+
+    def enable_theme_hot_reload(self):
+        """Re-apply the theme whenever one of its source files changes.
+
+        The sources must be read from the loose files, so the resource
+        archive should not be registered while hot-reloading.
+        """
+        if self.theme_watcher is None:
+            self.theme_watcher = ThemeWatcher(
+                self.config_handler.theme_resources(), parent=self)
+            self.theme_watcher.resources_changed.connect(
+                self.on_theme_resources_changed)
+            logger.info("Watching %s for theme changes",
+                        ", ".join(self.theme_watcher.watched_resources()))
+
+    def on_theme_resources_changed(self, relative_paths):
+        """Recompile the themes built from changed resources.
+
+        Only the stylesheets that depend on the changed files are formatted
+        again, and the windows are only restyled if the current theme is one
+        of them.
+        """
+        themes = self.config_handler.invalidate_resources(relative_paths)
+        logger.info("Theme resources changed: %s", ", ".join(relative_paths))
+        if self.config_handler.theme_filename in themes:
+            self.apply_theme(force=True)
+
+    def on_pixel_ratios_changed(self):
+        """Restyle the windows to pick up the icons of new pixel ratios."""
+        self.apply_theme(force=True)
+
+    def apply_palette(self):
+        """Set the palette of the current theme on the application.
+
+        The cheap part of apply_theme with scoped theming, so that a window
+        painted before its stylesheet is applied has the theme's colors.
+        Without scoped theming the stylesheet sets every color.
+        """
+        if self.config_handler.scoped_theming:
+            QCoreApplication.instance().setPalette(self.get_palette())
+
+    def apply_theme(self, window=None, force=False):
+        """Apply the current theme and report how long it took.
+
+        With scoped theming the structural stylesheet is set on the
+        application once and never changes. A theme change only sets the
+        application palette and a small color-only stylesheet on the
+        top-level windows still styled with another theme, so Qt only
+        re-polishes those windows. Otherwise the complete stylesheet is set
+        on the application, which re-polishes every widget.
+
+        Parameters
+        ----------
+        window : QWidget, optional
+            Top-level window that should follow the theme from now on.
+        force : bool
+            Restyle every window even if it already has the current theme,
+            e.g. after the theme's stylesheet changed.
+
+        Returns
+        -------
+        float
+            Time taken to apply the theme, in milliseconds.
+
+        """
+        start = time.perf_counter()
+        app = QCoreApplication.instance()
+        theme = self.config_handler.theme_filename
+
+        if self.config_handler.scoped_theming:
+            if window is not None and window.property(
+                    self.THEME_PROPERTY) is None:
+                window.setProperty(self.THEME_PROPERTY, "")
+            structural, colors = self.config_handler.get_stylesheet_parts()
+            if app.styleSheet() != structural:
+                app.setStyleSheet(structural)
+            palette = self.get_palette()
+            if app.palette() != palette:
+                app.setPalette(palette)
+            for widget in app.topLevelWidgets():
+                styled_with = widget.property(self.THEME_PROPERTY)
+                if styled_with is not None and (force or styled_with != theme):
+                    widget.setStyleSheet(colors)
+                    widget.setProperty(self.THEME_PROPERTY, theme)
+        else:
+            app.setStyleSheet(self.get_stylesheet())
+
+        self.last_theme_switch_ms = (time.perf_counter() - start) * 1e3
+        _THEME_APPLY_SECONDS.observe(self.last_theme_switch_ms / 1e3)
+        logger.info("Applied theme %s in %.1f ms (%s)", theme,
+                    self.last_theme_switch_ms,
+                    "scoped" if self.config_handler.scoped_theming else "full")
+        return self.last_theme_switch_ms
+
+    def process_file(self, filepath):
+        """Hand a file to the subcontroller declared for its type.
+
+        The part of open_file that needs no window, also run by the
+        headless batch mode.
+
+        Returns
+        -------
+        The result of the subcontroller's `open_file`, None if no
+        subcontroller handles the file type.
+
+        """
+        handler = self.subcontrollers.handler_for_file(filepath)
+        if handler is None:
+            return None
+        return self.subcontrollers.call(handler, "open_file", filepath)
+
+    def open_file(self, filepath):
+        """Open a file and add it to the recent files.
+
+        The file is handed to the subcontroller declared for its type and
+        becomes the active document, decoded in the background.
+        """
+        self.process_file(filepath)
+        self.documents.open_in_background(filepath)
+        self.config_handler.add_recent_file(filepath)
+        self.file_history.record(filepath)
+        self.file_index.record(filepath)
+        if is_image_file(filepath):
+            self.thumbnail_cache.request(filepath)
+        logger.info("Opened %s", filepath)
+
+    def close_file(self, filepath=None):
+        """Close a document, by default the active one."""
+        filepath = filepath or self.documents.active
+        if filepath in self.documents:
+            self.documents.close(filepath)
+            logger.info("Closed %s", filepath)
+
+    @async_slot
+    async def check_recent_files(self):
+        """Find the recent files that no longer exist.
+
+        The files are stat-ed in threads, so files on slow or unreachable
+        network shares do not block the UI. Emits recent_files_checked.
+        """
+        filepaths = list(self.config_handler.recent_files.values())
+        exists = await asyncio.gather(
+            *(run_in_executor(os.path.exists, path) for path in filepaths))
+        self.missing_recent_files = {
+            path for path, found in zip(filepaths, exists) if not found}
+        self.recent_files_checked.emit(self.missing_recent_files)
+
     def get_window_position_size(self, screen_size):
         """Retreive main window size and position."""
         return self.config_handler.get_window_position_size(screen_size)
@@ -44,14 +383,121 @@ class MainController(QObject):
             window.width(), window.height())
         self.config_handler.save_config()
 
+    def save_window_geometry_in_background(self, window):
+        """Save a window's position and size off the GUI thread.
+
+        Keeps the geometry of a session that does not end normally. Nothing
+        is saved if the geometry did not change.
+
+        Returns
+        -------
+        TaskHandle or None
+            The save, None if there was nothing to save.
+
+        """
+        position = (window.x(), window.y())
+        size = (window.width(), window.height())
+        handler = self.config_handler
+        if (handler.window_position, handler.window_size) == (position, size):
+            return None
+        handler.window_position = position
+        handler.window_size = size
+        return self.save_config_in_background()
+
+    def save_config_in_background(self):
+        """Save a snapshot of the configuration off the GUI thread."""
+        return self.task_scheduler.submit(
+            self.config_handler.save_config,
+            copy.deepcopy(self.config_handler.config), category="io")
+
+    def stop_background_tasks(self, msecs: int = 5000):
+        """Cancel the queued tasks and wait for the running ones."""
+        self.process_pool.shutdown()
+        self.task_scheduler.cancel_all()
+        if not self.task_scheduler.wait_for_done(msecs):
+            logger.warning("Background tasks still running after %d ms",
+                           msecs)
+        self.file_index.close()
+
     def on_edit_preferences(self):
         """Handle Edit Preferences menu action."""
+        # pylint: disable-next=import-outside-toplevel
+        from app.dialogs.config_dialog import ConfigDialog
+
         config_dialog = ConfigDialog(
             self.config_handler)
+        if self.config_handler.scoped_theming:
+            self.apply_theme(config_dialog)
         if config_dialog.exec():
+            self.documents.budget_bytes = (
+                self.config_handler.document_memory_mb * MIB)
+            self.save_config_in_background()
             if config_dialog.window_theme_changed:
                 self.window_theme_changed.emit()
 
+    def load_file_history(self):
+        """Read the file history in the background."""
+        self.file_history.load_in_background(self.task_scheduler)
+
+    def on_quick_open(self):
+        """Handle File Quick Open menu action."""
+        # pylint: disable-next=import-outside-toplevel
+        from app.dialogs.quick_open_dialog import QuickOpenDialog
+
+        quick_open_dialog = QuickOpenDialog(self.file_history)
+        if self.config_handler.scoped_theming:
+            self.apply_theme(quick_open_dialog)
+        if quick_open_dialog.exec():
+            self.open_file(quick_open_dialog.selected_file)
+
+    def on_memory_diagnostics(self):
+        """Handle Help Memory Diagnostics menu action."""
+        self.memory_diagnostics.report()
+
+    def on_profile(self):
+        """Handle Help Profile menu action."""
+        # pylint: disable-next=import-outside-toplevel
+        from PyQt6.QtWidgets import QInputDialog
+
+        if self.profiler.is_running:
+            logger.info("Already profiling")
+            return
+        seconds, accepted = QInputDialog.getInt(
+            None, "Profile", "Seconds to profile, while reproducing the "
+            "slowness:", DEFAULT_SECONDS, 1, 600)
+        if accepted:
+            self.profiler.start(seconds)
+
+    def on_profile_written(self, filepaths):
+        """Tell the user where the profile was written."""
+        # pylint: disable-next=import-outside-toplevel
+        from PyQt6.QtWidgets import QMessageBox
+
+        QMessageBox.information(
+            None, "Profile Written",
+            "The profile was written to:\n\n" + "\n".join(
+                os.path.abspath(path) for path in filepaths))
+
+    def on_log_viewer(self):
+        """Handle Help Log menu action."""
+        # pylint: disable-next=import-outside-toplevel
+        from app.dialogs.log_viewer_dialog import LogViewerDialog
+
+        if self.log_viewer is None:
+            self.log_viewer = LogViewerDialog(os.path.abspath(LOG_FILE),
+                                              self.task_scheduler)
+            if self.config_handler.scoped_theming:
+                self.apply_theme(self.log_viewer)
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+        self.log_viewer.activateWindow()
+
     def on_about(self):
         """Handle Help About menu action."""
-        AboutDialog().exec()
+        # pylint: disable-next=import-outside-toplevel
+        from app.dialogs.about_dialog import AboutDialog
+
+        about_dialog = AboutDialog()
+        if self.config_handler.scoped_theming:
+            self.apply_theme(about_dialog)
+        about_dialog.exec()
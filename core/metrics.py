@@ -0,0 +1,648 @@
+"""
+metrics.py
+
+Performance metrics of the running application in the OpenMetrics text
+format, so the data of a fleet of workstations can be aggregated.
+
+Code records into the shared registry, which is cheap enough for hot paths
+and safe to use from any thread:
+    SAVES = metrics().counter("app_config_saves", "Configuration saves")
+    SAVES.inc()
+    with metrics().histogram("app_config_save_seconds", "...",
+                             unit="seconds").time():
+        ...
+The application records:
+    - app_startup_first_paint_seconds, app_startup_complete_seconds and
+      app_startup_stage_seconds{stage} of the main window.
+    - app_stylesheet_compile_seconds{kind} and app_theme_apply_seconds.
+    - app_config_save_seconds.
+    - app_event_loop_stalls and app_event_loop_stall_seconds, see
+      StallMonitor.
+    - app_cache_requests{cache, result} and app_cache_hit_ratio{cache} of
+      the stylesheet, icon and thumbnail caches.
+    - app_resident_memory_bytes.
+
+Nothing is exported unless enabled by environment variables set before
+the application starts:
+    APP_METRICS_FILE        File rewritten every APP_METRICS_INTERVAL
+                            seconds (default 15).
+    APP_METRICS_PORT        Port of an HTTP endpoint serving /metrics on
+                            127.0.0.1 only, not reachable from other
+                            machines.
+
+Usage:
+    exporter = MetricsExporter.from_environment()   # None if not enabled
+"""
+
+import abc
+import bisect
+import contextlib
+import math
+import os
+import threading
+import time
+from functools import partial
+
+from PyQt6.QtCore import QCoreApplication, QObject, Qt, QTimer
+from PyQt6.QtNetwork import QHostAddress, QTcpServer
+
+from core.diagnostics import process_rss
+from core.logger import logger
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+ENV_FILE = "APP_METRICS_FILE"
+ENV_INTERVAL = "APP_METRICS_INTERVAL"
+ENV_PORT = "APP_METRICS_PORT"
+DEFAULT_INTERVAL_S = 15
+
+# Upper bounds of the histogram buckets in seconds, from a fast stylesheet
+# lookup to a long stall
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+_registry = None
+
+
+def metrics():
+    """The registry shared by the whole application."""
+    global _registry  # pylint: disable=global-statement
+    if _registry is None:
+        _registry = MetricsRegistry()
+        _registry.gauge("app_resident_memory_bytes",
+                        "Resident set size of the process",
+                        unit="bytes").set_function(process_rss)
+    return _registry
+
+
+def format_value(value) -> str:
+    """A sample value as OpenMetrics writes numbers."""
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(int(value))
+
+
+def _escape(text: str) -> str:
+    """Escape a label value or help text."""
+    return (str(text).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+class _CounterValue:
+    """Value of a counter for one combination of label values."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add a non-negative amount."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> list:
+        """(suffix, extra labels, value) of the exported samples."""
+        return [("_total", {}, self.value)]
+
+
+class _GaugeValue:
+    """Value of a gauge for one combination of label values."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        # Not exported until set
+        self.value = None
+        self._function = None
+
+    def set(self, value):
+        """Set the value."""
+        self.value = value
+
+    def inc(self, amount=1):
+        """Add to the value, which may be negative."""
+        with self._lock:
+            self.value = (self.value or 0) + amount
+
+    def set_function(self, function):
+        """Read the value from `function()` at export, skipped if None."""
+        self._function = function
+
+    def samples(self) -> list:
+        """(suffix, extra labels, value) of the exported samples."""
+        value = self.value if self._function is None else self._function()
+        return [("", {}, value)]
+
+
+class _HistogramValue:
+    """Bucketed observations for one combination of label values."""
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self.buckets = buckets
+        # Observations per bucket, the last one for +Inf
+        self._counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record an observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observe the seconds the `with` block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self) -> list:
+        """(suffix, extra labels, value) of the exported samples."""
+        with self._lock:
+            counts = list(self._counts)
+            total, total_sum = self.count, self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            samples.append(("_bucket", {"le": format_value(float(bound))},
+                            cumulative))
+        samples += [("_count", {}, total), ("_sum", {}, total_sum)]
+        return samples
+
+
+class Metric(abc.ABC):
+    """Family of samples sharing a name, one per set of label values.
+
+    Subclasses set TYPE and create the value of each set of label values.
+
+    Parameters
+    ----------
+    name : str
+        Name of the family, ending in `_<unit>` if it has a unit.
+    documentation : str
+        Help text.
+    labelnames : tuple of str
+        Names of the labels every sample of the family has.
+    unit : str
+        Unit such as "seconds" or "bytes", empty for none.
+
+    """
+
+    TYPE = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(),
+                 unit: str = ""):
+        if unit and not name.endswith(f"_{unit}"):
+            raise ValueError(f"Metric {name!r} must end with _{unit}")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.unit = unit
+        self._lock = threading.Lock()
+        # Label values: value
+        self._children = {}
+        if not self.labelnames:
+            # Exported from the start, e.g. counters as 0
+            self._children[()] = self._new_child()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Value of a new combination of label values."""
+
+    def labels(self, **labels):
+        """Value of a combination of label values, created on first use.
+
+        Raises
+        ------
+        ValueError
+            If the labels are not exactly the family's label names.
+
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name!r} has the labels "
+                             f"{self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> list:
+        """Lines of the family in the OpenMetrics text format."""
+        lines = [f"# TYPE {self.name} {self.TYPE}"]
+        if self.unit:
+            lines.append(f"# UNIT {self.name} {self.unit}")
+        lines.append(f"# HELP {self.name} {_escape(self.documentation)}")
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                if value is None:
+                    continue
+                pairs = {**labels, **extra}
+                label_text = ",".join(f'{name}="{_escape(label)}"'
+                                      for name, label in pairs.items())
+                lines.append(f"{self.name}{suffix}"
+                             f"{'{' + label_text + '}' if pairs else ''} "
+                             f"{format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count, exported as `<name>_total`."""
+
+    TYPE = "counter"
+
+    def _new_child(self):
+        return _CounterValue(self._lock)
+
+    def inc(self, amount=1):
+        """Add to the counter of a family without labels."""
+        self.labels().inc(amount)
+
+    @property
+    def value(self):
+        """Count of a family without labels."""
+        return self.labels().value
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read when exported."""
+
+    TYPE = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue(self._lock)
+
+    def set(self, value):
+        """Set the value of a family without labels."""
+        self.labels().set(value)
+
+    def set_function(self, function):
+        """Read the value of a family without labels at export."""
+        self.labels().set_function(function)
+
+
+class Histogram(Metric):
+    """Distribution of observations, e.g. durations in seconds.
+
+    Parameters
+    ----------
+    buckets : tuple of float
+        Upper bounds of the buckets, +Inf is added.
+
+    """
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(),
+                 unit: str = "", buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, unit)
+
+    def _new_child(self):
+        return _HistogramValue(self._lock, self.buckets)
+
+    def observe(self, value: float):
+        """Record an observation of a family without labels."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Observe the seconds a `with` block takes, without labels."""
+        return self.labels().time()
+
+    @property
+    def count(self) -> int:
+        """Number of observations of a family without labels."""
+        return self.labels().count
+
+
+class MetricsRegistry:
+    """Metric families by name, rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        """The family of that name, created on first use.
+
+        Raises
+        ------
+        ValueError
+            If the name is taken by another type or other labels.
+
+        """
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(
+                        name, documentation, labelnames, **kwargs)
+        if type(metric) is not cls or \
+                metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name!r} is already registered as "
+                             f"a {metric.TYPE} with the labels "
+                             f"{metric.labelnames}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=(),
+                unit: str = "") -> Counter:
+        """Counter family, created on first use."""
+        return self._get(Counter, name, documentation, labelnames,
+                         unit=unit)
+
+    def gauge(self, name: str, documentation: str, labelnames=(),
+              unit: str = "") -> Gauge:
+        """Gauge family, created on first use."""
+        return self._get(Gauge, name, documentation, labelnames, unit=unit)
+
+    def histogram(self, name: str, documentation: str, labelnames=(),
+                  unit: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        """Histogram family, created on first use."""
+        return self._get(Histogram, name, documentation, labelnames,
+                         unit=unit, buckets=buckets)
+
+    def render(self) -> str:
+        """Every family in the OpenMetrics text format."""
+        lines = []
+        for name in sorted(self._metrics):
+            lines += self._metrics[name].render()
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class CacheMetrics:
+    """Lookups of a cache, exported with the cache's hit ratio.
+
+    Parameters
+    ----------
+    cache : str
+        Name of the cache, the value of the `cache` label.
+    registry : MetricsRegistry, optional
+        Defaults to the shared registry.
+
+    """
+
+    def __init__(self, cache: str, registry: MetricsRegistry = None):
+        registry = registry or metrics()
+        requests = registry.counter("app_cache_requests",
+                                    "Cache lookups by cache and result",
+                                    ("cache", "result"))
+        self._hits = requests.labels(cache=cache, result="hit")
+        self._misses = requests.labels(cache=cache, result="miss")
+        registry.gauge("app_cache_hit_ratio",
+                       "Share of the lookups answered by the cache",
+                       ("cache",), unit="ratio").labels(
+                           cache=cache).set_function(self.hit_ratio)
+
+    def record(self, hit: bool):
+        """Count a lookup."""
+        (self._hits if hit else self._misses).inc()
+
+    def hit_ratio(self):
+        """Hits per lookup, None before the first lookup."""
+        total = self._hits.value + self._misses.value
+        return self._hits.value / total if total else None
+
+
+class StallMonitor(QObject):
+    """Count the times the event loop was blocked.
+
+    A timer expects to fire every `check_interval_ms`; when it fires late
+    by `threshold_ms` or more, the event loop was busy for that long.
+
+    Parameters
+    ----------
+    registry : MetricsRegistry, optional
+        Defaults to the shared registry.
+    check_interval_ms, threshold_ms : int
+        Interval of the timer and smallest lateness counted as a stall.
+    parent : QObject, optional
+        Parent of the monitor.
+
+    """
+
+    CHECK_INTERVAL_MS = 50
+    STALL_THRESHOLD_MS = 100
+
+    def __init__(self, registry: MetricsRegistry = None,
+                 check_interval_ms: int = CHECK_INTERVAL_MS,
+                 threshold_ms: int = STALL_THRESHOLD_MS, parent=None):
+        super().__init__(parent)
+        registry = registry or metrics()
+        self.check_interval_ms = check_interval_ms
+        self.threshold_ms = threshold_ms
+        self._stalls = registry.counter(
+            "app_event_loop_stalls",
+            f"Times the event loop was blocked for {threshold_ms} ms or "
+            "longer")
+        self._durations = registry.histogram(
+            "app_event_loop_stall_seconds",
+            "How long the event loop was blocked, of the stalls",
+            unit="seconds")
+        self._last_check = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(check_interval_ms)
+        self._timer.timeout.connect(self._check)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the event loop is monitored."""
+        return self._timer.isActive()
+
+    def start(self):
+        """Start monitoring the event loop of the calling thread."""
+        if not self.is_running:
+            self._last_check = time.perf_counter()
+            self._timer.start()
+
+    def stop(self):
+        """Stop monitoring."""
+        self._timer.stop()
+
+    def _check(self):
+        """Count a stall if the timer fired late."""
+        now = time.perf_counter()
+        blocked = now - self._last_check - self.check_interval_ms / 1e3
+        self._last_check = now
+        if blocked * 1e3 >= self.threshold_ms:
+            self._stalls.inc()
+            self._durations.observe(blocked)
+            logger.debug("Event loop blocked for %.0f ms", blocked * 1e3)
+
+
+class MetricsExporter(QObject):
+    """Export the metrics to a file on an interval or over local HTTP.
+
+    Exporting also starts a StallMonitor on the calling thread's event
+    loop.
+
+    Parameters
+    ----------
+    registry : MetricsRegistry, optional
+        Defaults to the shared registry.
+    parent : QObject, optional
+        Parent of the exporter.
+
+    """
+
+    # Largest request accepted, the endpoint only serves GET /metrics
+    MAX_REQUEST_BYTES = 8192
+
+    def __init__(self, registry: MetricsRegistry = None, parent=None):
+        super().__init__(parent)
+        self.registry = registry or metrics()
+        self.filepath = None
+        self.stall_monitor = StallMonitor(self.registry, parent=self)
+        self._file_timer = QTimer(self)
+        self._file_timer.timeout.connect(self.write_file)
+        self._server = None
+        # Socket: bytes of its request received so far
+        self._requests = {}
+
+    @classmethod
+    def from_environment(cls, parent=None):
+        """Exporter configured by APP_METRICS_*, None if not enabled."""
+        filepath = os.environ.get(ENV_FILE)
+        port = os.environ.get(ENV_PORT)
+        if not filepath and not port:
+            return None
+        exporter = cls(parent=parent)
+        try:
+            if filepath:
+                exporter.export_to_file(filepath, float(
+                    os.environ.get(ENV_INTERVAL, DEFAULT_INTERVAL_S)))
+            if port:
+                exporter.listen(int(port))
+        except ValueError:
+            logger.warning("Invalid %s or %s, metrics not exported",
+                           ENV_INTERVAL, ENV_PORT)
+            exporter.stop()
+            return None
+        return exporter
+
+    @property
+    def port(self):
+        """Port of the HTTP endpoint, None if not listening."""
+        if self._server is None or not self._server.isListening():
+            return None
+        return self._server.serverPort()
+
+    def export_to_file(self, filepath: str,
+                       interval_s: float = DEFAULT_INTERVAL_S):
+        """Write the metrics to `filepath` now and every `interval_s`."""
+        if self.filepath is None:
+            # The last values of the session, e.g. its slowest stalls
+            QCoreApplication.instance().aboutToQuit.connect(self.write_file)
+        self.filepath = filepath
+        self.write_file()
+        self._file_timer.start(int(interval_s * 1000))
+        self.stall_monitor.start()
+        logger.info("Writing metrics to %s every %g s", filepath, interval_s)
+
+    def write_file(self):
+        """Replace the file with the current metrics.
+
+        The file is replaced in one step, so a collector never reads a
+        half-written file.
+        """
+        temp_filepath = f"{self.filepath}.tmp"
+        try:
+            with open(temp_filepath, "w", encoding="utf-8",
+                      newline="\n") as file:
+                file.write(self.registry.render())
+            os.replace(temp_filepath, self.filepath)
+        except OSError as error:
+            logger.warning("Could not write metrics to %s: %s",
+                           self.filepath, error)
+
+    def listen(self, port: int = 0) -> bool:
+        """Serve the metrics at http://127.0.0.1:<port>/metrics.
+
+        Parameters
+        ----------
+        port : int
+            Port to listen on, 0 for any free port (see `port`).
+
+        Returns
+        -------
+        bool
+            False if the port cannot be bound.
+
+        """
+        if self._server is None:
+            self._server = QTcpServer(self)
+            self._server.newConnection.connect(self._on_new_connection)
+        if not self._server.listen(
+                QHostAddress(QHostAddress.SpecialAddress.LocalHost), port):
+            logger.warning("Could not serve metrics on port %d: %s", port,
+                           self._server.errorString())
+            return False
+        self.stall_monitor.start()
+        logger.info("Serving metrics on http://127.0.0.1:%d/metrics",
+                    self.port)
+        return True
+
+    def stop(self):
+        """Stop exporting and monitoring."""
+        self._file_timer.stop()
+        if self._server is not None:
+            self._server.close()
+        self.stall_monitor.stop()
+
+    def _on_new_connection(self):
+        """Read the requests of new clients."""
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._requests[socket] = b""
+            socket.readyRead.connect(partial(self._on_ready_read, socket))
+            socket.disconnected.connect(partial(self._forget, socket))
+
+    def _forget(self, socket):
+        """Drop a disconnected client."""
+        self._requests.pop(socket, None)
+        socket.deleteLater()
+
+    def _on_ready_read(self, socket):
+        """Answer a request once its headers are complete."""
+        if socket not in self._requests:
+            return
+        request = self._requests[socket] + bytes(socket.readAll())
+        self._requests[socket] = request
+        if b"\r\n\r\n" in request:
+            del self._requests[socket]
+            self._respond(socket, request.split(b"\r\n", 1)[0])
+        elif len(request) > self.MAX_REQUEST_BYTES:
+            del self._requests[socket]
+            socket.abort()
+
+    def _respond(self, socket, request_line: bytes):
+        """Send the metrics for GET /metrics, 404 for anything else."""
+        parts = request_line.decode("latin-1").split()
+        method = parts[0] if parts else ""
+        path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+        if method in ("GET", "HEAD") and path in ("/", "/metrics"):
+            status, content_type = "200 OK", CONTENT_TYPE
+            body = self.registry.render().encode("utf-8")
+        else:
+            status, content_type = "404 Not Found", "text/plain"
+            body = b"Only /metrics is served\n"
+        head = (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        socket.write(head.encode("ascii") + (b"" if method == "HEAD"
+                                             else body))
+        socket.disconnectFromHost()
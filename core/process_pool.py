@@ -0,0 +1,253 @@
+"""
+process_pool.py
+
+Run CPU-heavy work, such as image decoding, in worker processes.
+
+Threads do not speed up pure Python or GIL-holding work, so this service
+runs it on a pool of worker processes, one per CPU core by default. Large
+results are not pickled back: a worker writes its pixels into a block of
+shared memory and only returns a small SharedImageInfo describing it. The
+GUI side wraps the block as a QImage without copying it, see SharedImage.
+
+Workers are started with the "spawn" method, since forking a process that
+runs Qt threads is not safe, and only once the first task is submitted.
+
+Usage:
+    pool = ProcessPoolService()
+    task = pool.submit(decode_image, path, 512, 512)
+    task.finished.connect(on_decoded)   # receives a SharedImage
+
+    def on_decoded(shared):
+        with shared:
+            label.setPixmap(QPixmap.fromImage(shared.image))
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from core.logger import logger
+
+# Format of the shared pixel buffers, the fastest format to paint
+SHARED_IMAGE_FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+
+
+class SharedImageInfo(NamedTuple):
+    """Picklable description of an image in shared memory."""
+
+    name: str
+    width: int
+    height: int
+    bytes_per_line: int
+    image_format: int
+
+
+class SharedImage:
+    """QImage over a shared memory block written by a worker process.
+
+    The QImage uses the shared memory directly, so it is only valid until
+    `release` is called; use `image.copy()` to keep the pixels longer.
+    Releasing also frees the shared memory block. It can be used as a
+    context manager that releases on exit.
+    """
+
+    def __init__(self, info: SharedImageInfo):
+        self.info = info
+        self._shm = shared_memory.SharedMemory(name=info.name)
+        # A raw pointer: a QImage built from the buffer object would touch
+        # it again when destroyed, even after the memory is unmapped
+        self.image = QImage(sip.voidptr(self._shm.buf), info.width,
+                            info.height,
+                            info.bytes_per_line,
+                            QImage.Format(info.image_format))
+
+    def release(self):
+        """Drop the QImage and free the shared memory."""
+        if self._shm is None:
+            return
+        # The QImage must be gone before the memory is unmapped
+        self.image = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+
+def image_to_shared_memory(image: QImage) -> SharedImageInfo:
+    """Copy an image into a new shared memory block (worker side).
+
+    The block is left for the receiving SharedImage to free.
+    """
+    image = image.convertToFormat(SHARED_IMAGE_FORMAT)
+    size = image.sizeInBytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        bits = image.constBits()
+        bits.setsize(size)
+        shm.buf[:size] = bits
+        return SharedImageInfo(shm.name, image.width(), image.height(),
+                               image.bytesPerLine(),
+                               SHARED_IMAGE_FORMAT.value)
+    except BaseException:
+        shm.unlink()
+        raise
+    finally:
+        shm.close()
+
+
+def decode_image(path: str, max_width: int = 0,
+                 max_height: int = 0) -> SharedImageInfo:
+    """Decode an image file into shared memory (worker side).
+
+    Parameters
+    ----------
+    path : str
+        Image file to decode.
+    max_width, max_height : int
+        Bounding box to decode into, keeping the aspect ratio. Readers that
+        support it decode at the reduced size directly. 0 means no limit.
+
+    Raises
+    ------
+    OSError
+        If the file cannot be decoded.
+
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (max_width or max_height):
+        bounds = size.scaled(max_width or size.width(),
+                             max_height or size.height(),
+                             Qt.AspectRatioMode.KeepAspectRatio)
+        if bounds.width() < size.width():
+            reader.setScaledSize(bounds)
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"Could not decode {path}: {reader.errorString()}")
+    return image_to_shared_memory(image)
+
+
+class ProcessTask(QObject):
+    """A task submitted to the process pool.
+
+    Its signals are emitted on the GUI thread. SharedImageInfo results are
+    delivered as SharedImage objects, which the receiver must release.
+    """
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+    def __init__(self, future, parent=None):
+        super().__init__(parent)
+        self.future = future
+        self._cancelled = False
+
+    def cancel(self):
+        """Cancel the task. A result that still arrives is discarded."""
+        self._cancelled = True
+        self.future.cancel()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """Whether the task was cancelled."""
+        return self._cancelled
+
+
+class ProcessPoolService(QObject):
+    """Process pool whose results are delivered as Qt signals.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of worker processes. Defaults to the number of CPU cores.
+    parent : QObject, optional
+        Parent of the service.
+
+    """
+
+    # How often finished tasks are collected while tasks are in flight
+    POLL_INTERVAL_MS = 5
+
+    def __init__(self, max_workers: int = None, parent=None):
+        super().__init__(parent)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._tasks = {}
+
+        # The executor reports from a plain Python thread, so instead of
+        # signalling from there, the GUI thread collects the finished tasks
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(self.POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self._collect_finished_tasks)
+
+    def submit(self, func, *args, **kwargs) -> ProcessTask:
+        """Run `func(*args, **kwargs)` in a worker process.
+
+        `func` and its arguments must be picklable, i.e. `func` must be a
+        module level function.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        task = ProcessTask(self._executor.submit(func, *args, **kwargs),
+                           self)
+        self._tasks[task.future] = task
+        self._poll_timer.start()
+        return task
+
+    def shutdown(self, wait: bool = True):
+        """Cancel the queued tasks and stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        self._collect_finished_tasks()
+
+    def _collect_finished_tasks(self):
+        """Deliver the outcome of every task that finished."""
+        for future in [f for f in self._tasks if f.done()]:
+            self._deliver(self._tasks.pop(future))
+        if not self._tasks:
+            self._poll_timer.stop()
+
+    def _deliver(self, task):
+        """Emit the outcome of a finished task."""
+        try:
+            result = task.future.result()
+        except CancelledError:
+            task.cancelled.emit()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            if task.is_cancelled:
+                task.cancelled.emit()
+            else:
+                logger.error("Process task failed", exc_info=error)
+                task.failed.emit(error)
+        else:
+            if isinstance(result, SharedImageInfo):
+                result = SharedImage(result)
+            if task.is_cancelled:
+                if isinstance(result, SharedImage):
+                    result.release()
+                task.cancelled.emit()
+            else:
+                task.finished.emit(result)
+        task.deleteLater()
@@ -0,0 +1,306 @@
+"""
+profiler.py
+
+Built-in profiler, so that users can send a profile of a slow session
+without a debugger or extra tools.
+
+Two modes:
+    - "sample" (default): a background thread records the Python stack of
+      every thread, from sys._current_frames, every SAMPLE_INTERVAL_S. The
+      application runs at full speed between samples, and the task
+      scheduler's threads are profiled along with the GUI thread.
+    - "cprofile": every call on the GUI thread is timed by cProfile. Exact
+      call counts, but the application runs several times slower and other
+      threads are not seen.
+A profile is written next to the logs:
+    - profile-<time>.speedscope.json, flame graphs per thread for
+      https://www.speedscope.app (sampling only, cProfile records no
+      stacks).
+    - profile-<time>.pstats, for `python -m pstats` or snakeviz. Sampled
+      times are the number of samples times the sampling interval.
+
+Usage:
+    profiler = Profiler()
+    profiler.finished.connect(on_profile_written)   # list of file paths
+    profiler.start(seconds=10)
+"""
+
+import collections
+import cProfile
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.logger import LOG_DIR, logger
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+MODES = (SAMPLE, CPROFILE)
+DEFAULT_SECONDS = 10
+# 100 samples per second, about 1% of one core for a few threads
+SAMPLE_INTERVAL_S = 0.01
+
+
+def frame_key(code) -> tuple:
+    """(file, first line, function) of a code object, as pstats keys it."""
+    return (code.co_filename, code.co_firstlineno,
+            getattr(code, "co_qualname", code.co_name))
+
+
+class StackSampler:
+    """Record the stacks of all Python threads from a background thread.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between samples.
+
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S):
+        self.interval = interval
+        # (thread name, code objects from the outermost frame): samples
+        self.samples = collections.Counter()
+        # Rounds of samples taken, each sampling every thread once
+        self.rounds = 0
+        self.duration = 0.0
+        self._start_time = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether samples are being taken."""
+        return self._thread is not None
+
+    @property
+    def seconds_per_sample(self) -> float:
+        """Time a sample stands for, measured rather than nominal."""
+        return self.duration / self.rounds if self.rounds else self.interval
+
+    def start(self):
+        """Start sampling."""
+        self._stop_event.clear()
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run,
+                                        name="StackSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the last sample."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.duration += time.perf_counter() - self._start_time
+
+    def sample(self, skip_ident: int = None):
+        """Record the current stack of every thread but `skip_ident`."""
+        names = {thread.ident: thread.name
+                 for thread in threading.enumerate()}
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[(names.get(ident, f"Thread {ident}"),
+                          tuple(stack))] += 1
+        self.rounds += 1
+
+    def _run(self):
+        """Sample at a fixed rate until stopped (sampler thread)."""
+        own_ident = threading.get_ident()
+        next_time = time.perf_counter()
+        while True:
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                # Fell behind, e.g. the GIL was held, skip the missed samples
+                next_time -= delay
+                delay = 0
+            if self._stop_event.wait(delay):
+                return
+            self.sample(own_ident)
+
+    def write_speedscope(self, filepath: str, name: str = "Profile"):
+        """Write a speedscope file with a sampled profile per thread."""
+        frames = []
+        frame_indices = {}
+        profiles = {}
+        weight = self.seconds_per_sample
+        for (thread_name, stack), count in self.samples.items():
+            indices = []
+            for code in stack:
+                index = frame_indices.get(code)
+                if index is None:
+                    index = frame_indices[code] = len(frames)
+                    filename, line, function = frame_key(code)
+                    frames.append({"name": function, "file": filename,
+                                   "line": line})
+                indices.append(index)
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled", "name": thread_name, "unit": "seconds",
+                "startValue": 0, "endValue": 0, "samples": [],
+                "weights": []})
+            profile["samples"].append(indices)
+            profile["weights"].append(count * weight)
+            profile["endValue"] += count * weight
+
+        # The GUI thread first, speedscope opens the first profile
+        ordered = sorted(profiles.values(),
+                         key=lambda profile: profile["name"] != "MainThread")
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "core.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": ordered,
+            }
+        with open(filepath, "w", encoding="utf-8") as file:
+            json.dump(document, file)
+
+    def stats(self) -> dict:
+        """Samples of all threads as a pstats dictionary.
+
+        A function's own time is the time it was the innermost frame, its
+        cumulative time the time it was on the stack, and its call count
+        the number of samples it was on the stack.
+        """
+        weight = self.seconds_per_sample
+        # function: [calls, own time, cumulative time]
+        totals = collections.defaultdict(lambda: [0, 0.0, 0.0])
+        # (caller, callee): [calls, own time, cumulative time]
+        edges = collections.defaultdict(lambda: [0, 0.0, 0.0])
+        for (_thread_name, stack), count in self.samples.items():
+            keys = [frame_key(code) for code in stack]
+            if not keys:
+                continue
+            seconds = count * weight
+            totals[keys[-1]][1] += seconds
+            # Recursive functions are counted once per sample
+            for key in set(keys):
+                totals[key][0] += count
+                totals[key][2] += seconds
+            for pair in set(zip(keys, keys[1:])):
+                edge = edges[pair]
+                edge[0] += count
+                edge[2] += seconds
+            if len(keys) > 1:
+                edges[keys[-2], keys[-1]][1] += seconds
+
+        callers = collections.defaultdict(dict)
+        for (caller, callee), (calls, own, cumulative) in edges.items():
+            callers[callee][caller] = (calls, calls, own, cumulative)
+        return {key: (calls, calls, own, cumulative, callers[key])
+                for key, (calls, own, cumulative) in totals.items()}
+
+    def write_pstats(self, filepath: str):
+        """Write the samples in the format of pstats.Stats.dump_stats."""
+        with open(filepath, "wb") as file:
+            marshal.dump(self.stats(), file)
+
+
+class Profiler(QObject):
+    """Profile the running application for a number of seconds.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory the profiles are written to.
+    parent : QObject, optional
+        Parent of the profiler.
+
+    """
+
+    # Paths of the files written
+    finished = pyqtSignal(list)
+
+    def __init__(self, output_dir: str = LOG_DIR, parent=None):
+        super().__init__(parent)
+        self.output_dir = output_dir
+        self.mode = None
+        self._sampler = None
+        self._profile = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.stop)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a profile is being recorded."""
+        return self.mode is not None
+
+    def start(self, seconds: float = DEFAULT_SECONDS, mode: str = SAMPLE,
+              interval: float = SAMPLE_INTERVAL_S) -> bool:
+        """Record a profile, written once `seconds` have passed.
+
+        Must be called from the GUI thread, which is the one cProfile
+        profiles.
+
+        Returns
+        -------
+        bool
+            False if a profile is already being recorded.
+
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}")
+        if self.is_running:
+            return False
+        self.mode = mode
+        if mode == SAMPLE:
+            self._sampler = StackSampler(interval)
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._timer.start(int(seconds * 1000))
+        logger.info("Profiling for %g s (%s)", seconds, mode)
+        return True
+
+    def stop(self) -> list:
+        """Stop recording and write the profile.
+
+        Returns
+        -------
+        list
+            Paths of the files written, also emitted by finished.
+
+        """
+        if not self.is_running:
+            return []
+        self._timer.stop()
+        if self._profile is not None:
+            self._profile.disable()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = time.strftime("profile-%Y%m%d-%H%M%S")
+        base = os.path.join(self.output_dir, name)
+        filepaths = []
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler.write_speedscope(f"{base}.speedscope.json", name)
+            self._sampler.write_pstats(f"{base}.pstats")
+            filepaths += [f"{base}.speedscope.json", f"{base}.pstats"]
+        else:
+            self._profile.dump_stats(f"{base}.pstats")
+            filepaths.append(f"{base}.pstats")
+        self.mode = None
+        self._sampler = None
+        self._profile = None
+
+        logger.info("Profile written to %s", ", ".join(filepaths))
+        self.finished.emit(filepaths)
+        return filepaths
@@ -0,0 +1,170 @@
+"""
+qss_optimizer.py
+
+Shrink a formatted style sheet before it is handed to Qt. Qt's CSS parser
+runs on every `setStyleSheet` call, so the sheet is optimised once, after
+the theme keywords have been substituted:
+    1. Comments and optional whitespace are stripped.
+    2. Rules with identical declarations are merged into one selector list.
+    3. Selectors that can never match a widget of the app are dropped.
+
+Merging is only done when it cannot change which rule wins, i.e. when no
+rule between the two merged rules sets a property of the same family (e.g.
+"border" and "border-radius").
+
+The results are memoized, since every theme always formats to the same
+style sheet.
+
+Usage:
+    from core.qss_optimizer import optimize_stylesheet
+
+    app.setStyleSheet(optimize_stylesheet(stylesheet))
+"""
+
+import functools
+import importlib
+import pkgutil
+import re
+
+from core.qss_parser import format_rules, parse_rules
+
+# Type names in a selector: a capitalised word that is not preceded by a
+# pseudo-state, sub-control, id or class marker
+TYPE_RE = re.compile(r"(?<![\w:#.\-])([A-Z]\w*)")
+ID_RE = re.compile(r"#([\w\-]+)")
+ATTRIBUTE_RE = re.compile(r"\[[^\]]*\]")
+
+_widget_types = None
+
+
+def widget_types() -> frozenset:
+    """Names of every widget class a selector can match in this app.
+
+    These are the QWidget subclasses of QtWidgets plus the custom widgets
+    defined in the `ui` package. Qt matches type selectors against the class
+    name and every base class name, so all of them count.
+    """
+    global _widget_types  # pylint: disable=global-statement
+    if _widget_types is None:
+        # pylint: disable=import-outside-toplevel
+        from PyQt6 import QtWidgets
+        import ui
+
+        for module in pkgutil.iter_modules(ui.__path__):
+            importlib.import_module(f"ui.{module.name}")
+
+        names = {name for name, obj in vars(QtWidgets).items()
+                 if isinstance(obj, type) and
+                 issubclass(obj, QtWidgets.QWidget)}
+        pending = [QtWidgets.QWidget]
+        while pending:
+            cls = pending.pop()
+            names.add(cls.__name__)
+            pending.extend(cls.__subclasses__())
+        _widget_types = frozenset(names)
+    return _widget_types
+
+
+def _property_family(declaration: str) -> str:
+    """Family of the declared property, e.g. "border" for "border-radius"."""
+    return declaration.split(":", 1)[0].strip().split("-")[0]
+
+
+def merge_identical_rules(rules: list) -> list:
+    """Merge rules that have identical declarations.
+
+    A later rule is merged into an earlier one with the same declarations
+    unless a rule in between declares a property of the same family, since
+    moving it forward could then change the result of the cascade.
+
+    Parameters
+    ----------
+    rules : list
+        Rules as returned by `qss_parser.parse_rules`.
+
+    Returns
+    -------
+    list
+        The merged rules, in source order.
+
+    """
+    merged = []
+    index_by_body = {}
+    for selector, declarations in rules:
+        body = tuple(declarations)
+        families = {_property_family(d) for d in declarations}
+        target = index_by_body.get(body)
+        if target is not None and not any(
+                families & {_property_family(d) for d in merged[i][1]}
+                for i in range(target + 1, len(merged))):
+            target_selector, _ = merged[target]
+            known = target_selector.split(", ")
+            extra = [s for s in selector.split(", ") if s not in known]
+            merged[target] = (", ".join(known + extra), declarations)
+            continue
+        index_by_body[body] = len(merged)
+        merged.append((selector, declarations))
+    return merged
+
+
+def drop_unused_rules(rules: list, used_types=None,
+                      used_object_names=None) -> list:
+    """Drop the selectors that can never match a widget of the app.
+
+    Parameters
+    ----------
+    rules : list
+        Rules as returned by `qss_parser.parse_rules`.
+    used_types : set, optional
+        Widget class names a type selector may refer to. Defaults to
+        `widget_types()`.
+    used_object_names : set, optional
+        Object names an id selector may refer to. None keeps every id
+        selector.
+
+    Returns
+    -------
+    list
+        The rules whose selector lists still have at least one selector.
+
+    """
+    if used_types is None:
+        used_types = widget_types()
+
+    def is_used(selector):
+        selector = ATTRIBUTE_RE.sub("", selector)
+        if not set(TYPE_RE.findall(selector)) <= used_types:
+            return False
+        return (used_object_names is None or
+                set(ID_RE.findall(selector)) <= used_object_names)
+
+    kept = []
+    for selector, declarations in rules:
+        selectors = [s for s in selector.split(", ") if is_used(s)]
+        if selectors and declarations:
+            kept.append((", ".join(selectors), declarations))
+    return kept
+
+
+@functools.lru_cache(maxsize=32)
+def optimize_stylesheet(qss: str, used_types: frozenset = None,
+                        used_object_names: frozenset = None) -> str:
+    """Strip, merge and prune a style sheet.
+
+    Parameters
+    ----------
+    qss : str
+        Formatted style sheet, i.e. without any theme keywords left.
+    used_types : frozenset, optional
+        See `drop_unused_rules`.
+    used_object_names : frozenset, optional
+        See `drop_unused_rules`.
+
+    Returns
+    -------
+    str
+        Compact style sheet with the same effect on the app's widgets.
+
+    """
+    rules = drop_unused_rules(parse_rules(qss), used_types, used_object_names)
+    return format_rules(merge_identical_rules(rules), compact=True)
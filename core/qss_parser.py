@@ -0,0 +1,115 @@
+"""
+qss_parser.py
+
+Minimal parser for Qt style sheets (QSS).
+
+QSS has no nested blocks or at-rules, so a style sheet is a flat list of
+rules, each a selector and its declarations. The parser keeps the rules in
+source order since the order decides which rule wins between selectors of
+equal specificity.
+
+Usage:
+    rules = parse_rules(qss)
+    structural, themed = split_themed_rules(rules)
+    qss = format_rules(structural)
+"""
+
+import re
+
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+DECLARATION_SEPARATOR_RE = re.compile(r"\s*:\s*")
+
+
+def parse_rules(qss: str) -> list:
+    """Parse a style sheet into a list of (selector, declarations) tuples.
+
+    Comments are removed, the whitespace inside selectors and declarations
+    is collapsed to single spaces, selector lists are joined with ", " and
+    declarations are written as "property: value".
+
+    Parameters
+    ----------
+    qss : str
+        Style sheet text.
+
+    Returns
+    -------
+    list
+        One (selector, [declaration, ...]) tuple per rule, in source order.
+
+    """
+    rules = []
+    for match in RULE_RE.finditer(COMMENT_RE.sub("", qss)):
+        selector = ", ".join(" ".join(part.split())
+                             for part in match.group(1).split(","))
+        declarations = [
+            DECLARATION_SEPARATOR_RE.sub(": ", " ".join(declaration.split()),
+                                         count=1)
+            for declaration in match.group(2).split(";")
+            if declaration.strip()]
+        rules.append((selector, declarations))
+    return rules
+
+
+def format_rules(rules: list, compact: bool = False) -> str:
+    """Turn (selector, declarations) tuples back into style sheet text.
+
+    Parameters
+    ----------
+    rules : list
+        Rules as returned by `parse_rules`.
+    compact : bool
+        If True, emit the rules without any optional whitespace.
+
+    Returns
+    -------
+    str
+        Style sheet text.
+
+    """
+    if compact:
+        return "".join(
+            f"{selector.replace(', ', ',')}{{" +
+            ";".join(DECLARATION_SEPARATOR_RE.sub(":", declaration, count=1)
+                     for declaration in declarations) +
+            "}"
+            for selector, declarations in rules)
+    return "\n".join(
+        f"{selector} {{\n" +
+        "".join(f"    {declaration};\n" for declaration in declarations) +
+        "}"
+        for selector, declarations in rules)
+
+
+def split_themed_rules(rules: list, marker: str = "@") -> tuple:
+    """Split rules into structural and themed declarations.
+
+    A declaration is themed if it references a theme keyword (contains
+    `marker`). A rule with both kinds of declarations appears in both
+    results, each time with only its matching declarations. Every property
+    is expected to be either always themed or always structural, otherwise
+    applying the two parts at different levels changes which one wins.
+
+    Parameters
+    ----------
+    rules : list
+        Rules as returned by `parse_rules`.
+    marker : str
+        Prefix of the theme keywords.
+
+    Returns
+    -------
+    tuple
+        (structural rules, themed rules), both in source order.
+
+    """
+    structural, themed = [], []
+    for selector, declarations in rules:
+        fixed = [d for d in declarations if marker not in d]
+        variable = [d for d in declarations if marker in d]
+        if fixed:
+            structural.append((selector, fixed))
+        if variable:
+            themed.append((selector, variable))
+    return structural, themed
@@ -0,0 +1,191 @@
+"""
+rate_limit.py
+
+Run the slot of a high-frequency signal at most once per interval, with
+the latest arguments.
+
+Spinning a spin box, arrowing through a combo box or dragging a window
+emits a signal on every step, and the work connected to it, e.g. compiling
+a stylesheet or saving the configuration, is only needed for the value the
+user ends up with. The limiters are callables that stand between a signal
+and a slot and drop the intermediate values:
+    Debouncer   Runs the slot once the calls stopped for the interval,
+                e.g. saving a window's geometry after it stopped moving.
+    Throttler   Runs the slot at once, then at most once per interval
+                while the calls go on, and once more after them, e.g. a
+                preview that should follow the user.
+    Coalescer   Runs the slot once, the interval after the first call,
+                however many calls follow; with an interval of 0 it
+                merges the calls of one event loop turn.
+
+Every limiter is a QObject. Give it a parent, by default the object the
+slot is a method of, so that it is deleted along with the slot. Call
+`flush()` to run a pending call at once, e.g. before a dialog is accepted,
+or `cancel()` to drop it.
+
+Usage:
+    limiter = debounce(spin_box.valueChanged, self._on_value, 300)
+    throttle(combo_box.currentTextChanged, self._preview, 150)
+    coalesce(model.dataChanged, self._refresh)
+    limiter.flush()
+"""
+
+import weakref
+
+from PyQt6.QtCore import QObject
+
+
+def _slot_reference(slot):
+    """A callable returning `slot`, weakly referenced if a QObject method.
+
+    The object of a slot usually keeps the slot's limiter, so a strong
+    reference back would leave the object to the garbage collector.
+    """
+    owner = getattr(slot, "__self__", None)
+    if not isinstance(owner, QObject):
+        return lambda: slot
+    if hasattr(slot, "__func__"):
+        return weakref.WeakMethod(slot)
+    # A method of the Qt class, e.g. deleteLater
+    owner_ref, name = weakref.ref(owner), slot.__name__
+    return lambda: getattr(owner_ref(), name, None)
+
+
+class _Limiter(QObject):
+    """Call `slot` later with the latest arguments it was called with.
+
+    By itself it runs the slot `interval_ms` after the first of a series of
+    calls; the limiters differ in what `_on_call` does with a new call.
+
+    Parameters
+    ----------
+    slot : callable
+        Work to limit, called with the arguments of the latest call. A
+        method of a QObject does not keep its object alive.
+    interval_ms : int
+        Interval of the limiter.
+    parent : QObject, optional
+        Parent of the limiter. Defaults to the object `slot` is a bound
+        method of, if that is a QObject.
+
+    """
+
+    def __init__(self, slot, interval_ms: int, parent=None):
+        owner = getattr(slot, "__self__", None)
+        if parent is None and isinstance(owner, QObject):
+            parent = owner
+        super().__init__(parent)
+        # Returns the slot, None once its object is gone
+        self._slot = _slot_reference(slot)
+        self.interval_ms = interval_ms
+        # Arguments of the latest call not passed on yet, None if none
+        self._args = None
+        # The object's own single-shot timer, cheaper than a QTimer child
+        # as dialogs create limiters for every field. 0 while stopped
+        self._timer_id = 0
+
+    @property
+    def is_pending(self) -> bool:
+        """Whether a call is waiting to be passed on to the slot."""
+        return self._args is not None
+
+    def __call__(self, *args):
+        """Keep the arguments of the latest call and handle the call."""
+        self._args = args
+        self._on_call()
+
+    def flush(self):
+        """Run the pending call now, if there is one."""
+        self._stop_timer()
+        if self._args is not None:
+            self._run()
+
+    def cancel(self):
+        """Drop the pending call."""
+        self._stop_timer()
+        self._args = None
+
+    def timerEvent(self, event):  # pylint: disable=invalid-name
+        """Time out once, like a single-shot timer."""
+        if event.timerId() == self._timer_id:
+            self._stop_timer()
+            self._on_timeout()
+
+    def _start_timer(self):
+        """Start the interval, or start it over."""
+        self._stop_timer()
+        self._timer_id = self.startTimer(self.interval_ms)
+
+    def _stop_timer(self):
+        if self._timer_id:
+            self.killTimer(self._timer_id)
+            self._timer_id = 0
+
+    def _on_call(self):
+        """Start the interval of a new call, unless it is running."""
+        if not self._timer_id:
+            self._start_timer()
+
+    def _run(self):
+        args, self._args = self._args, None
+        slot = self._slot()
+        if slot is not None:
+            slot(*args)
+
+    def _on_timeout(self):
+        if self._args is not None:
+            self._run()
+
+
+class Debouncer(_Limiter):
+    """Run the slot once the calls stopped for `interval_ms`."""
+
+    def _on_call(self):
+        self._start_timer()
+
+
+class Throttler(_Limiter):
+    """Run the slot at once, then at most once per `interval_ms`.
+
+    The last call of a burst is always passed on, at the end of its
+    interval.
+    """
+
+    def _on_call(self):
+        if not self._timer_id:
+            self._run()
+            self._start_timer()
+
+    def _on_timeout(self):
+        if self._args is not None:
+            self._run()
+            # The next call waits a whole interval after this one
+            self._start_timer()
+
+
+class Coalescer(_Limiter):
+    """Run the slot `interval_ms` after the first of a series of calls."""
+
+    def __init__(self, slot, interval_ms: int = 0, parent=None):
+        super().__init__(slot, interval_ms, parent)
+
+
+def debounce(signal, slot, interval_ms: int, parent=None) -> Debouncer:
+    """Connect `signal` to `slot` through a Debouncer."""
+    limiter = Debouncer(slot, interval_ms, parent)
+    signal.connect(limiter)
+    return limiter
+
+
+def throttle(signal, slot, interval_ms: int, parent=None) -> Throttler:
+    """Connect `signal` to `slot` through a Throttler."""
+    limiter = Throttler(slot, interval_ms, parent)
+    signal.connect(limiter)
+    return limiter
+
+
+def coalesce(signal, slot, interval_ms: int = 0, parent=None) -> Coalescer:
+    """Connect `signal` to `slot` through a Coalescer."""
+    limiter = Coalescer(slot, interval_ms, parent)
+    signal.connect(limiter)
+    return limiter
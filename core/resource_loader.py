@@ -0,0 +1,182 @@
+"""
+resource_loader.py
+
+Single point of access to the application's static resources (icons and
+stylesheets).
+
+When the compiled archive `resources/resources.rcc` exists it is registered
+with Qt once at startup. Qt memory-maps the archive, so every asset is read
+from one mapped file through a `:/` path instead of a separate file open.
+During development, or for any asset missing from the archive, the loose file
+in `resources/` is used instead. Paths are absolute, so the application works
+regardless of the directory it is launched from.
+
+The archive is not tracked by git, so it easily outlives edits of the loose
+files. An archive older than any asset, or asset directory, is stale and is
+not registered: the loose files are used until it is rebuilt.
+
+Usage:
+    from core.resource_loader import register_resources, resource_path
+
+    register_resources()
+    icon = QIcon(resource_path("icons/application_icon.svg"))
+
+Build the archive with `python -m resources.build_resources`.
+"""
+
+import fnmatch
+import io
+import os
+
+from PyQt6.QtCore import QDir, QFile, QIODevice, QResource
+
+from core.logger import logger
+from resources.build_resources import ASSET_DIRS
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESOURCE_DIR = os.path.join(APP_DIR, "resources")
+ARCHIVE_PATH = os.path.join(RESOURCE_DIR, "resources.rcc")
+
+_registered_archive = None
+
+
+def register_resources(archive_path: str = ARCHIVE_PATH) -> bool:
+    """Register the compiled resource archive with Qt.
+
+    Safe to call more than once; the archive is only registered the first
+    time.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path to the binary resource archive.
+
+    Returns
+    -------
+    bool
+        True if the archive is registered, False if the loose files will be
+        used instead, also if the archive is older than the loose files.
+
+    """
+    global _registered_archive  # pylint: disable=global-statement
+    if _registered_archive is not None:
+        return True
+    if not os.path.exists(archive_path):
+        logger.info("No resource archive at %s, using loose files.",
+                    archive_path)
+        return False
+    if os.path.getmtime(archive_path) < newest_asset_mtime():
+        logger.warning("Resource archive %s is older than the files in %s, "
+                       "using loose files. Rebuild it with `python -m "
+                       "resources.build_resources`.", archive_path,
+                       RESOURCE_DIR)
+        return False
+    if not QResource.registerResource(archive_path):
+        logger.warning("Could not register resource archive %s, using loose "
+                       "files.", archive_path)
+        return False
+    _registered_archive = archive_path
+    logger.info("Registered resource archive %s", archive_path)
+    return True
+
+
+def newest_asset_mtime(resource_dir: str = RESOURCE_DIR) -> float:
+    """Latest modification time of the loose assets, 0 if there are none.
+
+    The asset directories count as well, as removing a file only changes
+    the modification time of its directory.
+    """
+    newest = 0.0
+    for asset_dir in ASSET_DIRS:
+        for dirpath, dirnames, filenames in os.walk(
+                os.path.join(resource_dir, asset_dir)):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            for path in [dirpath] + [os.path.join(dirpath, name)
+                                     for name in filenames]:
+                try:
+                    newest = max(newest, os.path.getmtime(path))
+                except OSError:
+                    # Removed meanwhile
+                    pass
+    return newest
+
+
+def unregister_resources():
+    """Unregister the resource archive and fall back to the loose files."""
+    global _registered_archive  # pylint: disable=global-statement
+    if _registered_archive is not None:
+        QResource.unregisterResource(_registered_archive)
+        _registered_archive = None
+
+
+def resource_path(relative_path: str) -> str:
+    """Resolve a resource relative to `resources/`.
+
+    Parameters
+    ----------
+    relative_path : str
+        Forward-slash separated path, e.g. "styles/colors_dark.qss".
+
+    Returns
+    -------
+    str
+        The `:/` path inside the registered archive if the asset is in it,
+        otherwise the absolute path of the loose file.
+
+    """
+    if _registered_archive is not None:
+        qt_path = f":/{relative_path}"
+        if QFile.exists(qt_path):
+            return qt_path
+    return os.path.join(RESOURCE_DIR, *relative_path.split("/"))
+
+
+def read_text(path: str) -> str:
+    """Read a text resource from the archive or the file system.
+
+    Line endings are normalised to "\\n" like Python's text mode does.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the resource does not exist.
+
+    """
+    if not path.startswith(":"):
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    file = QFile(path)
+    if not file.open(QIODevice.OpenModeFlag.ReadOnly):
+        raise FileNotFoundError(f"Resource not found: {path}")
+    try:
+        data = bytes(file.readAll()).decode("utf-8")
+    finally:
+        file.close()
+    return io.StringIO(data, newline=None).read()
+
+
+def list_resources(directory: str, pattern: str = "*") -> list:
+    """List the resources in `directory` whose file names match `pattern`.
+
+    Parameters
+    ----------
+    directory : str
+        Forward-slash separated directory relative to `resources/`.
+    pattern : str
+        Shell-style wildcard for the file names.
+
+    Returns
+    -------
+    list
+        Sorted resource paths, resolved as in `resource_path`.
+
+    """
+    names = set()
+    if _registered_archive is not None:
+        names.update(QDir(f":/{directory}").entryList(
+            [pattern], QDir.Filter.Files))
+    loose_dir = os.path.join(RESOURCE_DIR, *directory.split("/"))
+    if os.path.isdir(loose_dir):
+        names.update(fnmatch.filter(os.listdir(loose_dir), pattern))
+    return [resource_path(f"{directory}/{name}") for name in sorted(names)]
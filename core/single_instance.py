@@ -0,0 +1,164 @@
+"""
+single_instance.py
+
+Keep one running instance of the application per user.
+
+The first instance listens on a local socket (a Unix domain socket or a
+Windows named pipe). Every later launch connects to it, sends the files it
+was asked to open and exits, so opening many files from the file manager
+costs one startup instead of one per file, and only one process writes
+the config file.
+
+The forwarding side only needs QtCore and QtNetwork and no application
+object, so a second launch can exit before QtWidgets is even imported.
+
+Usage:
+    if SingleInstance.forward(files):
+        sys.exit(0)
+    app = QApplication(sys.argv)
+    instance = SingleInstance()
+    instance.files_received.connect(main_window.open_files)
+    instance.listen()
+"""
+
+import getpass
+import json
+import re
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+from core.logger import logger
+
+APP_KEY = "pyqt-application-template"
+
+
+def server_name(key: str = APP_KEY) -> str:
+    """Name of the local socket of `key`, unique per user."""
+    try:
+        user = getpass.getuser()
+    except Exception:  # pylint: disable=broad-exception-caught
+        user = "DEFAULT"
+    return re.sub(r"[^\w\-]", "_", f"{key}-{user}")
+
+
+class SingleInstance(QObject):
+    """Local socket server receiving the files of later launches."""
+
+    # Absolute paths of the files another launch was asked to open
+    files_received = pyqtSignal(list)
+
+    TIMEOUT_MS = 500
+
+    def __init__(self, key: str = APP_KEY, parent=None):
+        super().__init__(parent)
+        self.server_name = server_name(key)
+        self._server = None
+        self._buffers = {}
+
+    @staticmethod
+    def forward(files, key: str = APP_KEY,
+                timeout_ms: int = TIMEOUT_MS) -> bool:
+        """Send `files` to the running instance, if there is one.
+
+        Parameters
+        ----------
+        files : list
+            Absolute paths of the files to open. May be empty, which only
+            brings the running instance to the front.
+        key : str
+            Application key the running instance listens with.
+        timeout_ms : int
+            How long to wait for each step of the exchange.
+
+        Returns
+        -------
+        bool
+            True if a running instance accepted the files.
+
+        """
+        socket = QLocalSocket()
+        socket.connectToServer(server_name(key))
+        if not socket.waitForConnected(timeout_ms):
+            return False
+        socket.write(json.dumps({"files": list(files)}).encode() + b"\n")
+        sent = socket.waitForBytesWritten(timeout_ms)
+        socket.disconnectFromServer()
+        if socket.state() != QLocalSocket.LocalSocketState.UnconnectedState:
+            socket.waitForDisconnected(timeout_ms)
+        return sent
+
+    def listen(self) -> bool:
+        """Start accepting files from later launches.
+
+        A socket left behind by a crashed instance is removed. If another
+        instance started listening in the meantime, this one does not take
+        over.
+
+        Returns
+        -------
+        bool
+            True if this process is now the single instance.
+
+        """
+        probe = QLocalSocket()
+        probe.connectToServer(self.server_name)
+        if probe.waitForConnected(self.TIMEOUT_MS):
+            probe.abort()
+            logger.warning("Another instance is already listening on %s",
+                           self.server_name)
+            return False
+        # Nobody answers, so any socket left over is stale
+        QLocalServer.removeServer(self.server_name)
+
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(
+            QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+        if not self._server.listen(self.server_name):
+            logger.error("Could not listen on %s: %s", self.server_name,
+                         self._server.errorString())
+            return False
+        logger.info("Listening for other launches on %s", self.server_name)
+        return True
+
+    def close(self):
+        """Stop accepting files from later launches."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _on_new_connection(self):
+        """Read the message of every pending connection."""
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(
+                lambda s=socket: self._on_disconnected(s))
+            self._on_ready_read(socket)
+
+    def _on_disconnected(self, socket):
+        """Read what is left of the message and drop the connection."""
+        self._on_ready_read(socket)
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def _on_ready_read(self, socket):
+        """Emit the files once a complete message has arrived."""
+        buffer = self._buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        if b"\n" not in buffer:
+            self._buffers[socket] = buffer
+            return
+        del self._buffers[socket]
+        socket.disconnectFromServer()
+        try:
+            files = json.loads(buffer.split(b"\n", 1)[0])["files"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignored malformed message from another launch")
+            return
+        logger.info("Received %d file(s) from another launch", len(files))
+        self.files_received.emit([str(file) for file in files])
@@ -0,0 +1,246 @@
+"""
+subcontroller_registry.py
+
+Registry of the subcontrollers of MainController.
+
+Subcontrollers are declared, not imported: every declaration names the
+class and what the subcontroller reacts to, i.e. menu actions, signals of
+MainController and file types. The class is only imported and constructed
+the first time one of those is used, so startup time does not grow with the
+number of features.
+
+Declarations come from two places:
+    1. The manifest `resources/subcontrollers.yaml`, read at startup.
+    2. Entry points in the group "my_pyqt_app.subcontrollers" of installed
+       packages. Each entry point refers to a dict with the same keys as a
+       manifest entry, so only that (small) module is imported. Importing
+       `importlib.metadata` alone takes tens of milliseconds, so entry
+       points are read once the event loop runs.
+
+A declaration looks like:
+    exporter:
+      class: core.exporter:ExportController
+      actions:
+        - {menu: "&File", text: "&Export...", slot: on_export}
+      signals:
+        window_theme_changed: on_theme_changed
+      file_types: [".csv", ".tsv"]
+
+The class is constructed with the MainController. Files of the declared
+types are passed to its `open_file(filepath)` method.
+
+Usage:
+    registry = SubcontrollerRegistry(main_controller)
+    registry.load_manifest()
+    registry.call("exporter", "on_export")
+"""
+
+import importlib
+import time
+from functools import partial
+
+import yaml
+from PyQt6.QtCore import QObject, pyqtBoundSignal, pyqtSignal
+
+from core.logger import logger
+from core.resource_loader import read_text, resource_path
+
+ENTRY_POINT_GROUP = "my_pyqt_app.subcontrollers"
+MANIFEST_PATH = "subcontrollers.yaml"
+
+
+class SubcontrollerSpec:
+    """Declaration of a subcontroller, available without importing it.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the subcontroller.
+    target : str
+        "package.module:ClassName" of the subcontroller class.
+    actions : Iterable, optional
+        Dicts with the "menu" title, action "text" and the "slot" to call.
+    signals : dict, optional
+        Names of MainController signals mapped to the slot to call.
+    file_types : Iterable, optional
+        File name suffixes, e.g. ".csv", that are opened by the
+        subcontroller.
+
+    """
+
+    def __init__(self, name, target, actions=(), signals=None, file_types=()):
+        if ":" not in target:
+            raise ValueError(f"Subcontroller {name!r}: class {target!r} is "
+                             "not of the form 'package.module:ClassName'")
+        self.name = name
+        self.target = target
+        self.actions = [dict(action) for action in actions]
+        self.signals = dict(signals or {})
+        self.file_types = [suffix.lower() for suffix in file_types]
+        for action in self.actions:
+            missing = {"menu", "text", "slot"} - set(action)
+            if missing:
+                raise ValueError(f"Subcontroller {name!r}: action is missing "
+                                 f"{', '.join(sorted(missing))}")
+
+    @classmethod
+    def from_dict(cls, name, declaration: dict):
+        """Build a spec from a manifest or entry point declaration."""
+        try:
+            target = declaration["class"]
+        except (KeyError, TypeError) as error:
+            raise ValueError(
+                f"Subcontroller {name!r} does not declare a class") from error
+        return cls(name, target, declaration.get("actions", ()),
+                   declaration.get("signals"),
+                   declaration.get("file_types", ()))
+
+    def __repr__(self) -> str:
+        return f"SubcontrollerSpec({self.name!r}, {self.target!r})"
+
+
+class SubcontrollerRegistry(QObject):
+    """Declared subcontrollers of a MainController, constructed on demand."""
+
+    # Name of a newly registered subcontroller
+    registered = pyqtSignal(str)
+    # Name of a subcontroller that was just constructed
+    loaded = pyqtSignal(str)
+
+    def __init__(self, main_controller):
+        super().__init__(main_controller)
+        self._main_controller = main_controller
+        self._specs = {}
+        self._instances = {}
+
+    def register(self, spec: SubcontrollerSpec):
+        """Add a declaration and connect the signals it reacts to.
+
+        Raises
+        ------
+        ValueError
+            If the name is taken or a signal does not exist.
+
+        """
+        if spec.name in self._specs:
+            raise ValueError(f"Subcontroller {spec.name!r} is already "
+                             "registered")
+        signals = []
+        for signal_name, slot in spec.signals.items():
+            signal = getattr(self._main_controller, signal_name, None)
+            if not isinstance(signal, pyqtBoundSignal):
+                raise ValueError(f"Subcontroller {spec.name!r}: MainController"
+                                 f" has no signal {signal_name!r}")
+            signals.append((signal, slot))
+        # Connect only once every signal is known to exist, so a rejected
+        # declaration leaves no connections behind
+        for signal, slot in signals:
+            signal.connect(partial(self.call, spec.name, slot))
+        self._specs[spec.name] = spec
+        self.registered.emit(spec.name)
+
+    def load_manifest(self, manifest_path: str = None) -> int:
+        """Register the subcontrollers declared in a manifest.
+
+        A manifest that cannot be parsed and broken declarations are logged
+        and skipped.
+
+        Parameters
+        ----------
+        manifest_path : str, optional
+            YAML manifest. Defaults to `resources/subcontrollers.yaml`.
+
+        Returns
+        -------
+        int
+            Number of subcontrollers registered.
+
+        """
+        manifest_path = manifest_path or resource_path(MANIFEST_PATH)
+        try:
+            manifest = yaml.safe_load(read_text(manifest_path)) or {}
+        except FileNotFoundError:
+            return 0
+        except (OSError, yaml.YAMLError):
+            logger.exception("Could not read the subcontroller manifest %s",
+                             manifest_path)
+            return 0
+        if not isinstance(manifest, dict):
+            logger.error("Subcontroller manifest %s is not a mapping",
+                         manifest_path)
+            return 0
+
+        count = 0
+        for name, declaration in manifest.items():
+            try:
+                self.register(SubcontrollerSpec.from_dict(name, declaration))
+                count += 1
+            except (TypeError, ValueError):
+                logger.exception("Could not register subcontroller %s of %s",
+                                 name, manifest_path)
+        return count
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> int:
+        """Register the subcontrollers declared by installed packages.
+
+        A broken entry point is logged and skipped.
+
+        Returns
+        -------
+        int
+            Number of subcontrollers registered.
+
+        """
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import entry_points
+
+        count = 0
+        for entry_point in entry_points(group=group):
+            try:
+                self.register(SubcontrollerSpec.from_dict(
+                    entry_point.name, entry_point.load()))
+                count += 1
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Could not register subcontroller entry "
+                                 "point %s", entry_point.name)
+        return count
+
+    def specs(self) -> list:
+        """Declarations of every registered subcontroller."""
+        return list(self._specs.values())
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether the subcontroller has been constructed."""
+        return name in self._instances
+
+    def get(self, name: str):
+        """Return the subcontroller, importing and constructing it first.
+
+        Raises
+        ------
+        KeyError
+            If no subcontroller of that name is registered.
+
+        """
+        if name not in self._instances:
+            spec = self._specs[name]
+            start = time.perf_counter()
+            module_name, class_name = spec.target.split(":", 1)
+            cls = getattr(importlib.import_module(module_name), class_name)
+            self._instances[name] = cls(self._main_controller)
+            logger.info("Loaded subcontroller %s in %.1f ms", name,
+                        (time.perf_counter() - start) * 1e3)
+            self.loaded.emit(name)
+        return self._instances[name]
+
+    def call(self, name: str, slot: str, *args):
+        """Call a slot of a subcontroller, constructing it if needed."""
+        return getattr(self.get(name), slot)(*args)
+
+    def handler_for_file(self, filepath: str):
+        """Name of the subcontroller that opens `filepath`, or None."""
+        filepath = filepath.lower()
+        for spec in self._specs.values():
+            if any(filepath.endswith(suffix) for suffix in spec.file_types):
+                return spec.name
+        return None
@@ -0,0 +1,306 @@
+"""
+task_scheduler.py
+
+Run work off the GUI thread through one shared mechanism.
+
+Tasks run on a QThreadPool, but are queued by the scheduler itself so that:
+    - Higher priority tasks start first. Tasks of equal priority start in
+      the order they were submitted.
+    - Every category (e.g. "io", "thumbnails") has its own concurrency
+      limit, so a burst of one kind of work cannot starve the others.
+    - Submitting a task with the key of a task still queued or running
+      returns the existing task instead of running the work twice.
+    - Tasks can be cancelled. A queued task never runs, a running task can
+      poll its CancellationToken and its result is discarded.
+
+Results and errors are delivered on the GUI thread through the signals of
+the TaskHandle returned by `submit`, and of the scheduler.
+
+Usage:
+    scheduler = TaskScheduler({"io": 2})
+    handle = scheduler.submit(load_file, path, key=("load", path),
+                              category="io", priority=Priority.HIGH)
+    handle.finished.connect(on_loaded)
+    handle.failed.connect(on_error)
+"""
+
+import enum
+import heapq
+import itertools
+import threading
+
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from core.logger import logger
+
+DEFAULT_CATEGORY = "default"
+
+
+class Priority(enum.IntEnum):
+    """Priority of a task, higher values start first."""
+
+    LOW = -10
+    NORMAL = 0
+    HIGH = 10
+
+
+class TaskCancelled(Exception):
+    """Raised by CancellationToken.raise_if_cancelled."""
+
+
+class CancellationToken:
+    """Thread-safe flag telling a running task to stop early."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Ask the task to stop."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the task was asked to stop."""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """Raise TaskCancelled if the task was asked to stop."""
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class TaskHandle(QObject):
+    """A submitted task. Its signals are emitted on the GUI thread."""
+
+    # Return value of the task
+    finished = pyqtSignal(object)
+    # Exception raised by the task
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+    def __init__(self, scheduler, func, args, kwargs, key, category,
+                 priority, with_token):
+        super().__init__(scheduler)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.category = category
+        self.priority = priority
+        self.token = CancellationToken()
+        self.with_token = with_token
+        self.state = "queued"
+        self._scheduler = scheduler
+
+    def cancel(self):
+        """Cancel the task, see TaskScheduler.cancel."""
+        self._scheduler.cancel(self)
+
+    def is_done(self) -> bool:
+        """Whether the task finished, failed or was cancelled."""
+        return self.state in ("finished", "failed", "cancelled")
+
+    def __repr__(self) -> str:
+        name = getattr(self.func, "__qualname__", repr(self.func))
+        return f"<TaskHandle {name} {self.category} {self.state}>"
+
+
+class _TaskRunnable(QRunnable):
+    """Run a task on a pool thread and report back to the scheduler."""
+
+    def __init__(self, handle, scheduler):
+        super().__init__()
+        self._handle = handle
+        self._scheduler = scheduler
+
+    def run(self):
+        handle = self._handle
+        kwargs = dict(handle.kwargs)
+        if handle.with_token:
+            kwargs["token"] = handle.token
+        try:
+            result = handle.func(*handle.args, **kwargs)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self._report(handle, None, error)
+        else:
+            self._report(handle, result, None)
+
+    def _report(self, handle, result, error):
+        """Hand the outcome to the scheduler's thread.
+
+        A scheduler deleted while the task ran, whose pool waited for the
+        task, is gone already: nobody is waiting for the outcome.
+        """
+        if not sip.isdeleted(self._scheduler):
+            # pylint: disable-next=protected-access
+            self._scheduler._task_done.emit(handle, result, error)
+
+
+class TaskScheduler(QObject):
+    """Prioritised, deduplicating task queue in front of a QThreadPool.
+
+    Parameters
+    ----------
+    category_limits : dict, optional
+        Maximum number of tasks of a category running at the same time.
+        Categories without a limit may use every thread of the pool.
+    thread_pool : QThreadPool, optional
+        Pool to run the tasks on. Defaults to a new pool with one thread
+        per CPU core.
+    parent : QObject, optional
+        Parent of the scheduler.
+
+    """
+
+    task_finished = pyqtSignal(object, object)
+    task_failed = pyqtSignal(object, object)
+    task_cancelled = pyqtSignal(object)
+
+    # Emitted from the pool threads, delivered on the scheduler's thread
+    _task_done = pyqtSignal(object, object, object)
+
+    def __init__(self, category_limits=None, thread_pool=None, parent=None):
+        super().__init__(parent)
+        self.category_limits = dict(category_limits or {})
+        self.thread_pool = thread_pool or QThreadPool(self)
+        self._queue = []
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self._running = {}
+        self._task_done.connect(self._on_task_done)
+
+    def submit(self, func, *args, key=None, category=DEFAULT_CATEGORY,
+               priority=Priority.NORMAL, with_token=False,
+               **kwargs) -> TaskHandle:
+        """Queue `func(*args, **kwargs)` to run on the thread pool.
+
+        Parameters
+        ----------
+        func : callable
+            Work to run. It must not touch widgets.
+        key : hashable, optional
+            Identity of the work. While a task with the same key is queued
+            or running, that task is returned instead of queueing another,
+            unless it was cancelled.
+        category : str
+            Category whose concurrency limit applies.
+        priority : int
+            Higher priorities start first, see Priority.
+        with_token : bool
+            Pass the task's CancellationToken to `func` as `token`.
+
+        Returns
+        -------
+        TaskHandle
+            The task, to connect to and to cancel.
+
+        """
+        handle = self._in_flight.get(key) if key is not None else None
+        # A cancelled task that is still running will not deliver a result
+        if handle is not None and not handle.token.cancelled:
+            if handle.state == "queued" and priority > handle.priority:
+                self._requeue(handle, priority)
+            return handle
+
+        handle = TaskHandle(self, func, args, kwargs, key, category,
+                            priority, with_token)
+        if key is not None:
+            self._in_flight[key] = handle
+        heapq.heappush(self._queue,
+                       (-priority, next(self._sequence), handle))
+        self._start_tasks()
+        return handle
+
+    def cancel(self, handle: TaskHandle):
+        """Cancel a task.
+
+        A queued task is dropped and reported as cancelled right away. A
+        running task has its token cancelled and is reported as cancelled
+        once it returns, whatever its result.
+        """
+        if handle.is_done():
+            return
+        handle.token.cancel()
+        if handle.state == "queued":
+            self._queue = [entry for entry in self._queue
+                           if entry[2] is not handle]
+            heapq.heapify(self._queue)
+            self._complete(handle, "cancelled")
+
+    def cancel_all(self):
+        """Cancel every queued and running task."""
+        for _, _, handle in list(self._queue):
+            self.cancel(handle)
+        for handles in list(self._running.values()):
+            for handle in list(handles):
+                self.cancel(handle)
+
+    def pending_count(self) -> int:
+        """Number of tasks waiting to start."""
+        return len(self._queue)
+
+    def running_count(self, category=None) -> int:
+        """Number of running tasks, in `category` or in total."""
+        if category is not None:
+            return len(self._running.get(category, ()))
+        return sum(len(handles) for handles in self._running.values())
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        """Block until the running tasks returned; see QThreadPool."""
+        return self.thread_pool.waitForDone(msecs)
+
+    def _requeue(self, handle, priority):
+        """Move a queued task to a higher priority."""
+        self._queue = [entry for entry in self._queue
+                       if entry[2] is not handle]
+        handle.priority = priority
+        self._queue.append((-priority, next(self._sequence), handle))
+        heapq.heapify(self._queue)
+
+    def _start_tasks(self):
+        """Start queued tasks while threads and category slots are free."""
+        skipped = []
+        while (self._queue and
+               self.running_count() < self.thread_pool.maxThreadCount()):
+            entry = heapq.heappop(self._queue)
+            handle = entry[2]
+            limit = self.category_limits.get(handle.category)
+            if limit is not None and \
+                    self.running_count(handle.category) >= limit:
+                skipped.append(entry)
+                continue
+            handle.state = "running"
+            self._running.setdefault(handle.category, set()).add(handle)
+            self.thread_pool.start(_TaskRunnable(handle, self))
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def _on_task_done(self, handle, result, error):
+        """Deliver the outcome of a task that returned."""
+        self._running[handle.category].discard(handle)
+        if handle.token.cancelled or isinstance(error, TaskCancelled):
+            self._complete(handle, "cancelled")
+        elif error is not None:
+            logger.error("Task %r failed", handle, exc_info=error)
+            self._complete(handle, "failed", error)
+        else:
+            self._complete(handle, "finished", result)
+        self._start_tasks()
+
+    def _complete(self, handle, state, value=None):
+        """Record the final state of a task and emit its signals."""
+        handle.state = state
+        if handle.key is not None and \
+                self._in_flight.get(handle.key) is handle:
+            del self._in_flight[handle.key]
+        if state == "finished":
+            handle.finished.emit(value)
+            self.task_finished.emit(handle, value)
+        elif state == "failed":
+            handle.failed.emit(value)
+            self.task_failed.emit(handle, value)
+        else:
+            handle.cancelled.emit()
+            self.task_cancelled.emit(handle)
+        handle.deleteLater()
@@ -0,0 +1,86 @@
+"""
+theme_watcher.py
+
+Watch the stylesheet sources for changes while the application runs, so a
+theme can be edited and previewed without restarting.
+
+Editors often save a file several times in a row, or replace it by writing
+a new file and renaming it over the old one. Changes are therefore
+collected until the files have been quiet for `debounce_ms`, and reported
+once as a list of resource paths relative to `resources/`. Files replaced
+by a rename are watched again through their directory.
+
+Usage:
+    watcher = ThemeWatcher(config_handler.theme_resources())
+    watcher.resources_changed.connect(on_resources_changed)
+"""
+
+import os
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, pyqtSignal
+
+from core.rate_limit import Debouncer
+from core.resource_loader import RESOURCE_DIR
+
+
+class ThemeWatcher(QObject):
+    """Report debounced changes of a set of resource files."""
+
+    # Relative paths of the resources that changed
+    resources_changed = pyqtSignal(list)
+
+    DEBOUNCE_MS = 250
+
+    def __init__(self, relative_paths, debounce_ms: int = DEBOUNCE_MS,
+                 resource_dir: str = RESOURCE_DIR, parent=None):
+        super().__init__(parent)
+        self._relative_paths = {
+            os.path.join(resource_dir, *path.split("/")): path
+            for path in relative_paths}
+        self._pending = set()
+
+        self._debouncer = Debouncer(self._emit_changes, debounce_ms)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watch_missing_files()
+        directories = {os.path.dirname(p) for p in self._relative_paths}
+        self._watcher.addPaths(sorted(d for d in directories
+                                      if os.path.isdir(d)))
+
+    def watched_resources(self) -> list:
+        """Relative paths of the resources currently being watched."""
+        return sorted(self._relative_paths[path]
+                      for path in self._watcher.files())
+
+    def _watch_missing_files(self) -> list:
+        """Watch the files that exist but are not watched (any more)."""
+        watched = set(self._watcher.files())
+        missing = [path for path in self._relative_paths
+                   if path not in watched and os.path.exists(path)]
+        if missing:
+            self._watcher.addPaths(missing)
+        return missing
+
+    def _on_file_changed(self, path):
+        """Collect a changed file and restart the debounce timer."""
+        self._pending.add(path)
+        # A file replaced by a rename is no longer watched
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        self._debouncer()
+
+    def _on_directory_changed(self, _directory):
+        """Pick up watched files that were re-created in a directory."""
+        readded = self._watch_missing_files()
+        if readded:
+            self._pending.update(readded)
+            self._debouncer()
+
+    def _emit_changes(self):
+        """Report the changes collected since the last report."""
+        changed = sorted(self._relative_paths[path] for path in self._pending)
+        self._pending.clear()
+        if changed:
+            self.resources_changed.emit(changed)
@@ -0,0 +1,267 @@
+"""
+thumbnail_cache.py
+
+Thumbnails of image files, generated in the background and cached.
+
+A thumbnail is identified by the file's (path, size, mtime), so editing a
+file gives it a new thumbnail. Lookups go through two levels:
+    1. An in-memory LRU of recently used thumbnails, answered instantly.
+    2. A size-capped on-disk LRU of PNG files, which survives restarts.
+       Using a thumbnail touches its file, and the least recently used
+       files are deleted once the directory exceeds its budget.
+Misses are generated on the task scheduler: the image is decoded directly
+at the reduced size where the format supports it (e.g. JPEG), which is much
+faster than decoding it in full and scaling it down.
+
+Nothing blocks the GUI thread: `thumbnail` returns what is in memory, and
+`request` looks the file up in the background and emits thumbnail_ready
+once a new or changed thumbnail is available.
+
+Usage:
+    cache = ThumbnailCache(cache_dir, task_scheduler)
+    cache.thumbnail_ready.connect(on_thumbnail)     # (path, QImage)
+    image = cache.thumbnail(path)   # None if not in memory
+    cache.request(path)
+"""
+
+import collections
+import functools
+import hashlib
+import os
+
+from PyQt6.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from core.logger import logger
+from core.metrics import CacheMetrics
+from core.task_scheduler import Priority
+
+# Largest width and height of a thumbnail, in pixels
+THUMBNAIL_SIZE = 64
+TASK_CATEGORY = "thumbnails"
+
+_MEMORY_CACHE = CacheMetrics("thumbnails")
+
+
+def is_image_file(filepath: str) -> bool:
+    """Whether Qt can read images of the file's type, by its suffix."""
+    suffix = os.path.splitext(filepath)[1][1:].lower().encode()
+    return bool(suffix) and suffix in _image_suffixes()
+
+
+@functools.lru_cache(maxsize=None)
+def _image_suffixes() -> frozenset:
+    """Suffixes of the image formats Qt can read."""
+    return frozenset(bytes(fmt).lower()
+                     for fmt in QImageReader.supportedImageFormats())
+
+
+def cache_key(filepath: str, edge: int = THUMBNAIL_SIZE):
+    """(path, size, mtime, edge) of a file, None if it does not exist."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (filepath, stat.st_size, stat.st_mtime_ns, edge)
+
+
+def cache_filename(key) -> str:
+    """Name of the on-disk thumbnail of a key."""
+    digest = hashlib.sha1("\0".join(map(str, key)).encode("utf-8"))
+    return f"{digest.hexdigest()}.png"
+
+
+def load_thumbnail(filepath: str, cache_dir: str, known_key=None,
+                   edge: int = THUMBNAIL_SIZE):
+    """Find or generate the thumbnail of a file (task side).
+
+    Returns
+    -------
+    tuple or None
+        (key, QImage, bytes written to disk). None if the thumbnail is
+        `known_key`'s, i.e. did not change, or if the file is missing or
+        cannot be decoded.
+
+    """
+    key = cache_key(filepath, edge)
+    if key is None or key == known_key:
+        return None
+
+    cached_path = os.path.join(cache_dir, cache_filename(key))
+    image = QImage(cached_path)
+    if not image.isNull():
+        try:
+            os.utime(cached_path)
+        except OSError:
+            pass
+        return key, image, 0
+
+    reader = QImageReader(filepath)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > edge or size.height() > edge):
+        reader.setScaledSize(size.scaled(
+            QSize(edge, edge), Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        logger.debug("No thumbnail of %s: %s", filepath, reader.errorString())
+        return None
+    if image.width() > edge or image.height() > edge:
+        # Formats that cannot decode scaled, or reported no size
+        image = image.scaled(edge, edge, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{cached_path}.{os.getpid()}.tmp"
+    if image.save(temp_path, "PNG"):
+        os.replace(temp_path, cached_path)
+        return key, image, os.path.getsize(cached_path)
+    logger.warning("Could not write thumbnail %s", cached_path)
+    return key, image, 0
+
+
+def enforce_disk_budget(cache_dir: str, max_bytes: int) -> int:
+    """Delete the least recently used thumbnails over budget (task side).
+
+    Deletes down to 90% of the budget, so that it does not run again right
+    away.
+
+    Returns
+    -------
+    int
+        Bytes used by the thumbnails left.
+
+    """
+    try:
+        entries = [entry for entry in os.scandir(cache_dir)
+                   if entry.name.endswith(".png")]
+    except FileNotFoundError:
+        return 0
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return total
+    files.sort()
+    for _, size, path in files:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+class ThumbnailCache(QObject):
+    """Two-level cache of image thumbnails, filled in the background.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the on-disk thumbnails.
+    task_scheduler : TaskScheduler
+        Scheduler generating the thumbnails, in the "thumbnails" category.
+    max_disk_bytes : int
+        Budget of the on-disk thumbnails.
+    max_memory_items : int
+        Number of thumbnails kept in memory.
+    parent : QObject, optional
+        Parent of the cache.
+
+    """
+
+    # Path of the file and its new thumbnail
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    MAX_DISK_BYTES = 50 * 1024 * 1024
+    MAX_MEMORY_ITEMS = 256
+
+    def __init__(self, cache_dir: str, task_scheduler,
+                 max_disk_bytes: int = MAX_DISK_BYTES,
+                 max_memory_items: int = MAX_MEMORY_ITEMS, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+        self._scheduler = task_scheduler
+        # path: (key, QImage), least recently used first
+        self._memory = collections.OrderedDict()
+        # path: TaskHandle of the requests in flight
+        self._requests = {}
+        # Unknown until the directory was scanned by enforce_disk_budget
+        self._disk_usage = None
+
+    def thumbnail(self, filepath: str):
+        """The thumbnail in memory, None if there is none yet.
+
+        It can be outdated if the file changed; `request` refreshes it.
+        """
+        entry = self._memory.get(filepath)
+        _MEMORY_CACHE.record(entry is not None)
+        if entry is None:
+            return None
+        self._memory.move_to_end(filepath)
+        return entry[1]
+
+    def request(self, filepath: str, priority=Priority.LOW):
+        """Look up or generate the thumbnail of a file in the background.
+
+        thumbnail_ready is emitted unless the thumbnail in memory is
+        up to date.
+        """
+        if filepath in self._requests:
+            return self._requests[filepath]
+        entry = self._memory.get(filepath)
+        handle = self._scheduler.submit(
+            load_thumbnail, filepath, self.cache_dir,
+            entry[0] if entry else None, key=(TASK_CATEGORY, filepath),
+            category=TASK_CATEGORY, priority=priority)
+        self._requests[filepath] = handle
+        handle.finished.connect(
+            lambda result, path=filepath: self._on_loaded(path, result))
+        handle.failed.connect(
+            lambda _error, path=filepath: self._requests.pop(path, None))
+        handle.cancelled.connect(
+            lambda path=filepath: self._requests.pop(path, None))
+        return handle
+
+    def clear_memory(self):
+        """Drop the thumbnails held in memory."""
+        self._memory.clear()
+
+    def _on_loaded(self, filepath, result):
+        """Keep a loaded thumbnail and announce it."""
+        self._requests.pop(filepath, None)
+        if result is None:
+            return
+        key, image, written = result
+        self._memory[filepath] = (key, image)
+        self._memory.move_to_end(filepath)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+        if written:
+            self._account(written)
+        self.thumbnail_ready.emit(filepath, image)
+
+    def _account(self, written):
+        """Track the disk usage and evict once it exceeds the budget."""
+        if self._disk_usage is not None:
+            self._disk_usage += written
+            if self._disk_usage <= self.max_disk_bytes:
+                return
+        handle = self._scheduler.submit(
+            enforce_disk_budget, self.cache_dir, self.max_disk_bytes,
+            key=(TASK_CATEGORY, "evict"), category=TASK_CATEGORY,
+            priority=Priority.LOW)
+        handle.finished.connect(self._set_disk_usage)
+
+    def _set_disk_usage(self, total):
+        """Disk usage as counted by the eviction."""
+        self._disk_usage = total
@@ -1,27 +1,96 @@
 """main.py"""
+import argparse
+import os
 import sys
+import time
 
 from icecream import ic
-from PyQt6.QtWidgets import QApplication
 
-from app.main_window import MainWindow
-from core.main_controller import MainController
+from core.single_instance import SingleInstance
 
 ic.configureOutput(includeContext=True)
 ic.enable()
 
 
+def parse_args(argv):
+    """Parse the command line, leaving any Qt options to QApplication."""
+    parser = argparse.ArgumentParser(description="PyQt application template")
+    parser.add_argument("files", nargs="*", help="files to open")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a separate instance instead of handing "
+                             "the files to the running one")
+    parser.add_argument("--profile", type=float, metavar="SECONDS",
+                        help="profile the first SECONDS of the session and "
+                             "write the profile next to the logs")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="profile with cProfile instead of sampling, "
+                             "exact but slower and of the GUI thread only")
+    return parser.parse_known_args(argv)
+
+
 def main():
     """Entry point of application."""
+    # Start of the time to the first paint of the main window
+    startup_time = time.perf_counter()
+    args, qt_args = parse_args(sys.argv[1:])
+    files = [os.path.abspath(file) for file in args.files]
+
+    # Hand the files to the running instance before paying for the startup
+    if not args.new_instance and SingleInstance.forward(files):
+        sys.exit(0)
+
+    # pylint: disable=import-outside-toplevel
+    # Trace allocations before the bulk of the imports if requested
+    from core.diagnostics import MemoryDiagnostics
+    memory_diagnostics = MemoryDiagnostics.from_environment()
+
+    from PyQt6.QtWidgets import QApplication
+
+    from app.main_window import MainWindow
+    from core import async_loop
+    from core.main_controller import MainController
+    from core.metrics import MetricsExporter
+    from core.profiler import CPROFILE, SAMPLE, Profiler
+    from core.resource_loader import register_resources
+
     # Initialize the application
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+
+    # Profile from the construction of the window on, if requested
+    profiler = Profiler()
+    if args.profile:
+        profiler.start(args.profile, CPROFILE if args.cprofile else SAMPLE)
+
+    # Export performance metrics if APP_METRICS_FILE or APP_METRICS_PORT is
+    # set, see core/metrics.py
+    MetricsExporter.from_environment(parent=app)
+
+    # Run asyncio inside the Qt event loop, for async controller slots
+    async_loop.install()
+
+    # Hot-reloading edits the loose theme files, so keep the archive out
+    hot_reload = os.environ.get("APP_THEME_HOT_RELOAD") == "1"
+
+    # Memory-map the compiled resources, falls back to the loose files
+    if not hot_reload:
+        register_resources()
 
     # Instantiate the main components
-    main_controller = MainController()
-    main_window = MainWindow(main_controller)
+    main_controller = MainController(memory_diagnostics=memory_diagnostics,
+                                     profiler=profiler)
+    if hot_reload:
+        main_controller.enable_theme_hot_reload()
+    main_window = MainWindow(main_controller, startup_time)
+
+    # Accept the files of later launches, opened in the active window
+    single_instance = SingleInstance()
+    single_instance.files_received.connect(main_controller.open_files)
+    if not args.new_instance:
+        single_instance.listen()
 
     # Show the main window
     main_window.show()
+    main_window.open_files(files)
 
     # Execute the application
     sys.exit(app.exec())
@@ -0,0 +1,149 @@
+"""
+build_resources.py
+
+Compile the static assets in `resources/` into a single binary Qt resource
+archive (`resources.rcc`), equivalent to `rcc --binary`. PyQt6 does not ship
+the `rcc` tool, so the archive is written directly in Qt's resource format.
+
+At startup `core.resource_loader.register_resources()` registers the archive
+with Qt, which memory-maps it, and every asset is then addressed with a
+`:/` path such as `:/styles/style_template.qss`.
+
+Usage:
+    python -m resources.build_resources [output_path]
+
+Only the asset directories are packed. The per-user `app_config.yaml`, the
+`temp/` directory and Python sources are left out since they are written at
+runtime or are not assets.
+"""
+
+import os
+import struct
+import sys
+import time
+
+RESOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_PATH = os.path.join(RESOURCE_DIR, "resources.rcc")
+ASSET_DIRS = ("icons", "styles")
+
+FORMAT_VERSION = 2
+HEADER_SIZE = 20
+FLAG_DIRECTORY = 0x02
+LANGUAGE_C = 1
+TERRITORY_ANY = 0
+
+
+def qt_hash(name: str) -> int:
+    """Hash a resource name the way Qt does to look it up in the tree."""
+    encoded = name.encode("utf-16-be")
+    h = 0
+    for code_unit in struct.unpack(f">{len(encoded) // 2}H", encoded):
+        h = (h << 4) + code_unit
+        h ^= (h & 0xf0000000) >> 23
+        h &= 0x0fffffff
+    return h
+
+
+class _Node:
+    """File or directory entry of the resource tree."""
+
+    def __init__(self, name: str, path: str = None):
+        self.name = name
+        self.path = path
+        self.children = {}
+
+    @property
+    def is_dir(self) -> bool:
+        """True if the node is a directory."""
+        return self.path is None
+
+    def sorted_children(self) -> list:
+        """Children in the order Qt expects: ascending by name hash."""
+        return sorted(self.children.values(), key=lambda n: qt_hash(n.name))
+
+
+def collect_assets(resource_dir: str = RESOURCE_DIR) -> _Node:
+    """Build the resource tree of every file in the asset directories."""
+    root = _Node("")
+    for asset_dir in ASSET_DIRS:
+        base = os.path.join(resource_dir, asset_dir)
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            rel = os.path.relpath(dirpath, resource_dir).split(os.sep)
+            node = root
+            for part in rel:
+                node = node.children.setdefault(part, _Node(part))
+            for filename in filenames:
+                node.children[filename] = _Node(
+                    filename, os.path.join(dirpath, filename))
+    return root
+
+
+def build_archive(root: _Node) -> bytes:
+    """Serialise the resource tree into a binary Qt resource archive.
+
+    Layout: header, data blobs, names, tree. The tree lists nodes breadth
+    first so that the children of every directory are stored contiguously.
+    """
+    data = bytearray()
+    names = bytearray()
+    name_offsets = {}
+    data_offsets = {}
+
+    # Lay the nodes out breadth first
+    nodes = [root]
+    child_offsets = {}
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        if node.is_dir:
+            child_offsets[id(node)] = len(nodes)
+            nodes.extend(node.sorted_children())
+        i += 1
+
+    for node in nodes[1:]:
+        if node.name not in name_offsets:
+            name_offsets[node.name] = len(names)
+            encoded = node.name.encode("utf-16-be")
+            names += struct.pack(">HI", len(encoded) // 2, qt_hash(node.name))
+            names += encoded
+        if not node.is_dir:
+            with open(node.path, "rb") as file:
+                content = file.read()
+            data_offsets[id(node)] = len(data)
+            data += struct.pack(">I", len(content)) + content
+
+    tree = bytearray()
+    for node in nodes:
+        name_offset = name_offsets.get(node.name, 0)
+        if node.is_dir:
+            tree += struct.pack(">IHII", name_offset, FLAG_DIRECTORY,
+                                len(node.children), child_offsets[id(node)])
+            modified = 0
+        else:
+            tree += struct.pack(">IHHHI", name_offset, 0, TERRITORY_ANY,
+                                LANGUAGE_C, data_offsets[id(node)])
+            modified = int(os.path.getmtime(node.path) * 1000)
+        tree += struct.pack(">Q", modified)
+
+    data_offset = HEADER_SIZE
+    names_offset = data_offset + len(data)
+    tree_offset = names_offset + len(names)
+    header = b"qres" + struct.pack(">IIII", FORMAT_VERSION, tree_offset,
+                                   data_offset, names_offset)
+    return bytes(header + data + names + tree)
+
+
+def main(output_path: str = ARCHIVE_PATH) -> str:
+    """Compile the assets and write the archive to `output_path`."""
+    start = time.perf_counter()
+    archive = build_archive(collect_assets())
+    with open(output_path, "wb") as file:
+        file.write(archive)
+    print(f"Wrote {len(archive)} bytes to {output_path} "
+          f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    return output_path
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,136 @@
+"""
+Shared pytest configuration for the test suite.
+
+Forces Qt onto the ``offscreen`` platform so every test runs headless, and
+provides the helpers shared between test modules:
+    - ``qapp``: the session-wide QApplication.
+    - ``wait_until``: processes events until a condition holds.
+    - ``benchmark``: times a callable and compares it against the stored
+      baseline in ``benchmark_baselines.json``.
+
+Benchmarks are opt-in and controlled through environment variables:
+    - ``BENCHMARK=1`` runs the benchmark tests and fails any benchmark that is
+      slower than its baseline by more than the threshold.
+    - ``BENCHMARK_UPDATE=1`` runs the benchmarks and rewrites the baselines.
+    - ``BENCHMARK_THRESHOLD=2.0`` sets the allowed slow-down factor.
+"""
+
+import json
+import os
+import timeit
+
+# Must be set before the first QApplication is created
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(__file__),
+                             "benchmark_baselines.json")
+
+BENCHMARK_UPDATE = os.environ.get("BENCHMARK_UPDATE", "0") == "1"
+BENCHMARK_ENABLED = BENCHMARK_UPDATE or os.environ.get("BENCHMARK", "0") == "1"
+BENCHMARK_THRESHOLD = float(os.environ.get("BENCHMARK_THRESHOLD", "2.0"))
+BENCHMARK_REPEAT = 7
+
+
+def pytest_configure(config):
+    """Register the custom markers used by the suite."""
+    config.addinivalue_line(
+        "markers", "benchmark: performance test compared against a baseline")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmark tests unless they were explicitly requested."""
+    if BENCHMARK_ENABLED:
+        return
+    skip = pytest.mark.skip(reason="set BENCHMARK=1 to run benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """Session-wide QApplication running on the offscreen platform."""
+    app = QApplication.instance() or QApplication([])
+    yield app
+
+
+def wait_until(predicate, timeout_ms=2000):
+    """Process events until `predicate` is true or the timeout expires."""
+    for _ in range(timeout_ms // 10):
+        if predicate():
+            return True
+        QTest.qWait(10)
+    return bool(predicate())
+
+
+class BenchmarkRecorder:
+    """Time callables and compare the results against stored baselines."""
+
+    def __init__(self, baselines: dict):
+        self.baselines = baselines
+        self.results = {}
+
+    def __call__(self, name: str, func, *args, **kwargs) -> float:
+        """Time ``func`` and fail if it regressed beyond the threshold.
+
+        Parameters
+        ----------
+        name : str
+            Unique key of the benchmark in the baseline file.
+        func : callable
+            The code under test. Called with ``*args`` and ``**kwargs``.
+
+        Returns
+        -------
+        float
+            Best observed time per call, in seconds.
+
+        """
+        timer = timeit.Timer(lambda: func(*args, **kwargs))
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=BENCHMARK_REPEAT, number=number))
+        per_call = best / number
+        self.results[name] = per_call
+
+        baseline = self.baselines.get(name)
+        if BENCHMARK_UPDATE or baseline is None:
+            return per_call
+        if per_call > baseline * BENCHMARK_THRESHOLD:
+            pytest.fail(
+                f"{name}: {per_call * 1e3:.3f} ms/call is more than "
+                f"{BENCHMARK_THRESHOLD}x the baseline of "
+                f"{baseline * 1e3:.3f} ms/call")
+        return per_call
+
+
+@pytest.fixture(scope="session")
+def _benchmark_session():
+    """Load the baselines once and write them back when updating."""
+    try:
+        with open(BASELINE_FILE, "r", encoding="utf-8") as file:
+            baselines = json.load(file)
+    except FileNotFoundError:
+        baselines = {}
+
+    recorder = BenchmarkRecorder(baselines)
+    yield recorder
+
+    if BENCHMARK_UPDATE and recorder.results:
+        baselines.update(recorder.results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as file:
+            json.dump(dict(sorted(baselines.items())), file, indent=2)
+            file.write("\n")
+
+
+@pytest.fixture
+def benchmark(_benchmark_session):
+    """Time a callable against its stored baseline.
+
+    Usage: ``benchmark("name", func, *args)``.
+    """
+    return _benchmark_session
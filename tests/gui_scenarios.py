@@ -0,0 +1,341 @@
+"""
+End-to-end GUI performance scenarios.
+
+Starts the real MainWindow/MainController pair on the ``offscreen`` Qt
+platform and replays scripted sessions against it:
+    - open_menus: open and close every menu in the menu bar.
+    - switch_themes: arrow through the themes in the Preferences dialog and
+      apply each one to the main window.
+    - open_recent_files: open many files and show the Open Recent menu.
+    - resize: resize the main window through a series of sizes.
+    - close: close the main window.
+
+Every step records its input-to-paint latency (time from the input until the
+first frame containing a paint has finished) and the duration of every frame
+painted while the step settles. A frame is one top-level event dispatch that
+contains at least one paint event, timed from its first paint to its last.
+Every start of the window also records its time to first paint and the time
+until its staged startup completed, both counted from the construction of
+the MainController.
+
+Percentiles are reported as JSON so the numbers can be tracked across
+releases.
+
+Usage:
+    python -m tests.gui_scenarios --output perf.json --repeat 5
+
+The runner uses a throw-away config file, so the user's app_config.yaml is
+never modified.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Must be set before the QApplication is created
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# pylint: disable=wrong-import-position
+from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR, QEvent, QSize, Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+SETTLE_MS = 30
+NO_PAINT_MS = 150
+TIMEOUT_MS = 2000
+NUM_RECENT_FILES = 30
+RESIZE_STEPS = [QSize(800, 600), QSize(1024, 768), QSize(1280, 960),
+                QSize(640, 480), QSize(1600, 1200)]
+
+
+class ProbeApplication(QApplication):
+    """QApplication that records when paints happen during event dispatch.
+
+    Overriding ``notify`` is the only hook that sees the end of every event,
+    including events for objects that were created on the C++ side such as
+    the menus of the menu bar.
+    """
+
+    def __init__(self, argv):
+        super().__init__(argv)
+        self.frames = []
+        self._depth = 0
+        self._frame_start = None
+        self._frame_end = None
+
+    def notify(self, receiver, event):  # pylint: disable=invalid-name
+        """Dispatch the event and time any paints it contains."""
+        is_paint = (event.type() == QEvent.Type.Paint and
+                    receiver.isWidgetType())
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return super().notify(receiver, event)
+        finally:
+            end = time.perf_counter()
+            self._depth -= 1
+            if is_paint:
+                if self._frame_start is None:
+                    self._frame_start = start
+                self._frame_end = end
+            if self._depth == 0 and self._frame_start is not None:
+                self.frames.append((self._frame_start, self._frame_end))
+                self._frame_start = None
+                self._frame_end = None
+
+
+class ScenarioRunner:
+    """Replay scripted sessions and collect per-step timings."""
+
+    def __init__(self, app: ProbeApplication, config_dir: str):
+        self.app = app
+        self.config_dir = config_dir
+        self.steps = []
+        self.window = None
+        self.controller = None
+        self.startup = None
+
+    def start(self):
+        """Create the main controller and window and wait for its startup."""
+        # pylint: disable=import-outside-toplevel
+        from app.main_window import MainWindow
+        from core.main_controller import MainController
+
+        startup_time = time.perf_counter()
+        self.controller = MainController(
+            os.path.join(self.config_dir, "app_config.yaml"))
+        self.window = MainWindow(self.controller, startup_time)
+        self.step("show", self.window.show)
+        self.step("startup", self._wait_for_startup)
+        self.startup = {
+            "time_to_first_paint_ms": self.window.time_to_first_paint_ms,
+            "startup_ms": self.window.startup_ms,
+            }
+
+    def _wait_for_startup(self):
+        """Process events until the staged startup of the window is done."""
+        deadline = time.perf_counter() + TIMEOUT_MS / 1e3
+        while self.window.startup_ms is None and \
+                time.perf_counter() < deadline:
+            self.app.processEvents()
+
+    def step(self, name: str, action, *args):
+        """Run ``action`` as one scripted input and record its timings.
+
+        Parameters
+        ----------
+        name : str
+            Name of the step in the report.
+        action : callable
+            Performs the input. Called with ``*args``.
+
+        """
+        first_frame = len(self.app.frames)
+        start = time.perf_counter()
+        action(*args)
+        returned = time.perf_counter()
+        self._settle(first_frame)
+
+        frames = self.app.frames[first_frame:]
+        latency = (frames[0][1] - start) * 1e3 if frames else None
+        self.steps.append({
+            "step": name,
+            "duration_ms": (returned - start) * 1e3,
+            "latency_ms": latency,
+            "frames_ms": [(end - begin) * 1e3 for begin, end in frames],
+            })
+
+    def _settle(self, first_frame: int):
+        """Process events until the step has stopped painting.
+
+        The step has settled once no frame was painted for SETTLE_MS, or for
+        NO_PAINT_MS if the step has not painted anything at all.
+        """
+        deadline = time.perf_counter() + TIMEOUT_MS / 1e3
+        quiet_since = time.perf_counter()
+        frame_count = len(self.app.frames)
+        while time.perf_counter() < deadline:
+            self.app.processEvents()
+            if len(self.app.frames) != frame_count:
+                frame_count = len(self.app.frames)
+                quiet_since = time.perf_counter()
+            quiet_ms = (time.perf_counter() - quiet_since) * 1e3
+            if quiet_ms > (SETTLE_MS if frame_count > first_frame
+                           else NO_PAINT_MS):
+                return
+            time.sleep(0.001)
+
+    def open_menus(self):
+        """Open and close every menu in the menu bar."""
+        menu_bar = self.window.menuBar()
+        for action in menu_bar.actions():
+            pos = menu_bar.actionGeometry(action).center()
+            self.step(f"open_menu:{action.text()}", QTest.mouseClick,
+                      menu_bar, Qt.MouseButton.LeftButton,
+                      Qt.KeyboardModifier.NoModifier, pos)
+            self.step(f"close_menu:{action.text()}", action.menu().hide)
+
+    def switch_themes(self):
+        """Arrow through the themes in Preferences and apply each one."""
+        # pylint: disable=import-outside-toplevel
+        from app.dialogs.config_dialog import ConfigDialog
+
+        dialog = ConfigDialog(self.controller.config_handler)
+        self.step("open_preferences", dialog.show)
+        combo = dialog.window_theme_field
+        for i in range(combo.count()):
+            key = Qt.Key.Key_Home if i == 0 else Qt.Key.Key_Down
+            self.step("preview_theme", QTest.keyClick, combo, key)
+            self.step("apply_theme", self._apply_theme, dialog)
+        self.step("close_preferences", dialog.reject)
+
+    def _apply_theme(self, dialog):
+        """Save the previewed theme and restyle the main window."""
+        self.controller.config_handler.theme_filename = (
+            dialog.window_theme_field.currentData())
+        self.controller.window_theme_changed.emit()
+
+    def open_recent_files(self):
+        """Open many files, then show the File and Open Recent menus."""
+        handler = self.controller.config_handler
+        handler.num_recents_to_show = NUM_RECENT_FILES
+        with contextlib.redirect_stdout(sys.stderr):
+            for i in range(NUM_RECENT_FILES):
+                self.step("open_file", self.window._open_file,
+                          os.path.join(self.config_dir, f"file{i}.png"))
+
+        menu_bar = self.window.menuBar()
+        file_action = menu_bar.actions()[0]
+        self.step("open_menu:&File", QTest.mouseClick, menu_bar,
+                  Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier,
+                  menu_bar.actionGeometry(file_action).center())
+        recent_menu = self.window.open_recent_menu
+        self.step("open_recent_menu", recent_menu.popup,
+                  file_action.menu().geometry().topRight())
+        self.step("close_recent_menu", recent_menu.hide)
+        self.step("close_menu:&File", file_action.menu().hide)
+
+    def resize(self):
+        """Resize the main window through a series of sizes."""
+        for size in RESIZE_STEPS:
+            self.step(f"resize:{size.width()}x{size.height()}",
+                      self.window.resize, size)
+
+    def close(self):
+        """Close the main window."""
+        self.step("close", self.window.close)
+
+
+SCENARIOS = {
+    "open_menus": ScenarioRunner.open_menus,
+    "switch_themes": ScenarioRunner.switch_themes,
+    "open_recent_files": ScenarioRunner.open_recent_files,
+    "resize": ScenarioRunner.resize,
+    "close": ScenarioRunner.close,
+}
+
+
+def percentiles(values: list) -> dict:
+    """Summarise ``values`` as count, p50, p90, p99 and max.
+
+    Percentiles use linear interpolation between the closest ranks. Returns
+    only the count when ``values`` is empty.
+    """
+    values = sorted(v for v in values if v is not None)
+    summary = {"count": len(values)}
+    if not values:
+        return summary
+    for pct in (50, 90, 99):
+        rank = (len(values) - 1) * pct / 100
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        summary[f"p{pct}"] = values[low] + (values[high] - values[low]) * (
+            rank - low)
+    summary["max"] = values[-1]
+    return summary
+
+
+def summarise(steps: list) -> dict:
+    """Aggregate the latency and frame time percentiles of ``steps``."""
+    return {
+        "latency_ms": percentiles([s["latency_ms"] for s in steps]),
+        "frame_ms": percentiles([f for s in steps for f in s["frames_ms"]]),
+        }
+
+
+def run(scenarios: list, repeat: int = 1) -> dict:
+    """Run the named scenarios ``repeat`` times and build the report.
+
+    Each repetition starts a fresh MainWindow/MainController pair and runs
+    the scenarios in the order given.
+    """
+    # pylint: disable=import-outside-toplevel
+    from app.metadata import __app_name__, __version__
+
+    app = QApplication.instance() or ProbeApplication(sys.argv)
+    if not isinstance(app, ProbeApplication):
+        raise RuntimeError("gui_scenarios must create the QApplication")
+
+    results = {name: [] for name in scenarios}
+    startups = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        for _ in range(repeat):
+            runner = ScenarioRunner(app, config_dir)
+            runner.start()
+            startups.append(runner.startup)
+            for name in scenarios:
+                first = len(runner.steps)
+                SCENARIOS[name](runner)
+                results[name].extend(runner.steps[first:])
+            if runner.window.isVisible():
+                runner.window.close()
+
+    return {
+        "app": __app_name__,
+        "version": __version__,
+        "qt_version": QT_VERSION_STR,
+        "pyqt_version": PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "qpa_platform": QApplication.platformName(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "repeat": repeat,
+        "startup": {key: percentiles([startup[key] for startup in startups])
+                    for key in ("time_to_first_paint_ms", "startup_ms")},
+        "scenarios": {name: {"summary": summarise(steps), "steps": steps}
+                      for name, steps in results.items()},
+        }
+
+
+def main(argv=None):
+    """Parse the command line, run the scenarios and write the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("-o", "--output",
+                        help="file to write the JSON report to "
+                             "(default: stdout)")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="number of times to replay every scenario")
+    parser.add_argument("-s", "--scenario", action="append",
+                        choices=list(SCENARIOS),
+                        help="scenario to run, may be repeated "
+                             "(default: all)")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args.scenario or list(SCENARIOS), args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Tests for async_loop.py.
+
+Ensures:
+    - Coroutines run inside the Qt event loop, including sleeps, socket I/O
+      and wake-ups from other threads.
+    - async_slot schedules a task, drops surplus signal arguments and logs
+      exceptions.
+    - wait_signal returns the emitted arguments as soon as the signal is
+      emitted and honours its timeout.
+    - run_in_executor runs blocking calls off the GUI thread.
+    - MainController.check_recent_files finds recent files that are gone.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.async_loop import (async_slot, create_task, get_loop,
+                             run_in_executor, wait_signal)
+from core.main_controller import MainController
+from tests.conftest import wait_until
+
+
+class Emitter(QObject):
+    """Signals to wait for."""
+
+    nothing = pyqtSignal()
+    one = pyqtSignal(int)
+    two = pyqtSignal(int, str)
+
+
+def run(coroutine, timeout_ms=5000):
+    """Run a coroutine inside the Qt event loop and return its result."""
+    task = create_task(coroutine)
+    assert wait_until(task.done, timeout_ms)
+    return task.result()
+
+
+def test_sleep(qapp):
+    """asyncio timers fire while Qt runs the event loop."""
+    async def sleep():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.sleep(0.05)
+        return loop.time() - start
+
+    assert 0.05 <= run(sleep()) < 1
+
+
+def test_socket_io(qapp):
+    """Sockets wake the loop through the Qt event loop."""
+    async def handle(reader, writer):
+        writer.write((await reader.readline()).upper())
+        await writer.drain()
+        writer.close()
+
+    async def echo():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"ping\n")
+        reply = await reader.readline()
+        writer.close()
+        server.close()
+        return reply
+
+    assert run(echo()) == b"PING\n"
+
+
+def test_threadsafe_wake_up(qapp):
+    """call_soon_threadsafe from another thread resumes the coroutine."""
+    async def wait_for_thread():
+        future = asyncio.get_running_loop().create_future()
+        threading.Timer(0.02, get_loop().call_soon_threadsafe,
+                        (future.set_result, "done")).start()
+        return await future
+
+    assert run(wait_for_thread()) == "done"
+
+
+def test_async_slot(qapp):
+    """Connected to a signal, the coroutine gets the arguments it takes."""
+    received = []
+
+    @async_slot
+    async def on_two(number):
+        await asyncio.sleep(0)
+        received.append(number)
+
+    emitter = Emitter()
+    emitter.two.connect(on_two)
+    emitter.two.emit(3, "surplus")
+    assert wait_until(lambda: received)
+    assert received == [3]
+
+
+def test_async_slot_logs_exception(qapp, caplog):
+    """An exception of a slot's task is logged, not lost."""
+    @async_slot
+    async def broken():
+        raise ValueError("broken slot")
+
+    task = broken()
+    assert wait_until(task.done)
+    assert "broken slot" in caplog.text
+
+
+@pytest.mark.parametrize("signal, args, expected", [
+    ("nothing", (), None),
+    ("one", (7,), 7),
+    ("two", (7, "x"), (7, "x")),
+])
+@pytest.mark.parametrize("timeout", [2, None])
+def test_wait_signal(qapp, signal, args, expected, timeout):
+    """The result depends on the number of signal arguments, and arrives
+    as soon as the signal is emitted."""
+    emitter = Emitter()
+    bound = getattr(emitter, signal)
+    QTimer.singleShot(10, lambda: bound.emit(*args))
+    start = time.perf_counter()
+    assert run(wait_signal(bound, timeout=timeout)) == expected
+    assert time.perf_counter() - start < 0.5
+
+
+def test_wait_signal_timeout(qapp):
+    """A signal that is never emitted times out."""
+    emitter = Emitter()
+    with pytest.raises(asyncio.TimeoutError):
+        run(wait_signal(emitter.one, timeout=0.05))
+
+
+def test_run_in_executor(qapp):
+    """Blocking calls run on another thread."""
+    assert run(run_in_executor(threading.get_ident)) != \
+        threading.get_ident()
+
+
+def test_check_recent_files(qapp, tmp_path):
+    """Recent files that do not exist are reported as missing."""
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    existing = tmp_path / "existing.txt"
+    existing.write_text("x")
+    missing = str(tmp_path / "missing.txt")
+    controller.config_handler.recent_files = {"existing.txt": str(existing),
+                                              "missing.txt": missing}
+    reported = []
+    controller.recent_files_checked.connect(reported.append)
+    controller.check_recent_files()
+    assert wait_until(lambda: reported)
+    assert reported == [{missing}]
+    assert controller.missing_recent_files == {missing}
@@ -0,0 +1,145 @@
+"""
+Tests for batch.py.
+
+Ensures:
+    - Directories are expanded recursively in sorted order, filtered by a
+      pattern.
+    - Files are processed by their subcontroller in worker processes and
+      reported as they finish, with failures and skipped files counted.
+    - Neither the batch process nor its workers import QtWidgets.
+    - Cancelling lets the running files finish and drops the rest.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core.batch import BatchRunner, collect_files
+from tests.conftest import REPO_ROOT, wait_until
+
+PLUGIN_SOURCE = '''
+import sys
+import time
+
+
+class LineCounter:
+    def __init__(self, main_controller):
+        pass
+
+    def open_file(self, filepath):
+        if "broken" in filepath:
+            raise ValueError("broken file")
+        if filepath.endswith(".slow"):
+            time.sleep(0.2)
+        with open(filepath, encoding="utf-8") as file:
+            return {"lines": len(file.read().splitlines()),
+                    "widgets": "PyQt6.QtWidgets" in sys.modules}
+'''
+
+MANIFEST = '''
+counter:
+  class: batch_plugin:LineCounter
+  file_types: [".txt", ".slow"]
+'''
+
+# Run in a fresh interpreter, which must not import QtWidgets either
+HEADLESS_SCRIPT = '''
+import json
+import sys
+
+from core.batch import run_batch
+status = run_batch(sys.argv[1:2], sys.argv[2], sys.argv[3], max_workers=2,
+                   json_lines=True)
+print(json.dumps({"widgets": "PyQt6.QtWidgets" in sys.modules}))
+sys.exit(status)
+'''
+
+
+@pytest.fixture(name="batch_dir")
+def fixture_batch_dir(tmp_path, monkeypatch):
+    """Plugin, manifest, configuration and files to process."""
+    (tmp_path / "batch_plugin.py").write_text(PLUGIN_SOURCE)
+    (tmp_path / "subcontrollers.yaml").write_text(MANIFEST)
+    data = tmp_path / "data"
+    (data / "nested").mkdir(parents=True)
+    (data / "b.txt").write_text("1\n2\n")
+    (data / "a.txt").write_text("1\n")
+    (data / "nested" / "c.txt").write_text("1\n2\n3\n")
+    (data / "broken.txt").write_text("")
+    (data / "image.dat").write_text("")
+    # The workers inherit the path and import the plugin from it
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    sys.modules.pop("batch_plugin", None)
+
+
+def test_collect_files(batch_dir):
+    """Directories are walked in order, given files are always kept."""
+    data = batch_dir / "data"
+    names = [os.path.relpath(path, data) for path in collect_files(
+        [str(data), str(data / "image.dat")], pattern="*.txt")]
+    assert names == ["a.txt", "b.txt", "broken.txt",
+                     os.path.join("nested", "c.txt"), "image.dat"]
+    with pytest.raises(FileNotFoundError):
+        collect_files([str(data / "missing")])
+
+
+def test_headless_run(batch_dir):
+    """A fresh process reports every file and never imports QtWidgets."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [REPO_ROOT, str(batch_dir)]))
+    # No display, not even the offscreen one
+    env.pop("QT_QPA_PLATFORM", None)
+    env.pop("DISPLAY", None)
+    completed = subprocess.run(
+        [sys.executable, "-c", HEADLESS_SCRIPT,
+         str(batch_dir / "data"), str(batch_dir / "app_config.yaml"),
+         str(batch_dir / "subcontrollers.yaml")],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120,
+        check=False)
+    assert completed.returncode == 1, completed.stderr
+    records = [json.loads(line) for line in completed.stdout.splitlines()]
+    assert records[-1] == {"widgets": False}
+    summary = records[-2]["summary"]
+    assert (summary["ok"], summary["skipped"], summary["failed"]) == (3, 1, 1)
+
+    files = {os.path.basename(record["file"]): record
+             for record in records[:-2]}
+    assert [record["index"] for record in records[:-2]] == [1, 2, 3, 4, 5]
+    assert files["c.txt"]["result"] == {"lines": 3, "widgets": False}
+    assert files["broken.txt"]["status"] == "failed"
+    assert "broken file" in files["broken.txt"]["error"]
+    assert files["image.dat"]["status"] == "skipped"
+
+
+def test_cancel(qapp, batch_dir):
+    """The running files finish, the others are never processed."""
+    slow = batch_dir / "slow"
+    slow.mkdir()
+    filepaths = []
+    for index in range(12):
+        filepath = slow / f"{index:02d}.slow"
+        filepath.write_text("1\n")
+        filepaths.append(str(filepath))
+    output = io.StringIO()
+    runner = BatchRunner(filepaths, str(batch_dir / "app_config.yaml"),
+                         str(batch_dir / "subcontrollers.yaml"),
+                         max_workers=1, stream=output)
+    statuses = []
+    runner.finished.connect(statuses.append)
+    runner.start()
+    assert wait_until(lambda: runner.done >= 1, timeout_ms=30000)
+    runner.cancel()
+
+    assert statuses == [1]
+    assert 1 <= runner.done < len(filepaths)
+    lines = output.getvalue().splitlines()
+    assert lines[0].startswith(f"[ 1/{len(filepaths)}] ok ")
+    assert lines[-1].endswith("(cancelled)")
+    runner.cancel()
+    assert statuses == [1]
+    runner.deleteLater()
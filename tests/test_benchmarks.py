@@ -0,0 +1,251 @@
+"""
+Micro-benchmarks for the core hot paths of the application.
+
+Covers:
+    - ConfigHandler load and save at growing user counts.
+    - get_stylesheet for each theme.
+    - add_recent_file with large histories.
+    - QToggleSwitch.paintEvent.
+    - Construction of ConfigDialog and AboutDialog.
+    - Switching themes with full and scoped theming.
+    - Qt parse and polish time of raw and optimized stylesheets.
+    - Quick-open searches of a 100k entry file history, every keystroke
+      within FILE_HISTORY_BUDGET_MS.
+    - Indexing a chunk of the log and filtering the indexed lines.
+    - Time from constructing the main window to its first paint, within
+      FIRST_PAINT_BUDGET_MS.
+
+Every benchmark is compared against ``benchmark_baselines.json`` by the
+``benchmark`` fixture in ``conftest.py``. Run with ``BENCHMARK=1`` to check
+for regressions and ``BENCHMARK_UPDATE=1`` to record new baselines.
+"""
+
+import copy
+
+import pytest
+import yaml
+
+from core.app_config_handler import ConfigHandler
+from tests.conftest import REPO_ROOT
+
+pytestmark = pytest.mark.benchmark
+
+USER_COUNTS = [1, 100, 1000]
+HISTORY_SIZES = [100, 10000]
+THEMES = ["colors_light.qss", "colors_dark.qss", "colors_dark_orange.qss"]
+FILE_HISTORY_SIZE = 100000
+FILE_HISTORY_BUDGET_MS = 5
+FILE_HISTORY_QUERIES = ["r", "re", "rep", "report", "report_1",
+                        "report_1 pdf", "alpha3 beta4", "5.png"]
+LOG_LINES = 100000
+FIRST_PAINT_BUDGET_MS = 100
+
+def _write_config(path, user_count):
+    """Write a config file holding ``user_count`` user profiles."""
+    config = {f"user{i}": copy.deepcopy(ConfigHandler.STARTER_CONFIG)
+              for i in range(user_count)}
+    with open(path, "w", encoding="utf-8") as file:
+        yaml.dump(config, file, sort_keys=False)
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    """Path to a config file inside an isolated working directory."""
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "app_config.yaml")
+
+
+@pytest.mark.parametrize("user_count", USER_COUNTS)
+def test_config_load(benchmark, config_path, user_count):
+    """Time loading the config file with many user profiles."""
+    _write_config(config_path, user_count)
+    benchmark(f"config_load[{user_count}]", ConfigHandler, config_path)
+
+
+@pytest.mark.parametrize("user_count", USER_COUNTS)
+def test_config_save(benchmark, config_path, user_count):
+    """Time saving the config file with many user profiles."""
+    _write_config(config_path, user_count)
+    handler = ConfigHandler(config_path)
+    handler.username = "user0"
+    benchmark(f"config_save[{user_count}]", handler.save_config)
+
+
+@pytest.mark.parametrize("theme", THEMES)
+def test_get_stylesheet(benchmark, config_path, theme):
+    """Time compiling the stylesheet for each theme."""
+    handler = ConfigHandler(config_path)
+
+    def compile_stylesheet():
+        handler.clear_cache()
+        return handler.get_stylesheet(theme)
+
+    benchmark(f"get_stylesheet[{theme}]", compile_stylesheet)
+
+
+@pytest.mark.parametrize("history_size", HISTORY_SIZES)
+def test_add_recent_file(benchmark, config_path, history_size):
+    """Time adding new and existing entries to a large recent files list."""
+    handler = ConfigHandler(config_path)
+    handler.num_recents_to_show = history_size
+    handler.recent_files = {f"file{i}.png": f"/data/file{i}.png"
+                            for i in range(history_size)}
+
+    benchmark(f"add_recent_file_existing[{history_size}]",
+              handler.add_recent_file, f"/data/file{history_size - 1}.png")
+
+    counter = iter(range(history_size, 10 ** 9))
+    benchmark(f"add_recent_file_new[{history_size}]",
+              lambda: handler.add_recent_file(f"/new/file{next(counter)}.png"))
+
+
+@pytest.mark.parametrize("checked", [False, True])
+def test_toggle_switch_paint(benchmark, qapp, checked):
+    """Time a full paint of the toggle switch."""
+    from ui.toggle_switch import QToggleSwitch
+
+    switch = QToggleSwitch(pulse_animation=True)
+    switch.setText("Toggle")
+    switch.resize(switch.sizeHint())
+    switch.setChecked(checked)
+    switch.handle_position = 1 if checked else 0
+    benchmark(f"toggle_switch_paint[{checked}]", switch.grab)
+
+
+def test_config_dialog_construction(benchmark, qapp, config_path):
+    """Time constructing the preferences dialog."""
+    from app.dialogs.config_dialog import ConfigDialog
+
+    handler = ConfigHandler(config_path)
+    benchmark("config_dialog_construction", ConfigDialog, handler)
+
+
+def test_about_dialog_construction(benchmark, qapp, monkeypatch):
+    """Time constructing the about dialog."""
+    from app.dialogs.about_dialog import AboutDialog
+
+    monkeypatch.chdir(REPO_ROOT)
+    benchmark("about_dialog_construction", AboutDialog)
+
+
+@pytest.mark.parametrize("scoped", [False, True])
+def test_theme_switch(benchmark, qapp, config_path, scoped):
+    """Time switching themes with many widgets in several windows."""
+    from PyQt6.QtWidgets import QPushButton, QVBoxLayout, QWidget
+
+    from core.main_controller import MainController
+
+    controller = MainController(config_path)
+    controller.config_handler.scoped_theming = scoped
+    windows = []
+    for _ in range(4):
+        window = QWidget()
+        layout = QVBoxLayout(window)
+        for i in range(100):
+            layout.addWidget(QPushButton(f"Button {i}"))
+        windows.append(window)
+    controller.apply_theme(windows[0])
+
+    themes = iter(THEMES * 10 ** 6)
+
+    def switch():
+        controller.config_handler.theme_filename = next(themes)
+        controller.apply_theme()
+
+    benchmark(f"theme_switch[{'scoped' if scoped else 'full'}]", switch)
+    qapp.setStyleSheet("")
+
+
+@pytest.mark.parametrize("optimized", [False, True])
+def test_stylesheet_apply(benchmark, qapp, config_path, optimized):
+    """Time Qt parsing and polishing a raw or an optimized stylesheet."""
+    from PyQt6.QtWidgets import (QCheckBox, QComboBox, QLabel, QLineEdit,
+                                 QPushButton, QSpinBox, QVBoxLayout, QWidget)
+
+    handler = ConfigHandler(config_path)
+    handler._optimize_stylesheets = optimized
+    sheets = iter([handler.get_stylesheet(theme) for theme in THEMES] * 10 ** 6)
+
+    window = QWidget()
+    layout = QVBoxLayout(window)
+    for _ in range(40):
+        for widget_type in (QCheckBox, QComboBox, QLabel, QLineEdit,
+                            QPushButton, QSpinBox):
+            layout.addWidget(widget_type())
+
+    benchmark(f"stylesheet_apply[{'optimized' if optimized else 'raw'}]",
+              lambda: qapp.setStyleSheet(next(sheets)))
+    qapp.setStyleSheet("")
+
+
+@pytest.fixture(scope="module")
+def file_history_index():
+    """File history index of FILE_HISTORY_SIZE made-up files."""
+    from core.file_history import HistoryIndex
+    from tests.test_file_history import random_entries
+
+    index = HistoryIndex()
+    index.add_many(random_entries(FILE_HISTORY_SIZE))
+    return index
+
+
+@pytest.mark.parametrize("query", FILE_HISTORY_QUERIES)
+def test_file_history_search(benchmark, file_history_index, query):
+    """Time one quick-open keystroke, which must stay within budget."""
+    per_call = benchmark(f"file_history_search[{query}]",
+                         file_history_index.search, query)
+    assert per_call * 1e3 < FILE_HISTORY_BUDGET_MS
+
+
+@pytest.fixture(scope="module")
+def log_path(tmp_path_factory):
+    """Log file of LOG_LINES made-up lines."""
+    from tests.test_log_index import random_log
+
+    path = tmp_path_factory.mktemp("logs") / "app.log"
+    path.write_text("".join(random_log(LOG_LINES)), encoding="utf-8")
+    return str(path)
+
+
+def test_log_index(benchmark, log_path):
+    """Time indexing a log file of LOG_LINES lines in one chunk."""
+    from core.log_index import index_log
+
+    benchmark("log_index", index_log, log_path, 0, 0, ("", ""), 1 << 30)
+
+
+@pytest.mark.parametrize("level", ["INFO", "ERROR"])
+def test_log_filter(benchmark, log_path, level):
+    """Time filtering the indexed lines of a log by level."""
+    from core.log_index import LogIndex, index_log, level_number
+
+    index = LogIndex()
+    index.extend(index_log(log_path, max_bytes=1 << 30))
+    benchmark(f"log_filter[{level}]", index.rows, level_number(level))
+
+
+def test_time_to_first_paint(benchmark, qapp, config_path):
+    """Time showing a new main window until its first paint."""
+    from PyQt6.QtCore import QEvent
+
+    from app.main_window import MainWindow
+    from core.main_controller import MainController
+
+    controller = MainController(config_path)
+
+    def first_paint():
+        window = MainWindow(controller)
+        window.show()
+        while window.time_to_first_paint_ms is None:
+            qapp.processEvents()
+        window.hide()
+        window.deleteLater()
+        # processEvents does not delete it, and alive, its remaining
+        # startup stages would run in the next calls
+        qapp.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        return window.time_to_first_paint_ms
+
+    per_call = benchmark("time_to_first_paint", first_paint)
+    assert per_call * 1e3 < FIRST_PAINT_BUDGET_MS
+    controller.stop_background_tasks()
+    qapp.setStyleSheet("")
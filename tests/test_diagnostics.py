@@ -0,0 +1,98 @@
+"""
+Tests for diagnostics.py.
+
+Ensures:
+    - Reports list the allocation sites that grew since the last snapshot.
+    - Live Qt objects are counted by class, including children that Python
+      holds no reference to.
+    - The process RSS is reported.
+    - APP_MEMORY_DIAGNOSTICS starts tracing with the requested frames.
+    - Reports are written to the log.
+"""
+
+import logging
+import tracemalloc
+
+import pytest
+from PyQt6.QtCore import QObject, QTimer
+
+from core.diagnostics import (ENV_VAR, MemoryDiagnostics, format_bytes,
+                              process_rss, qobject_counts)
+
+
+@pytest.fixture
+def diagnostics():
+    """Diagnostics that stop tracing afterwards."""
+    was_tracing = tracemalloc.is_tracing()
+    diagnostics = MemoryDiagnostics()
+    yield diagnostics
+    if not was_tracing:
+        diagnostics.stop()
+
+
+def allocate():
+    """Allocate memory on a line of this file."""
+    return [bytearray(1024) for _ in range(500)]
+
+
+def test_report_lists_growth(diagnostics, caplog):
+    """The allocation site of the growth is at the top of the report."""
+    diagnostics.start()
+    kept = allocate()
+    with caplog.at_level(logging.INFO, logger="my_pyqt_app"):
+        report = diagnostics.report(limit=3)
+    sites = report.split("allocation sites")[1].splitlines()
+    assert "test_diagnostics.py" in sites[1]
+    assert "RSS:" in report
+    assert report in caplog.text
+    del kept
+
+
+def test_report_starts_tracing(diagnostics):
+    """The first report starts tracing and has no allocation sites."""
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc already traced by the test run")
+    report = diagnostics.report()
+    assert tracemalloc.is_tracing()
+    assert "Memory report" in report
+
+
+def test_qobject_counts(qapp):
+    """Children only referenced by their C++ parent are counted too."""
+    before = qobject_counts()
+    parent = QObject()
+    for _ in range(3):
+        QTimer(parent)
+    counts = qobject_counts()
+    assert counts["QTimer"] - before["QTimer"] == 3
+    assert counts["QObject"] - before["QObject"] >= 1
+    del parent
+
+
+def test_process_rss():
+    """The RSS is a plausible number of bytes."""
+    rss = process_rss()
+    assert rss is not None and rss > 1024 * 1024
+
+
+def test_from_environment(monkeypatch):
+    """The environment variable sets the number of frames."""
+    monkeypatch.delenv(ENV_VAR, raising=False)
+    assert MemoryDiagnostics.from_environment() is None
+    was_tracing = tracemalloc.is_tracing()
+    monkeypatch.setenv(ENV_VAR, "5")
+    diagnostics = MemoryDiagnostics.from_environment()
+    try:
+        assert diagnostics.frames == 5
+        assert tracemalloc.is_tracing()
+    finally:
+        if not was_tracing:
+            diagnostics.stop()
+
+
+@pytest.mark.parametrize("size, text", [
+    (None, "unknown"), (512, "512 B"), (2048, "2.0 KiB"),
+    (3 * 1024 ** 3, "3.0 GiB")])
+def test_format_bytes(size, text):
+    """Sizes are shown in binary units."""
+    assert format_bytes(size) == text
@@ -0,0 +1,255 @@
+"""
+Tests for document_manager.py.
+
+Ensures:
+    - Images are held decoded and other files as bytes, with their size
+      accounted; large files are memory-mapped and not accounted.
+    - Beyond the budget the least recently used data is evicted, never the
+      active document's, and evicted documents reload on demand.
+    - Lowering the budget evicts at once, closing frees the data.
+    - Documents opened in the background are decoded on the task scheduler,
+      images in worker processes given a process pool, closed again if
+      their file cannot be decoded, and decoded anew if reopened while a
+      cancelled decode still runs.
+    - Opened files become documents of MainController, and the status bar
+      shows their memory.
+"""
+
+import mmap
+import os
+import shutil
+import threading
+
+import pytest
+from PyQt6.QtCore import QThreadPool
+from PyQt6.QtGui import QColor, QImage
+
+from app.main_window import MainWindow
+from core import document_manager
+from core.document_manager import DocumentManager
+from core.main_controller import MainController
+from core.process_pool import ProcessPoolService
+from core.task_scheduler import TaskScheduler
+from tests.conftest import REPO_ROOT, wait_until
+
+# Bytes of a decoded 64 x 64 image
+IMAGE_BYTES = 64 * 64 * 4
+
+
+@pytest.fixture(name="images")
+def fixture_images(qapp, tmp_path):
+    """Four 64 x 64 PNG files."""
+    filepaths = []
+    for index in range(4):
+        image = QImage(64, 64, QImage.Format.Format_ARGB32)
+        image.fill(QColor.fromHsv(index * 60, 255, 255))
+        filepath = str(tmp_path / f"image{index}.png")
+        image.save(filepath)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def test_loads_images_and_bytes(images, tmp_path):
+    """Images are decoded, other files read as bytes."""
+    binary = tmp_path / "data.bin"
+    binary.write_bytes(b"\x00" * 1000)
+    documents = DocumentManager()
+    image = documents.open(images[0]).data
+    assert isinstance(image, QImage) and image.width() == 64
+    assert documents.open(str(binary)).data == b"\x00" * 1000
+    assert documents.memory_used == image.sizeInBytes() + 1000
+    assert documents.active == str(binary)
+    with pytest.raises(OSError):
+        documents.open(str(tmp_path / "missing.bin"))
+    assert len(documents) == 2
+
+
+def test_large_files_are_mapped(tmp_path, monkeypatch):
+    """Files from the threshold on are mapped, not read into memory."""
+    monkeypatch.setattr(document_manager, "MAP_THRESHOLD_BYTES", 1000)
+    binary = tmp_path / "data.bin"
+    binary.write_bytes(b"\x01" * 1000)
+    documents = DocumentManager()
+    data = documents.open(str(binary)).data
+    assert isinstance(data, mmap.mmap)
+    assert data[:4] == b"\x01" * 4 and len(data) == 1000
+    assert documents.memory_used == 0
+
+
+def test_open_in_background(qapp, images, tmp_path, monkeypatch):
+    """Decoding happens on the scheduler, failures close the document."""
+    threads = []
+    load_document_data = document_manager.load_document_data
+    monkeypatch.setattr(
+        document_manager, "load_document_data", lambda *args: (
+            threads.append(threading.current_thread()) or
+            load_document_data(*args)))
+    scheduler = TaskScheduler({document_manager.TASK_CATEGORY: 1})
+    documents = DocumentManager(task_scheduler=scheduler)
+    loaded, failed = [], []
+    documents.loaded.connect(loaded.append)
+    documents.load_failed.connect(lambda path, error: failed.append(path))
+
+    document = documents.open_in_background(images[0])
+    assert documents.active == images[0]
+    assert not document.is_loaded and documents.is_loading(images[0])
+    assert wait_until(lambda: loaded)
+    assert loaded == [images[0]] and document.is_loaded
+    assert threads[0] is not threading.main_thread()
+    assert documents.memory_used == IMAGE_BYTES
+
+    missing = str(tmp_path / "missing.bin")
+    documents.open_in_background(missing)
+    assert wait_until(lambda: failed)
+    assert failed == [missing] and missing not in documents
+    assert documents.active == images[0]
+
+    # Closing while decoding drops the result
+    documents.open_in_background(images[1])
+    documents.close(images[1])
+    scheduler.wait_for_done()
+    qapp.processEvents()
+    assert images[1] not in documents
+    assert documents.memory_used == IMAGE_BYTES
+    scheduler.deleteLater()
+
+
+def test_reopen_while_decoding(qapp, images, monkeypatch):
+    """Reopening a document closed while decoding decodes it again."""
+    gate, started = threading.Event(), threading.Semaphore(0)
+    load_document_data = document_manager.load_document_data
+
+    def blocked_load(*args):
+        started.release()
+        gate.wait()
+        return load_document_data(*args)
+
+    monkeypatch.setattr(document_manager, "load_document_data", blocked_load)
+    pool = QThreadPool()
+    pool.setMaxThreadCount(2)
+    scheduler = TaskScheduler({document_manager.TASK_CATEGORY: 2}, pool)
+    documents = DocumentManager(task_scheduler=scheduler)
+    loaded = []
+    documents.loaded.connect(loaded.append)
+
+    try:
+        documents.open_in_background(images[0])
+        assert started.acquire(timeout=2)
+        documents.close(images[0])
+        document = documents.open_in_background(images[0])
+        assert started.acquire(timeout=2)
+    finally:
+        gate.set()
+    assert wait_until(lambda: loaded)
+    scheduler.wait_for_done()
+    qapp.processEvents()
+    assert loaded == [images[0]] and document.is_loaded
+    assert not documents.is_loading(images[0])
+    assert documents.memory_used == IMAGE_BYTES
+    scheduler.deleteLater()
+
+
+def test_images_decoded_in_processes(qapp, images, tmp_path, monkeypatch):
+    """With a process pool, images are decoded in its worker processes."""
+    decoded = []
+    load_document_data = document_manager.load_document_data
+    monkeypatch.setattr(
+        document_manager, "load_document_data", lambda *args: (
+            decoded.append(args[0]) or load_document_data(*args)))
+    binary = tmp_path / "data.bin"
+    binary.write_bytes(b"\x00" * 1000)
+    scheduler = TaskScheduler({document_manager.TASK_CATEGORY: 1})
+    pool = ProcessPoolService(max_workers=1)
+    documents = DocumentManager(task_scheduler=scheduler, process_pool=pool)
+    loaded, failed = [], []
+    documents.loaded.connect(loaded.append)
+    documents.load_failed.connect(lambda path, error: failed.append(path))
+
+    image = documents.open_in_background(images[0])
+    documents.open_in_background(str(binary))
+    missing = str(tmp_path / "missing.png")
+    documents.open_in_background(missing)
+    assert wait_until(lambda: len(loaded) == 2 and failed, 30000)
+    assert image.data.width() == 64
+    assert image.data.pixel(0, 0) == QColor.fromHsv(0, 255, 255).rgb()
+    assert decoded == [str(binary)] and failed == [missing]
+    assert documents.memory_used == IMAGE_BYTES + 1000
+    pool.shutdown()
+    scheduler.wait_for_done()
+    scheduler.deleteLater()
+
+
+def test_evicts_least_recently_used(images):
+    """The oldest inactive data goes first and comes back on demand."""
+    documents = DocumentManager(budget_bytes=2 * IMAGE_BYTES)
+    evicted = []
+    documents.evicted.connect(evicted.append)
+    handles = [documents.open(filepath) for filepath in images[:2]]
+    documents.activate(images[0])
+    handles.append(documents.open(images[2]))
+
+    assert evicted == [images[1]]
+    assert documents.memory_used == 2 * IMAGE_BYTES
+    assert [handle.is_loaded for handle in handles] == [True, False, True]
+
+    # Reading the evicted one reloads it and evicts the oldest other one
+    assert not handles[1].data.isNull()
+    assert handles[1].loads == 2
+    assert evicted == [images[1], images[0]]
+    assert documents.active == images[2] and handles[2].is_loaded
+
+
+def test_active_document_is_kept(images):
+    """The active document stays even if it alone is over the budget."""
+    documents = DocumentManager(budget_bytes=IMAGE_BYTES // 2)
+    first = documents.open(images[0])
+    assert first.is_loaded
+    second = documents.open(images[1])
+    assert second.is_loaded and not first.is_loaded
+    assert documents.memory_used == IMAGE_BYTES
+
+
+def test_budget_and_close(images):
+    """Lowering the budget evicts, closing frees and hands on the focus."""
+    documents = DocumentManager()
+    changes = []
+    documents.memory_changed.connect(
+        lambda used, budget: changes.append((used, budget)))
+    for filepath in images:
+        documents.open(filepath)
+    assert documents.memory_used == 4 * IMAGE_BYTES
+
+    documents.budget_bytes = IMAGE_BYTES
+    assert changes[-1] == (IMAGE_BYTES, IMAGE_BYTES)
+    assert [doc.is_loaded for doc in documents.documents()] == [
+        False, False, False, True]
+
+    documents.close(images[3])
+    assert documents.memory_used == 0
+    assert documents.active == images[2]
+    assert documents.get(images[3]) is None
+    documents.close_all()
+    assert len(documents) == 0 and documents.active is None
+
+
+def test_controller_and_status_bar(qapp, images, tmp_path):
+    """Opened files are documents, their memory is shown."""
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                tmp_path)
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    window = MainWindow(controller)
+    assert controller.documents.budget_bytes == 512 * 1024 * 1024
+    assert window.memory_label.text().startswith("Documents: 0 B of")
+
+    controller.open_file(images[0])
+    controller.open_file(images[1])
+    assert controller.documents.active == images[1]
+    assert wait_until(lambda: window.memory_label.text().startswith(
+        "Documents: 32.0 KiB of"))
+
+    window._close_file()  # pylint: disable=protected-access
+    assert images[1] not in controller.documents
+    assert controller.documents.active == images[0]
+    window.deleteLater()
+    controller.stop_background_tasks()
+    controller.deleteLater()
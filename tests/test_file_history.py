@@ -0,0 +1,217 @@
+"""
+Tests for file_history.py and the quick-open palette.
+
+Ensures:
+    - Searches return exactly the entries containing every term, in rank
+      order, whichever index path answers them.
+    - Ranking combines the number of opens with how recent the last one was.
+    - The history survives a reload, is compacted by the background load,
+      skips broken lines and paths with line breaks.
+    - Files recorded while the history loads in the background are counted
+      once.
+    - A history file that cannot be read leaves an empty, usable history
+      rather than one loading forever.
+    - The quick-open palette lists matches as you type and opens the
+      selected file.
+"""
+
+import random
+
+import pytest
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+
+from app.dialogs.quick_open_dialog import QuickOpenDialog
+from core.file_history import (HALF_LIFE_DAYS, FileHistory, HistoryIndex,
+                               rank_key)
+from core.task_scheduler import TaskScheduler
+from tests.conftest import wait_until
+
+NOW = 1_700_000_000
+DAY = 86400
+WORDS = ["alpha", "beta", "gamma", "report", "invoice", "photo", "scan",
+         "final", "draft", "budget"]
+
+
+def random_entries(count, seed=0):
+    """(path, last_open, count) tuples of made-up files."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        folders = "/".join(f"{rng.choice(WORDS)}{rng.randint(0, 9)}"
+                           for _ in range(rng.randint(1, 3)))
+        name = f"{rng.choice(WORDS)}_{i}.{rng.choice(['png', 'pdf'])}"
+        entries.append((f"/home/user/{folders}/{name}",
+                        NOW - rng.random() * 365 * DAY, rng.randint(1, 9)))
+    return entries
+
+
+@pytest.fixture(scope="module")
+def index():
+    """Index large enough for every search strategy to be used."""
+    index = HistoryIndex()
+    index.add_many(random_entries(20000))
+    return index
+
+
+def brute_force(index, query, limit):
+    """Reference search: filter every entry and sort by rank."""
+    terms = query.lower().split()
+    matches = []
+    for path, last_open, count in index.entries():
+        text = path.lower()
+        if all(term in text for term in terms):
+            if terms and all(len(term) < 3 for term in terms) and \
+                    not text.rsplit("/", 1)[1].startswith(terms[0]):
+                continue
+            matches.append((rank_key(count, last_open), path))
+    matches.sort(reverse=True)
+    return [path for _, path in matches[:limit]]
+
+
+@pytest.mark.parametrize("query", [
+    "", "r", "re", "rep", "report", "report_1", "report pdf", "alpha3 beta4",
+    "gamma1 budget2 final", "al pd", "zzz", "PHOTO", "5.png"])
+def test_search_matches_brute_force(index, query):
+    """Every index path returns the same as filtering every entry."""
+    assert index.search(query, 20) == brute_force(index, query, 20)
+
+
+def test_search_after_adds(index):
+    """Entries opened again move up the ranking."""
+    index = HistoryIndex()
+    index.add_many(random_entries(3000, seed=1))
+    path = index.paths[1234]
+    index.add(path, NOW + DAY)
+    index.add("/new/report_new.png", NOW + DAY)
+    assert index.search("report", 2) == \
+        brute_force(index, "report", 2)
+    assert index.search("", 1)[0] in (path, "/new/report_new.png")
+    assert brute_force(index, "", 5) == index.search("", 5)
+
+
+def test_ranking_combines_frequency_and_recency():
+    """Two opens a half-life ago rank like one open now."""
+    assert rank_key(2, NOW - HALF_LIFE_DAYS * DAY) == \
+        pytest.approx(rank_key(1, NOW))
+    index = HistoryIndex()
+    index.add("/files/often.txt", NOW - 7 * DAY, count=10)
+    index.add("/files/once_old.txt", NOW - 7 * DAY)
+    index.add("/files/once_new.txt", NOW)
+    assert index.search("files") == ["/files/often.txt",
+                                     "/files/once_new.txt",
+                                     "/files/once_old.txt"]
+
+
+def test_persistence(tmp_path):
+    """Counts and last opens are read back."""
+    filepath = str(tmp_path / "history.txt")
+    history = FileHistory(filepath)
+    history.record("/a/once.txt", NOW - DAY)
+    for days in range(3):
+        history.record("/a/thrice.txt", NOW - 10 * DAY + days)
+
+    history = FileHistory(filepath)
+    assert history.search("once") == ["/a/once.txt"]
+    assert history.search("txt") == ["/a/thrice.txt", "/a/once.txt"]
+    assert len(history) == 2
+
+
+def test_compaction(qapp, tmp_path):
+    """The background load rewrites a long file with one line per path."""
+    filepath = tmp_path / "history.txt"
+    history = FileHistory(str(filepath))
+    history.COMPACT_MIN_LINES = 10
+    history.load()
+    for i in range(12):
+        history.record(f"/a/file{i % 3}.txt", NOW + i)
+    # Not while recording, on the GUI thread
+    assert len(filepath.read_text(encoding="utf-8").splitlines()) == 12
+
+    reloaded = FileHistory(str(filepath))
+    reloaded.COMPACT_MIN_LINES = 10
+    scheduler = TaskScheduler()
+    reloaded.load_in_background(scheduler)
+    reloaded.record("/a/file0.txt", NOW + 12)
+    assert wait_until(lambda: reloaded.is_loaded)
+    lines = filepath.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert reloaded.search("file")[0] == "/a/file0.txt"
+    # pylint: disable=protected-access
+    assert FileHistory(str(filepath))._ensure_loaded().counts == [5, 4, 4]
+    scheduler.deleteLater()
+
+
+def test_line_breaks_not_recorded(tmp_path):
+    """Paths with line breaks would corrupt the file and are skipped."""
+    filepath = str(tmp_path / "history.txt")
+    history = FileHistory(filepath)
+    history.record("/a/good.txt", NOW)
+    history.record("/a/bad\nname.txt", NOW)
+    history.record("/a/bad\rname.txt", NOW)
+    assert history.search("") == ["/a/good.txt"]
+    assert FileHistory(filepath).search("") == ["/a/good.txt"]
+
+
+def test_malformed_lines_skipped(tmp_path):
+    """A line cut short does not prevent loading."""
+    filepath = tmp_path / "history.txt"
+    filepath.write_text(f"{NOW}\t1\t/a/good.txt\n{NOW}\t1", encoding="utf-8")
+    assert FileHistory(str(filepath)).search("") == ["/a/good.txt"]
+
+
+def test_background_load(qapp, tmp_path):
+    """Files recorded during the background load are counted once."""
+    filepath = str(tmp_path / "history.txt")
+    FileHistory(filepath).record("/a/file.txt", NOW)
+    history = FileHistory(filepath)
+    scheduler = TaskScheduler()
+    history.load_in_background(scheduler)
+    assert history.is_loading
+    history.record("/a/file.txt", NOW + 1)
+    history.record("/a/other.txt", NOW + 2)
+    assert wait_until(lambda: history.is_loaded)
+
+    reloaded = FileHistory(filepath)
+    for loaded in (history, reloaded):
+        # pylint: disable=protected-access
+        index = loaded._ensure_loaded()
+        assert dict(zip(index.paths, index.counts)) == {"/a/file.txt": 2,
+                                                        "/a/other.txt": 1}
+
+
+def test_unreadable_file(qapp, tmp_path):
+    """Failing to read the file ends the loading with an empty history."""
+    filepath = tmp_path / "history.txt"
+    filepath.mkdir()
+    history = FileHistory(str(filepath))
+    loaded = []
+    history.loaded.connect(lambda: loaded.append(True))
+    scheduler = TaskScheduler()
+    history.load_in_background(scheduler)
+    history.record("/a/file.txt", NOW)
+    assert wait_until(lambda: not history.is_loading)
+    assert history.is_loaded and loaded
+    assert history.search("file") == ["/a/file.txt"]
+    history.record("/a/other.txt", NOW + 1)
+    assert history.search("txt") == ["/a/other.txt", "/a/file.txt"]
+    assert filepath.is_dir()
+
+    # The same without a background load
+    assert FileHistory(str(filepath)).search("") == []
+    scheduler.deleteLater()
+
+
+def test_quick_open_dialog(qapp, tmp_path):
+    """Typing narrows the list and Enter selects the current result."""
+    history = FileHistory(str(tmp_path / "history.txt"))
+    history.record("/docs/report.pdf", NOW)
+    history.record("/docs/photo.png", NOW + 1)
+    dialog = QuickOpenDialog(history)
+    assert dialog.results_list.count() == 2
+
+    QTest.keyClicks(dialog.search_field, "rep")
+    assert dialog.results_list.count() == 1
+    QTest.keyClick(dialog.search_field, Qt.Key.Key_Return)
+    assert dialog.selected_file == "/docs/report.pdf"
+    assert dialog.result() == dialog.DialogCode.Accepted
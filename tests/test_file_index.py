@@ -0,0 +1,197 @@
+"""
+Tests for file_index.py.
+
+Ensures:
+    - Opened files are indexed in the background with their size, image
+      dimensions, MIME type, content hash and last open time.
+    - Opening an unchanged file again only updates its last open time, a
+      changed file is scanned again and replaces its old row, told by the
+      GUI thread whether it is an image.
+    - Lookups answer many paths at once from the database alone, and the
+      index persists across instances.
+    - Connections opening a new database at once create its table once.
+    - Opening files through MainController indexes them, and the Open
+      Recent tooltips show what the index knows.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+
+import pytest
+from PyQt6.QtGui import QColor, QImage
+
+from app.main_window import MainWindow
+from core import file_index
+from core.file_index import FileIndex
+from core.main_controller import MainController
+from core.task_scheduler import TaskScheduler
+from tests.conftest import REPO_ROOT, wait_until
+
+
+@pytest.fixture(name="scheduler")
+def fixture_scheduler(qapp):
+    """Task scheduler for the indexing."""
+    scheduler = TaskScheduler({file_index.TASK_CATEGORY: 1})
+    yield scheduler
+    scheduler.cancel_all()
+    scheduler.wait_for_done()
+    scheduler.deleteLater()
+
+
+@pytest.fixture(name="image_path")
+def fixture_image_path(qapp, tmp_path):
+    """A 40 x 30 PNG file."""
+    image = QImage(40, 30, QImage.Format.Format_RGB32)
+    image.fill(QColor("teal"))
+    filepath = str(tmp_path / "image.png")
+    image.save(filepath)
+    return filepath
+
+
+def index_now(index, filepath, timestamp=None):
+    """Index a file and wait for its row."""
+    ready = []
+    index.info_ready.connect(ready.append)
+    index.record(filepath, timestamp)
+    assert wait_until(lambda: ready)
+    index.info_ready.disconnect(ready.append)
+    return ready[0]
+
+
+def test_indexes_files(scheduler, image_path, tmp_path):
+    """Images get dimensions, every file a type, size and hash."""
+    text_path = tmp_path / "notes.txt"
+    text_path.write_text("hello\n")
+    index = FileIndex(str(tmp_path / "index.sqlite3"), scheduler)
+
+    image = index_now(index, image_path, timestamp=1000)
+    assert (image.width, image.height) == (40, 30)
+    assert image.mime_type == "image/png"
+    assert image.size == os.path.getsize(image_path)
+    assert image.last_open == 1000
+    with open(image_path, "rb") as file:
+        assert image.content_hash == hashlib.sha256(file.read()).hexdigest()
+
+    text = index_now(index, str(text_path))
+    assert text.mime_type == "text/plain"
+    assert text.width is None and text.size == 6
+
+    missing = str(tmp_path / "missing.txt")
+    index.record(missing)
+    assert wait_until(lambda: not scheduler.running_count())
+    assert index.lookup([image_path, str(text_path), missing]) == {
+        image_path: image, str(text_path): text}
+    index.close()
+
+
+def test_rescans_changed_files_only(scheduler, image_path, tmp_path,
+                                    monkeypatch):
+    """Unchanged files are not read again, changed ones replace their row."""
+    db_path = str(tmp_path / "index.sqlite3")
+    index = FileIndex(db_path, scheduler)
+    first = index_now(index, image_path, timestamp=1000)
+
+    scans = []
+    scan_file = file_index.scan_file
+    monkeypatch.setattr(file_index, "scan_file",
+                        lambda *args: scans.append(args) or scan_file(*args))
+    again = index_now(index, image_path, timestamp=2000)
+    assert scans == []
+    assert again == first._replace(last_open=2000)
+
+    image = QImage(80, 60, QImage.Format.Format_RGB32)
+    image.fill(QColor("navy"))
+    image.save(image_path)
+    os.utime(image_path, ns=(first.mtime_ns + 10**9,) * 2)
+    changed = index_now(index, image_path, timestamp=3000)
+    # Told by the GUI thread that the file is an image
+    assert len(scans) == 1 and scans[0][3] is True
+    assert (changed.width, changed.height) == (80, 60)
+    assert changed.content_hash != first.content_hash
+    index.close()
+
+    # Persisted, one row per file
+    reopened = FileIndex(db_path, scheduler)
+    assert reopened.lookup([image_path, image_path]) == {image_path: changed}
+    assert reopened.get(str(tmp_path / "other.png")) is None
+    reopened.close()
+
+
+def test_bulk_lookup(scheduler, tmp_path):
+    """More paths than fit in one query are looked up in chunks."""
+    db_path = str(tmp_path / "index.sqlite3")
+    connection = file_index.connect(db_path)
+    with connection:
+        connection.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(f"/data/{i}.txt", i, i, None, None, "text/plain", "0", i)
+             for i in range(1200)])
+    connection.close()
+
+    index = FileIndex(db_path, scheduler)
+    paths = [f"/data/{i}.txt" for i in range(0, 2400, 2)]
+    infos = index.lookup(paths)
+    assert len(infos) == 600
+    assert infos["/data/1198.txt"].size == 1198
+    index.close()
+
+
+def test_concurrent_first_connections(tmp_path):
+    """No connection drops the table another one just wrote to."""
+    for attempt in range(10):
+        db_path = str(tmp_path / f"index{attempt}.sqlite3")
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def insert(number, path=db_path, barrier=barrier, errors=errors):
+            try:
+                barrier.wait()
+                connection = file_index.connect(path)
+                with connection:
+                    connection.execute(
+                        "INSERT INTO files VALUES (?, 1, 1, NULL, NULL, "
+                        "'text/plain', '0', 0)", (f"/data/{number}.txt",))
+                connection.close()
+            # pylint: disable-next=broad-exception-caught
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=insert, args=(number,))
+                   for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        connection = file_index.connect(db_path)
+        assert connection.execute(
+            "SELECT COUNT(*) FROM files").fetchone()[0] == 4
+        connection.close()
+
+
+def test_controller_and_recent_tooltips(qapp, image_path, tmp_path):
+    """Opening a file indexes it, Open Recent shows the details."""
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                config_dir)
+    controller = MainController(str(config_dir / "app_config.yaml"))
+    window = MainWindow(controller)
+    window.finish_startup()
+
+    controller.open_file(image_path)
+    # Queued behind the controller's startup tasks, e.g. the log index
+    assert wait_until(lambda: controller.file_index.get(image_path),
+                      timeout_ms=10000)
+    assert (config_dir / "file_index.sqlite3").exists()
+
+    window.open_recent_menu.aboutToShow.emit()
+    action = next(action for action in window.open_recent_menu.actions()
+                  if action.data() == image_path)
+    assert action.toolTip().splitlines() == [
+        image_path, f"{os.path.getsize(image_path)} B, 40 x 30, image/png"]
+    window.deleteLater()
+    controller.stop_background_tasks()
+    controller.deleteLater()
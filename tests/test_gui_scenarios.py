@@ -0,0 +1,52 @@
+"""
+Tests for the end-to-end GUI performance scenario runner.
+
+Ensures:
+    - Percentiles are computed correctly.
+    - Every scenario runs offscreen and produces a machine-readable report.
+    - The report has the time to first paint of the staged startup.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests.conftest import REPO_ROOT
+from tests.gui_scenarios import SCENARIOS, percentiles
+
+
+def test_percentiles():
+    """Percentiles interpolate between ranks and ignore missing values."""
+    summary = percentiles([4.0, None, 1.0, 3.0, 2.0, 5.0])
+    assert summary["count"] == 5
+    assert summary["p50"] == 3.0
+    assert summary["p90"] == pytest.approx(4.6)
+    assert summary["max"] == 5.0
+
+
+def test_percentiles_empty():
+    """An empty sample only reports its count."""
+    assert percentiles([None]) == {"count": 0}
+
+
+def test_run_all_scenarios(tmp_path):
+    """Run every scenario once and check the shape of the report."""
+    output = tmp_path / "report.json"
+    subprocess.run([sys.executable, "-m", "tests.gui_scenarios",
+                    "--output", str(output)],
+                   cwd=REPO_ROOT, check=True, timeout=300,
+                   env={**os.environ, "QT_QPA_PLATFORM": "offscreen"})
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert set(report["scenarios"]) == set(SCENARIOS)
+    for scenario in report["scenarios"].values():
+        assert scenario["steps"]
+        assert {"latency_ms", "frame_ms"} <= set(scenario["summary"])
+    assert report["scenarios"]["resize"]["summary"]["latency_ms"]["count"] > 0
+    startup = report["startup"]
+    assert startup["time_to_first_paint_ms"]["count"] == 1
+    assert startup["startup_ms"]["p50"] >= \
+        startup["time_to_first_paint_ms"]["p50"]
@@ -0,0 +1,116 @@
+"""
+Tests for icon_registry.py.
+
+Ensures:
+    - Each (icon, tint, size, device pixel ratio) is rendered once, however
+      often windows and dialogs ask for it.
+    - Pixmaps have the pixels of their device pixel ratio, and tints color
+      SVG templates.
+    - Stylesheet icons are written once per screen pixel ratio, and only
+      the ratios of new screens are written later.
+    - Changed resources are rendered again.
+"""
+
+import os
+import shutil
+
+import pytest
+from PyQt6.QtCore import QSize
+from PyQt6.QtGui import QColor, QPixmapCache
+
+from core import icon_registry as icon_registry_module
+from core.icon_registry import IconRegistry, icon_registry
+from tests.conftest import REPO_ROOT
+
+APP_ICON = "icons/application_icon.svg"
+PLUS_ICON = "icons/plus-symbol-template.svg"
+
+
+@pytest.fixture
+def registry(qapp):
+    """Registry with an empty pixmap cache."""
+    QPixmapCache.clear()
+    return IconRegistry()
+
+
+def test_icon_rendered_once_per_ratio(registry):
+    """Asking again, at the same size and ratio, is a cache hit."""
+    icon = registry.icon(APP_ICON)
+    for ratio in (1.0, 2.0, 1.0, 2.0):
+        pixmap = icon.pixmap(QSize(32, 32), ratio)
+        assert pixmap.size() == QSize(32, 32) * ratio
+        assert pixmap.devicePixelRatio() == ratio
+    assert registry.render_count == 2
+    registry.icon(APP_ICON).pixmap(QSize(32, 32), 2.0)
+    assert registry.render_count == 2
+    registry.icon(APP_ICON).pixmap(QSize(48, 48), 1.5)
+    assert registry.render_count == 3
+
+
+def test_tint(registry):
+    """Tint keywords are replaced in the SVG source."""
+    pixmap = registry.pixmap(PLUS_ICON, device_pixel_ratio=2,
+                             tint={"@button-plus-icon": "#ff0000"})
+    assert pixmap.size() == QSize(32, 32)
+    assert pixmap.toImage().pixelColor(16, 16) == QColor("#ff0000")
+    registry.pixmap(PLUS_ICON, device_pixel_ratio=2,
+                    tint={"@button-plus-icon": "#0000ff"})
+    assert registry.render_count == 2
+
+
+def test_missing_icon(registry):
+    """A missing icon is null instead of raising."""
+    assert registry.pixmap("icons/missing.svg", QSize(16, 16)).isNull()
+    assert registry.icon("icons/missing.svg").isNull()
+
+
+def test_stylesheet_files(registry, tmp_path, monkeypatch):
+    """Files are written per ratio, and for new ratios only once added."""
+    filepath = str(tmp_path / "plus.png")
+    tint = {"@button-plus-icon": "#ff0000"}
+    assert registry.write_pixmaps(PLUS_ICON, filepath, tint) == filepath
+    registry.write_pixmaps(PLUS_ICON, filepath, tint)
+    assert os.listdir(tmp_path) == ["plus.png"]
+    assert registry.render_count == 1
+
+    changes = []
+    registry.pixel_ratios_changed.connect(lambda: changes.append(True))
+    monkeypatch.setattr(registry, "_screen_ratios", lambda: [1, 2])
+    registry._on_screens_changed()  # pylint: disable=protected-access
+    registry._on_screens_changed()  # pylint: disable=protected-access
+    assert sorted(os.listdir(tmp_path)) == ["plus.png", "plus@2x.png"]
+    assert registry.render_count == 2
+    assert changes == [True]
+
+
+def test_invalidate(registry, tmp_path, monkeypatch):
+    """A changed icon resource is read and rendered again."""
+    shutil.copytree(os.path.join(REPO_ROOT, "resources", "icons"),
+                    tmp_path / "icons")
+    monkeypatch.setattr(
+        icon_registry_module, "resource_path",
+        lambda path: os.path.join(tmp_path, *path.split("/")))
+    tint = {"@button-plus-icon": "#ff0000"}
+    registry.pixmap(PLUS_ICON, tint=tint)
+    svg = tmp_path / PLUS_ICON
+    svg.write_text(svg.read_text().replace('width="16"', 'width="32"'))
+
+    assert registry.pixmap(PLUS_ICON, tint=tint).width() == 16
+    registry.invalidate(PLUS_ICON)
+    assert registry.pixmap(PLUS_ICON, tint=tint).width() == 32
+    assert registry.render_count == 2
+
+
+def test_windows_share_renders(qapp):
+    """Opening the About dialog again does not render the logo again."""
+    # pylint: disable=import-outside-toplevel
+    from app.dialogs.about_dialog import AboutDialog
+
+    AboutDialog().deleteLater()
+    renders = icon_registry().render_count
+    dialog = AboutDialog()
+    assert icon_registry().render_count == renders
+    logo = dialog._logo.pixmap()  # pylint: disable=protected-access
+    assert logo.devicePixelRatio() == dialog.devicePixelRatioF()
+    assert logo.size() == QSize(100, 100) * dialog.devicePixelRatioF()
+    dialog.deleteLater()
@@ -0,0 +1,202 @@
+"""
+Leak regression tests.
+
+Every interaction is repeated offscreen, first to warm up caches, then N and
+2N times. After each run the live QObjects are counted by class, the Python
+heap is measured with tracemalloc and the temporary files are listed.
+
+Ensures:
+    - Opening the "Open Recent" menu does not accumulate QActions.
+    - The About and Preferences dialogs are freed once closed.
+    - Compiling stylesheets does not accumulate temporary files.
+    - None of these grow the Python heap by more than a few hundred bytes
+      per repeat, and the check catches leaks of a kilobyte per repeat.
+
+``LEAK_REPEATS`` sets N (default 10).
+"""
+
+import gc
+import os
+import shutil
+import tracemalloc
+
+import pytest
+from PyQt6.QtCore import QPoint, QTimer
+from PyQt6.QtWidgets import QApplication
+
+from app.main_window import MainWindow
+from core.diagnostics import qobject_counts
+from core.main_controller import MainController
+from core.resource_loader import list_resources
+from tests.conftest import REPO_ROOT, wait_until
+
+REPEATS = int(os.environ.get("LEAK_REPEATS", "10"))
+WARM_UP = 3
+# Heap growth allowed over a run of 2N: a constant for allocator and cache
+# noise plus an amount per repeat, so the allowance per repeat shrinks
+# towards HEAP_SLACK_PER_REPEAT_BYTES as N grows
+HEAP_SLACK_BYTES = 8 * 1024
+HEAP_SLACK_PER_REPEAT_BYTES = 256
+
+
+@pytest.fixture
+def controller(qapp, tmp_path):
+    """Controller on a copy of the configuration."""
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                tmp_path)
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    controller.config_handler.recent_files = {
+        f"file{i}.png": str(tmp_path / f"file{i}.png") for i in range(5)}
+    yield controller
+    controller.stop_background_tasks()
+    controller.deleteLater()
+
+
+@pytest.fixture
+def window(controller):
+    """Shown main window."""
+    window = MainWindow(controller)
+    window.show()
+    window.finish_startup()
+    yield window
+    window.hide()
+    window.deleteLater()
+
+
+@pytest.fixture(autouse=True)
+def heap_tracing():
+    """Trace the Python heap for the duration of a test."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def settle(idle=None):
+    """Wait for background work, run deferred deletes, collect garbage."""
+    if idle is not None:
+        assert wait_until(idle)
+    for _ in range(2):
+        QApplication.sendPostedEvents(None, 0)
+        QApplication.processEvents()
+        gc.collect()
+
+
+def measure(interaction, repeats, temp_dir, idle=None):
+    """Run `interaction` and return what remains afterwards.
+
+    Returns
+    -------
+    tuple
+        QObject counts by class, traced heap size and temp file names.
+
+    """
+    for _ in range(repeats):
+        interaction()
+    settle(idle)
+    return (qobject_counts(), tracemalloc.get_traced_memory()[0],
+            set(os.listdir(temp_dir)))
+
+
+def assert_no_growth(interaction, temp_dir, idle=None):
+    """Fail if repeating `interaction` leaves more behind every time.
+
+    `idle` returns whether the background work started by the interaction
+    is done; it is waited for before measuring.
+    """
+    measure(interaction, WARM_UP, temp_dir, idle)
+    counts, heap, files = measure(interaction, 0, temp_dir, idle)
+    counts_n, heap_n, files_n = measure(interaction, REPEATS, temp_dir, idle)
+    counts_2n, heap_2n, files_2n = measure(interaction, 2 * REPEATS,
+                                           temp_dir, idle)
+
+    grown = {name: (counts[name], counts_n[name], counts_2n[name])
+             for name in counts_2n if counts_2n[name] > counts[name]}
+    assert not grown, f"QObjects grow with the repeats: {grown}"
+    assert files_2n == files_n == files, \
+        f"Temp files grow: {sorted(files_2n - files)}"
+    growth_n, growth_2n = heap_n - heap, heap_2n - heap_n
+    allowance = HEAP_SLACK_BYTES + 2 * REPEATS * HEAP_SLACK_PER_REPEAT_BYTES
+    assert growth_2n <= allowance, \
+        f"Heap grows with the repeats: {growth_n} B after {REPEATS}, " \
+        f"{growth_2n} B after {2 * REPEATS} more, " \
+        f"{growth_2n / (2 * REPEATS):.0f} B per repeat"
+
+
+def close_modal_dialog():
+    """Reject the modal dialog once it is shown."""
+    dialog = QApplication.activeModalWidget()
+    if dialog is None:
+        QTimer.singleShot(1, close_modal_dialog)
+    else:
+        dialog.reject()
+
+
+def test_open_recent_menu(window, controller):
+    """The recent file actions are deleted with the menu entries."""
+    def open_menu():
+        window.open_recent_menu.popup(QPoint(0, 0))
+        window.open_recent_menu.hide()
+
+    scheduler = controller.task_scheduler
+    assert_no_growth(open_menu, controller.config_handler.temp_dir,
+                     idle=lambda: scheduler.pending_count() == 0 and
+                     scheduler.running_count() == 0)
+    assert len(window.open_recent_menu.actions()) == 7
+
+
+def test_about_dialog(window, controller):
+    """The About dialog is freed once closed."""
+    def show_about():
+        QTimer.singleShot(0, close_modal_dialog)
+        controller.on_about()
+
+    assert_no_growth(show_about, controller.config_handler.temp_dir)
+
+
+def test_preferences_dialog(window, controller):
+    """The Preferences dialog is freed once closed."""
+    def show_preferences():
+        QTimer.singleShot(0, close_modal_dialog)
+        controller.on_edit_preferences()
+
+    assert_no_growth(show_preferences, controller.config_handler.temp_dir)
+
+
+def test_get_stylesheet(controller):
+    """Recompiling every theme reuses the same temporary files."""
+    themes = [os.path.basename(path)
+              for path in list_resources("styles", "colors*.qss")]
+    assert themes
+
+    def compile_stylesheets():
+        controller.config_handler.clear_cache()
+        for theme in themes:
+            controller.config_handler.get_stylesheet(theme)
+
+    assert_no_growth(compile_stylesheets, controller.config_handler.temp_dir)
+
+
+def test_harness_detects_leak(qapp, tmp_path):
+    """A growing number of objects fails the check."""
+    leaked = []
+
+    def leak():
+        leaked.append(QTimer())
+
+    with pytest.raises(AssertionError, match="QTimer"):
+        assert_no_growth(leak, tmp_path)
+
+
+@pytest.mark.parametrize("leak_bytes", [16 * 1024, 1024])
+def test_harness_detects_heap_growth(qapp, tmp_path, leak_bytes):
+    """A growing Python heap fails the check, even by a kilobyte a time."""
+    leaked = []
+
+    def leak():
+        leaked.append(bytearray(leak_bytes))
+
+    with pytest.raises(AssertionError, match="Heap grows"):
+        assert_no_growth(leak, tmp_path)
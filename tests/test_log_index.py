@@ -0,0 +1,188 @@
+"""
+Tests for log_index.py and the log viewer.
+
+Ensures:
+    - A log indexed in chunks has the same lines and filters as one indexed
+      at once, and incomplete lines wait for their line break.
+    - Lines without a record header belong to the record above, also across
+      chunks.
+    - Filters by level and module match filtering the lines one by one.
+    - New lines are followed, and a truncated log is indexed again.
+    - The log viewer shows, filters and follows the lines.
+"""
+
+import logging
+import random
+
+import pytest
+
+from app.dialogs.log_viewer_dialog import LogViewerDialog
+from core.log_index import (LogIndex, LogTail, index_log, level_number,
+                            split_record)
+from core.task_scheduler import TaskScheduler
+from tests.conftest import wait_until
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+MODULES = ["main_controller", "file_history", "theme_watcher"]
+
+
+def record(level, module, message):
+    """A line as written by core.logger."""
+    return f"2024-05-01 12:00:00 - {level} - {module} - {message}\n"
+
+
+def random_log(count, seed=0):
+    """Lines of a made-up log, with a traceback now and then."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        lines.append(record(rng.choice(LEVELS), rng.choice(MODULES),
+                            f"message {i} " + "x" * rng.randint(0, 40)))
+        if rng.random() < 0.05:
+            lines += ["Traceback (most recent call last):\n",
+                      "ValueError: boom\n"]
+    return lines
+
+
+def build_index(filepath, max_bytes):
+    """Index a whole file in chunks of `max_bytes`."""
+    index = LogIndex()
+    while True:
+        chunk = index_log(filepath, index.end, len(index), index.last_key,
+                          max_bytes)
+        if chunk.end == chunk.start:
+            return index
+        index.extend(chunk)
+
+
+def read_line(filepath, index, number):
+    """Text of a line, through its offsets."""
+    start, stop = index.span(number)
+    with open(filepath, "rb") as file:
+        file.seek(start)
+        return file.read(stop - start).decode()
+
+
+@pytest.fixture(name="log_file")
+def fixture_log_file(tmp_path):
+    """Log file and its lines."""
+    lines = random_log(2000)
+    filepath = tmp_path / "app.log"
+    filepath.write_text("".join(lines), encoding="utf-8")
+    return str(filepath), lines
+
+
+def test_chunks_match_whole(log_file):
+    """Small chunks index the same lines and filters as one chunk."""
+    filepath, lines = log_file
+    whole = build_index(filepath, 1 << 30)
+    chunked = build_index(filepath, 1000)
+    assert len(whole) == len(chunked) == len(lines)
+    assert whole.offsets == chunked.offsets
+    assert whole.postings == chunked.postings
+    for number in (0, 1, 500, len(lines) - 1):
+        assert read_line(filepath, chunked, number) == \
+            lines[number].rstrip("\n")
+
+
+@pytest.mark.parametrize("min_level, module", [
+    (0, None), (logging.INFO, None), (logging.WARNING, "file_history"),
+    (0, "theme_watcher"), (logging.CRITICAL, None)])
+def test_filters_match_brute_force(log_file, min_level, module):
+    """Filters keep the lines of matching records and their tracebacks."""
+    filepath, lines = log_file
+    index = build_index(filepath, 4096)
+    expected = []
+    fields = None
+    for number, line in enumerate(lines):
+        if not line.startswith("Traceback") and \
+                not line.startswith("ValueError"):
+            fields = split_record(line.rstrip("\n"))
+        if level_number(fields[1]) >= min_level and \
+                module in (None, fields[2]):
+            expected.append(number)
+    rows = index.rows(min_level, module)
+    if min_level == 0 and module is None:
+        assert rows is None
+    else:
+        assert list(rows) == expected
+        assert list(index.rows(min_level, module, first_line=1000)) == \
+            [number for number in expected if number >= 1000]
+
+
+def test_incomplete_line_waits(tmp_path):
+    """A line being written is only indexed once complete."""
+    filepath = tmp_path / "app.log"
+    filepath.write_text(record("INFO", "a", "one") + "2024-05-01 12:",
+                        encoding="utf-8")
+    chunk = index_log(str(filepath))
+    assert len(chunk.offsets) == 1
+    assert index_log(str(filepath), chunk.end).end == chunk.end
+
+
+def test_split_record():
+    """Headers are split into fields, other lines are messages."""
+    assert split_record(record("ERROR", "mod", "a - b").rstrip("\n")) == \
+        ("2024-05-01 12:00:00", "ERROR", "mod", "a - b")
+    assert split_record("  File x") == ("", "", "", "  File x")
+
+
+def test_tail_follows_and_resets(qapp, tmp_path):
+    """Appended lines are added, a truncated file is indexed again."""
+    filepath = tmp_path / "app.log"
+    filepath.write_text(record("INFO", "a", "one"), encoding="utf-8")
+    tail = LogTail(str(filepath), TaskScheduler(), poll_interval_ms=10)
+    added = []
+    resets = []
+    tail.lines_added.connect(lambda first, count: added.append((first, count)))
+    tail.reset.connect(lambda: resets.append(True))
+    tail.start()
+    assert wait_until(lambda: added == [(0, 1)])
+
+    with open(filepath, "a", encoding="utf-8") as file:
+        file.write(record("ERROR", "b", "two") + record("INFO", "a", "three"))
+    assert wait_until(lambda: len(added) == 2)
+    assert added[1] == (1, 2)
+    assert tail.line(2).endswith("three")
+
+    filepath.write_text(record("WARNING", "c", "new"), encoding="utf-8")
+    assert wait_until(lambda: len(added) == 3)
+    assert resets == [True]
+    assert len(tail.index) == 1
+    assert tail.line(0).endswith("new")
+    tail.stop()
+
+
+def test_log_viewer(qapp, tmp_path):
+    """The viewer lists, filters and follows the lines of the log."""
+    # pylint: disable=protected-access
+    filepath = tmp_path / "app.log"
+    lines = random_log(300, seed=1)
+    filepath.write_text("".join(lines), encoding="utf-8")
+    dialog = LogViewerDialog(str(filepath), TaskScheduler())
+    dialog.log_tail._poll_timer.setInterval(10)
+    dialog.show()
+    model = dialog.model
+    assert wait_until(lambda: model.rowCount() == len(lines))
+    assert model.index(0, 1).data() == split_record(lines[0])[1]
+    assert [dialog.module_filter.itemText(i)
+            for i in range(1, dialog.module_filter.count())] == sorted(MODULES)
+
+    dialog.level_filter.setCurrentIndex(
+        dialog.level_filter.findData(logging.ERROR))
+    errors = model.rowCount()
+    assert 0 < errors < len(lines)
+    assert {model.index(row, 1).data() for row in range(errors)} <= \
+        {"ERROR", ""}
+
+    with open(filepath, "a", encoding="utf-8") as file:
+        file.write(record("ERROR", "new_module", "new error") +
+                   record("INFO", "a", "not shown"))
+    assert wait_until(lambda: model.rowCount() == errors + 1)
+    assert model.index(errors, 3).data() == "new error"
+    assert dialog.module_filter.findText("new_module") > 0
+    bar = dialog.table.verticalScrollBar()
+    assert bar.value() == bar.maximum()
+
+    dialog.close()
+    assert not dialog.log_tail._poll_timer.isActive()
@@ -0,0 +1,117 @@
+"""
+Tests for the staged startup of main_window.py.
+
+Ensures:
+    - Only the frame and a placeholder are built before the first paint,
+      the other stages follow in later event-loop turns.
+    - The time to first paint and to the complete window are measured.
+    - Menus are filled when first shown, while their shortcuts work before.
+    - Windows share one controller, forwarded files go to the active one,
+      and only the last window to close saves the state.
+"""
+
+import os
+import shutil
+
+import pytest
+from PyQt6.QtCore import QPoint
+from PyQt6.QtWidgets import QLabel
+
+from app.main_window import MainWindow
+from core.main_controller import MainController
+from tests.conftest import REPO_ROOT, wait_until
+
+
+@pytest.fixture
+def controller(qapp, tmp_path):
+    """Controller on a copy of the configuration."""
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                tmp_path)
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    yield controller
+    controller.stop_background_tasks()
+    controller.deleteLater()
+
+
+def menu_titles(window):
+    """Titles of the menu bar's menus."""
+    return [action.text() for action in window.menuBar().actions()]
+
+
+def test_stages_after_first_paint(controller):
+    """The window paints before its menus and widgets are built."""
+    window = MainWindow(controller)
+    assert menu_titles(window) == []
+    assert not window.centralWidget().findChildren(QLabel)
+    assert window.time_to_first_paint_ms is None
+
+    window.show()
+    assert wait_until(lambda: window.startup_ms is not None)
+    assert 0 < window.time_to_first_paint_ms <= window.startup_ms
+    assert menu_titles(window) == ["&File", "&Edit", "&Help"]
+    assert window.centralWidget().findChildren(QLabel)
+    assert not window.windowIcon().isNull()
+    window.close()
+    window.deleteLater()
+
+
+def test_menus_filled_when_shown(controller):
+    """Menus are empty until shown, shortcuts work before."""
+    window = MainWindow(controller)
+    window.finish_startup()
+    file_menu = window.menuBar().actions()[0].menu()
+    assert file_menu.actions() == []
+    quick_open_action = next(action for action in window.actions()
+                             if action.text() == "&Quick Open...")
+    assert quick_open_action.shortcut().toString() == "Ctrl+P"
+
+    file_menu.aboutToShow.emit()
+    file_menu.aboutToShow.emit()
+    texts = [action.text() for action in file_menu.actions()]
+    assert texts == ["New &Window", "&Open...", "&Quick Open...",
+                     "Open &Recent", "&Close", "", "&Quit"]
+    assert file_menu.actions()[3].menu() is window.open_recent_menu
+    window.deleteLater()
+
+
+def test_finish_startup_is_idempotent(controller):
+    """Finishing early leaves nothing for the scheduled stages to do."""
+    window = MainWindow(controller)
+    window.show()
+    window.finish_startup()
+    startup_ms = window.startup_ms
+    assert wait_until(lambda: window.time_to_first_paint_ms is not None)
+    assert menu_titles(window) == ["&File", "&Edit", "&Help"]
+    assert window.startup_ms == startup_ms
+    window.close()
+    window.deleteLater()
+
+
+def test_windows_share_controller(controller, monkeypatch):
+    """Only closing the last window saves, files go to the active one."""
+    saves = []
+    monkeypatch.setattr(controller, "save_window_position_and_size",
+                        lambda window: saves.append(window))
+    monkeypatch.setattr(controller, "delete_temp_files",
+                        lambda: saves.append("temp files"))
+    first = MainWindow(controller)
+    first.show()
+    second = controller.new_window()
+    assert controller.windows == [first, second]
+    assert second.main_controller is first.main_controller
+    assert second.pos() - first.pos() == QPoint(30, 30)
+
+    opened = []
+    monkeypatch.setattr(controller, "open_file", opened.append)
+    controller.activate_window(first)
+    controller.open_files(["a.txt"])
+    assert opened == ["a.txt"]
+    assert controller.active_window() is first
+
+    first.close()
+    assert saves == []
+    assert controller.windows == [second]
+    second.close()
+    assert saves == [second, "temp files"]
+    assert controller.windows == []
+    first.deleteLater()
@@ -0,0 +1,261 @@
+"""
+Tests for metrics.py.
+
+Ensures:
+    - Counters, gauges and histograms render in the OpenMetrics text format,
+      with escaped labels, cumulative buckets and a closing "# EOF".
+    - Families are shared by name and reject conflicting redefinitions.
+    - Cache lookups are exported with their hit ratio.
+    - Blocking the event loop is counted as a stall.
+    - The metrics are written to a file and served on 127.0.0.1 only, as
+      read by a local scraper.
+    - The application records startup, stylesheet and config save times,
+      the startup ones for the first window only.
+"""
+
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.app_config_handler import ConfigHandler
+from core.metrics import (CONTENT_TYPE, CacheMetrics, Metric,
+                          MetricsExporter, MetricsRegistry, StallMonitor,
+                          metrics)
+from tests.conftest import wait_until
+
+SAMPLE_LINE = re.compile(
+    r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """Samples of an exposition as {(name, labels): value}.
+
+    Also checks the structure a scraper relies on: the metadata of a family
+    precedes its samples and the exposition ends with "# EOF".
+    """
+    lines = text.split("\n")
+    assert lines[-2:] == ["# EOF", ""]
+    families = set()
+    samples = {}
+    for line in lines[:-2]:
+        if line.startswith("# TYPE "):
+            families.add(line.split()[2])
+            continue
+        if line.startswith("#"):
+            assert line.split()[1] in ("HELP", "UNIT")
+            continue
+        name, labels, value = SAMPLE_LINE.match(line).groups()
+        assert any(name == family or name.startswith(family + "_")
+                   for family in families), line
+        key = (name, tuple(sorted(LABEL.findall(labels or ""))))
+        samples[key] = float(value)
+    return samples
+
+
+def scrape(url):
+    """Fetch a URL from a scraper thread while the event loop runs."""
+    result = {}
+
+    def fetch():
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                result["status"] = response.status
+                result["type"] = response.headers["Content-Type"]
+                result["body"] = response.read().decode("utf-8")
+        except urllib.error.HTTPError as error:
+            result["status"] = error.code
+        except OSError as error:
+            result["error"] = error
+
+    thread = threading.Thread(target=fetch)
+    thread.start()
+    assert wait_until(lambda: not thread.is_alive(), timeout_ms=5000)
+    return result
+
+
+def test_render():
+    """Every type renders with its suffixes, units and labels."""
+    registry = MetricsRegistry()
+    registry.counter("test_requests", "Requests\nserved", ("path",)).labels(
+        path='/a "b"\\').inc(3)
+    registry.gauge("test_temperature_celsius", "Temperature",
+                   unit="celsius").set(21.5)
+    registry.gauge("test_unset", "Never set")
+    histogram = registry.histogram("test_latency_seconds", "Latency",
+                                   unit="seconds", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert "# UNIT test_latency_seconds seconds" in text
+    assert "# HELP test_requests Requests\\nserved" in text
+    samples = parse(text)
+    assert ("test_unset", ()) not in samples
+    assert samples[("test_requests_total",
+                    (("path", '/a \\"b\\"\\\\'),))] == 3
+    assert samples[("test_temperature_celsius", ())] == 21.5
+    buckets = [samples[("test_latency_seconds_bucket", (("le", le),))]
+               for le in ("0.1", "1.0", "+Inf")]
+    assert buckets == [2, 3, 4]
+    assert samples[("test_latency_seconds_count", ())] == 4
+    assert samples[("test_latency_seconds_sum", ())] == pytest.approx(2.65)
+
+
+def test_registry_rules():
+    """Families are shared, conflicts and bad names are refused."""
+    registry = MetricsRegistry()
+    counter = registry.counter("test_events", "Events")
+    assert registry.counter("test_events", "Events") is counter
+    counter.inc()
+    assert counter.value == 1
+    with pytest.raises(ValueError):
+        registry.gauge("test_events", "Events")
+    with pytest.raises(ValueError):
+        registry.counter("test_events", "Events", ("kind",))
+    with pytest.raises(ValueError):
+        counter.inc(-1)
+    with pytest.raises(ValueError):
+        registry.histogram("test_duration", "No unit suffix", unit="seconds")
+    with pytest.raises(ValueError):
+        registry.counter("test_labelled", "", ("kind",)).inc()
+    # Only the kinds of metric have values
+    with pytest.raises(TypeError):
+        Metric("test_abstract", "")
+
+
+def test_cache_hit_ratio():
+    """The ratio follows the lookups and is absent before the first one."""
+    registry = MetricsRegistry()
+    cache = CacheMetrics("things", registry)
+    assert ("app_cache_hit_ratio", (("cache", "things"),)) not in parse(
+        registry.render())
+    for hit in (True, True, True, False):
+        cache.record(hit)
+    samples = parse(registry.render())
+    assert samples[("app_cache_hit_ratio", (("cache", "things"),))] == 0.75
+    assert samples[("app_cache_requests_total",
+                    (("cache", "things"), ("result", "miss")))] == 1
+
+
+def test_stall_monitor(qapp):
+    """Blocking the event loop for longer than the threshold is a stall."""
+    registry = MetricsRegistry()
+    monitor = StallMonitor(registry, check_interval_ms=10, threshold_ms=100)
+    monitor.start()
+    qapp.processEvents()
+    time.sleep(0.3)
+    stalls = registry.counter("app_event_loop_stalls", "")
+    assert wait_until(lambda: stalls.value >= 1)
+    monitor.stop()
+    durations = registry.histogram("app_event_loop_stall_seconds", "",
+                                   unit="seconds")
+    assert durations.count == stalls.value
+    assert durations.labels().sum > 0.15
+    monitor.deleteLater()
+
+
+def test_file_export(qapp, tmp_path):
+    """The file is written at once and rewritten on the interval."""
+    registry = MetricsRegistry()
+    counter = registry.counter("test_ticks", "Ticks")
+    filepath = tmp_path / "metrics.prom"
+    exporter = MetricsExporter(registry)
+    exporter.export_to_file(str(filepath), interval_s=0.05)
+    assert parse(filepath.read_text())[("test_ticks_total", ())] == 0
+    counter.inc(5)
+    assert wait_until(lambda: "test_ticks_total 5" in filepath.read_text())
+    assert exporter.stall_monitor.is_running
+    exporter.stop()
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+    exporter.deleteLater()
+
+
+def test_http_endpoint(qapp):
+    """A local scraper reads /metrics, other paths are not found."""
+    registry = MetricsRegistry()
+    registry.counter("test_scrapes", "Scrapes").inc(2)
+    exporter = MetricsExporter(registry)
+    assert exporter.listen(0)
+    base = f"http://127.0.0.1:{exporter.port}"
+
+    response = scrape(f"{base}/metrics")
+    assert response["status"] == 200, response
+    assert response["type"] == CONTENT_TYPE
+    assert parse(response["body"])[("test_scrapes_total", ())] == 2
+    assert scrape(f"{base}/admin")["status"] == 404
+    # Bound to the loopback interface only
+    # pylint: disable-next=protected-access
+    assert exporter._server.serverAddress().toString() == "127.0.0.1"
+
+    exporter.stop()
+    assert exporter.port is None
+    exporter.deleteLater()
+
+
+def test_from_environment(qapp, tmp_path, monkeypatch):
+    """Exporting is off unless asked for."""
+    monkeypatch.delenv("APP_METRICS_FILE", raising=False)
+    monkeypatch.delenv("APP_METRICS_PORT", raising=False)
+    assert MetricsExporter.from_environment() is None
+
+    monkeypatch.setenv("APP_METRICS_FILE", str(tmp_path / "app.prom"))
+    monkeypatch.setenv("APP_METRICS_INTERVAL", "60")
+    exporter = MetricsExporter.from_environment()
+    assert (tmp_path / "app.prom").read_text().endswith("# EOF\n")
+    assert "app_resident_memory_bytes " in (tmp_path / "app.prom").read_text()
+    exporter.stop()
+    exporter.deleteLater()
+
+
+def test_application_metrics(qapp, tmp_path):
+    """Startup stages, stylesheets, their cache and saves are recorded."""
+    # pylint: disable=import-outside-toplevel
+    from app.main_window import MainWindow
+    from core.main_controller import MainController
+
+    def sample(name, labels=()):
+        return parse(metrics().render()).get((name, labels), 0)
+
+    compiles = ("app_stylesheet_compile_seconds_count", (("kind", "full"),))
+    misses = ("app_cache_requests_total",
+              (("cache", "stylesheets"), ("result", "miss")))
+    hits = ("app_cache_requests_total",
+            (("cache", "stylesheets"), ("result", "hit")))
+    before = {key: sample(*key) for key in (compiles, misses, hits)}
+    saves_before = sample("app_config_save_seconds_count")
+    stage = ("app_startup_stage_seconds_count", (("stage", "create_menu"),))
+    stages_before = sample(*stage)
+
+    handler = ConfigHandler(str(tmp_path / "app_config.yaml"))
+    handler.get_stylesheet()
+    handler.get_stylesheet()
+    handler.save_config()
+
+    assert sample(*compiles) == before[compiles] + 1
+    assert sample(*misses) == before[misses] + 1
+    assert sample(*hits) == before[hits] + 1
+    assert sample("app_config_save_seconds_count") > saves_before
+
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    window = MainWindow(controller)
+    window.finish_startup()
+    assert sample(*stage) == stages_before + 1
+    assert sample("app_startup_complete_seconds") == pytest.approx(
+        window.startup_ms / 1e3)
+
+    # New windows are not startup
+    second = controller.new_window()
+    second.finish_startup()
+    assert sample(*stage) == stages_before + 1
+    assert sample("app_startup_complete_seconds") == pytest.approx(
+        window.startup_ms / 1e3)
+    second.close()
+    second.deleteLater()
+    window.deleteLater()
+    controller.stop_background_tasks()
+    controller.deleteLater()
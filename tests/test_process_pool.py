@@ -0,0 +1,114 @@
+"""
+Tests for process_pool.py.
+
+Ensures:
+    - Images decoded in worker processes arrive as QImages that use the
+      shared memory without a copy.
+    - Decoding respects the requested bounding box.
+    - Releasing a SharedImage frees its shared memory.
+    - Worker errors are delivered through the failed signal.
+    - Cancelled tasks never deliver their result.
+"""
+
+from multiprocessing import shared_memory
+
+import pytest
+from PyQt6 import sip
+from PyQt6.QtGui import QColor, QImage
+
+from core.process_pool import (ProcessPoolService, SharedImage,
+                               decode_image, image_to_shared_memory)
+from tests.conftest import wait_until
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """Process pool shared by the tests, the workers are slow to spawn."""
+    service = ProcessPoolService(max_workers=2)
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    """PNG with a distinct color in each half."""
+    image = QImage(64, 32, QImage.Format.Format_RGB32)
+    image.fill(QColor("#ff0000"))
+    for x in range(32, 64):
+        for y in range(32):
+            image.setPixelColor(x, y, QColor("#0000ff"))
+    path = str(tmp_path / "image.png")
+    assert image.save(path)
+    return path
+
+
+def run(pool, qapp, func, *args):
+    """Submit a task and wait for its outcome."""
+    outcome = []
+    task = pool.submit(func, *args)
+    task.finished.connect(outcome.append)
+    task.failed.connect(outcome.append)
+    assert wait_until(lambda: outcome, 30000)
+    return outcome[0]
+
+
+def test_decode_in_worker(qapp, pool, image_file):
+    """The worker's pixels are wrapped without a copy."""
+    shared = run(pool, qapp, decode_image, image_file)
+    assert isinstance(shared, SharedImage)
+    with shared:
+        image = shared.image
+        assert (image.width(), image.height()) == (64, 32)
+        assert image.pixelColor(0, 0) == QColor("#ff0000")
+        assert image.pixelColor(63, 31) == QColor("#0000ff")
+        # pylint: disable=protected-access
+        assert int(sip.voidptr(image.constBits())) == \
+            int(sip.voidptr(shared._shm.buf))
+
+
+def test_decode_scaled(qapp, pool, image_file):
+    """The image is decoded into the bounding box."""
+    with run(pool, qapp, decode_image, image_file, 16, 16) as shared:
+        assert (shared.image.width(), shared.image.height()) == (16, 8)
+
+
+def test_bulk_decode(qapp, pool, image_file):
+    """Many decodes in flight all arrive."""
+    results = []
+    for _ in range(8):
+        pool.submit(decode_image, image_file).finished.connect(
+            results.append)
+    assert wait_until(lambda: len(results) == 8, 30000)
+    for shared in results:
+        assert shared.image.width() == 64
+        shared.release()
+
+
+def test_release_frees_memory(qapp):
+    """Releasing unlinks the shared memory block."""
+    image = QImage(4, 4, QImage.Format.Format_ARGB32)
+    image.fill(QColor("#00ff00"))
+    info = image_to_shared_memory(image)
+    shared = SharedImage(info)
+    assert shared.image.pixelColor(3, 3) == QColor("#00ff00")
+    shared.release()
+    assert shared.image is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=info.name)
+
+
+def test_worker_error(qapp, pool, tmp_path):
+    """A file that cannot be decoded fails with OSError."""
+    error = run(pool, qapp, decode_image, str(tmp_path / "missing.png"))
+    assert isinstance(error, OSError)
+
+
+def test_cancel(qapp, pool, image_file):
+    """A cancelled task reports cancelled and never delivers its image."""
+    outcome = []
+    task = pool.submit(decode_image, image_file)
+    task.finished.connect(outcome.append)
+    task.cancelled.connect(lambda: outcome.append("cancelled"))
+    task.cancel()
+    assert wait_until(lambda: outcome, 30000)
+    assert outcome == ["cancelled"]
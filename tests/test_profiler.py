@@ -0,0 +1,126 @@
+"""
+Tests for profiler.py.
+
+Ensures:
+    - Sampling records the stacks of the GUI thread and of other threads.
+    - Speedscope files have a profile per thread, with valid frame indices
+      and the sampled time as weights.
+    - pstats files load with pstats, with own and cumulative times and
+      callers.
+    - Timed profiles are written next to the logs and announced, in both
+      modes, and only one profile is recorded at a time.
+"""
+
+import json
+import os
+import pstats
+import threading
+import time
+
+import pytest
+
+from core.profiler import (CPROFILE, SAMPLE, Profiler, StackSampler,
+                           frame_key)
+from tests.conftest import wait_until
+
+
+def spin(seconds):
+    """Keep a thread busy in this function."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def outer(seconds):
+    """Caller of spin."""
+    spin(seconds)
+
+
+@pytest.fixture(scope="module", name="sampler")
+def fixture_sampler():
+    """Sampler that recorded a busy thread and the test's own thread."""
+    sampler = StackSampler(interval=0.002)
+    worker = threading.Thread(target=outer, args=(0.3,), name="busy")
+    sampler.start()
+    worker.start()
+    spin(0.3)
+    worker.join()
+    sampler.stop()
+    return sampler
+
+
+def functions(sampler, thread_name):
+    """Names of the functions sampled in a thread."""
+    return {code.co_name for (name, stack) in sampler.samples
+            for code in stack if name == thread_name}
+
+
+def test_samples_threads(sampler):
+    """Both threads are sampled, the sampler itself is not."""
+    assert {"outer", "spin"} <= functions(sampler, "busy")
+    assert "spin" in functions(sampler, "MainThread")
+    assert not functions(sampler, "StackSampler")
+    assert sampler.rounds > 10
+    assert sampler.duration >= 0.3
+
+
+def test_speedscope(sampler, tmp_path):
+    """One sampled profile per thread, weighted in seconds."""
+    filepath = tmp_path / "profile.speedscope.json"
+    sampler.write_speedscope(str(filepath))
+    document = json.loads(filepath.read_text(encoding="utf-8"))
+    frames = document["shared"]["frames"]
+    profiles = {profile["name"]: profile for profile in document["profiles"]}
+    assert document["profiles"][0]["name"] == "MainThread"
+    assert "busy" in profiles
+
+    busy = profiles["busy"]
+    assert len(busy["samples"]) == len(busy["weights"])
+    assert busy["endValue"] == pytest.approx(sum(busy["weights"]))
+    assert busy["endValue"] == pytest.approx(0.3, rel=0.5)
+    for stack in busy["samples"]:
+        assert all(0 <= index < len(frames) for index in stack)
+    names = [frames[index]["name"] for index in busy["samples"][0]]
+    assert names.index("outer") < names.index("spin")
+
+
+def test_pstats(sampler, tmp_path):
+    """The file loads with pstats, spin's time is its own."""
+    filepath = tmp_path / "profile.pstats"
+    sampler.write_pstats(str(filepath))
+    stats = pstats.Stats(str(filepath)).stats
+    spin_key = frame_key(spin.__code__)
+    outer_key = frame_key(outer.__code__)
+    calls, _, own, cumulative, callers = stats[spin_key]
+    assert calls > 0
+    assert own == pytest.approx(cumulative)
+    assert outer_key in callers
+    _, _, outer_own, outer_cumulative, _ = stats[outer_key]
+    assert outer_own < outer_cumulative
+
+
+@pytest.mark.parametrize("mode, suffixes", [
+    (SAMPLE, [".speedscope.json", ".pstats"]), (CPROFILE, [".pstats"])])
+def test_timed_profile(qapp, tmp_path, mode, suffixes):
+    """The files are written once the time is up and announced."""
+    profiler = Profiler(str(tmp_path))
+    written = []
+    profiler.finished.connect(written.append)
+    assert profiler.start(0.2, mode)
+    assert not profiler.start(0.2, mode)
+    assert wait_until(lambda: written, timeout_ms=3000)
+    assert not profiler.is_running
+    filepaths = written[0]
+    assert [path[-len(suffix):] for path, suffix in
+            zip(filepaths, suffixes)] == suffixes
+    assert all(os.path.dirname(path) == str(tmp_path) for path in filepaths)
+    assert "wait_until" in {function for _, _, function in
+                            pstats.Stats(filepaths[-1]).stats}
+
+
+def test_unknown_mode(qapp, tmp_path):
+    """Unknown modes are refused before anything is recorded."""
+    profiler = Profiler(str(tmp_path))
+    with pytest.raises(ValueError):
+        profiler.start(1, "perf")
+    assert not profiler.is_running
@@ -0,0 +1,75 @@
+"""
+Unit tests for qss_optimizer.py.
+
+Ensures:
+    - Comments and whitespace are stripped.
+    - Identical rules are merged only when the cascade is unaffected.
+    - Selectors that cannot match a widget are dropped.
+    - The optimized application stylesheet keeps every widget rule.
+"""
+
+from core.app_config_handler import ConfigHandler
+from core.qss_optimizer import (drop_unused_rules, merge_identical_rules,
+                                optimize_stylesheet, widget_types)
+from core.qss_parser import parse_rules
+
+
+def test_strip():
+    """Comments and optional whitespace are removed."""
+    qss = "/* c */\n    QLabel {\n        color : #000000 ;\n    }\n"
+    assert optimize_stylesheet(qss) == "QLabel{color:#000000}"
+
+
+def test_merge_identical_rules():
+    """Rules with the same body become one selector list."""
+    rules = parse_rules("QSpinBox {padding: 2px}"
+                        "QLabel {color: red}"
+                        "QDoubleSpinBox {padding: 2px}")
+    assert merge_identical_rules(rules) == [
+        ("QSpinBox, QDoubleSpinBox", ["padding: 2px"]),
+        ("QLabel", ["color: red"]),
+        ]
+
+
+def test_merge_keeps_cascade():
+    """No merge across a rule that sets a property of the same family."""
+    rules = parse_rules("QLabel {border: none}"
+                        "QWidget {border-radius: 4px}"
+                        "QFrame {border: none}")
+    assert merge_identical_rules(rules) == rules
+
+
+def test_drop_unused_rules():
+    """Non-widget types and unknown ids are dropped from selector lists."""
+    rules = parse_rules("QApplication, QLabel {color: red}"
+                        "QApplication {color: blue}"
+                        "QWidget#used, QWidget#unused {border: none}"
+                        "QPushButton[text=\"OK\"] {padding: 2px}")
+    assert drop_unused_rules(rules, used_object_names=frozenset({"used"})) == [
+        ("QLabel", ["color: red"]),
+        ("QWidget#used", ["border: none"]),
+        ("QPushButton[text=\"OK\"]", ["padding: 2px"]),
+        ]
+
+
+def test_widget_types():
+    """Qt widgets and the custom widgets of the ui package are known."""
+    types = widget_types()
+    assert {"QWidget", "QPushButton", "QToggleSwitch"} <= types
+    assert "QApplication" not in types
+
+
+def test_app_stylesheet(tmp_path):
+    """Only the rules that cannot match a widget are lost."""
+    handler = ConfigHandler(str(tmp_path / "app_config.yaml"))
+    optimized = parse_rules(handler.get_stylesheet())
+    handler._optimize_stylesheets = False
+    handler.clear_cache()
+    raw = parse_rules(handler.get_stylesheet())
+
+    kept = {(s, d) for selector, declarations in optimized
+            for s in selector.split(", ") for d in declarations}
+    expected = {(s, d) for selector, declarations in raw
+                for s in selector.split(", ") for d in declarations
+                if s != "QApplication"}
+    assert kept == expected
@@ -0,0 +1,50 @@
+"""
+Unit tests for qss_parser.py.
+
+Ensures:
+    - Rules are parsed in source order without comments or extra whitespace.
+    - Formatting round-trips the parsed rules.
+    - Themed declarations are split from structural ones.
+"""
+
+from core.qss_parser import format_rules, parse_rules, split_themed_rules
+
+QSS = """
+/* Comment with { braces } */
+    QPushButton, QToolButton {
+        color: @text;
+        padding:  6px   12px;
+    }
+
+    QLabel { border: none }
+"""
+
+
+def test_parse_rules():
+    """Selectors and declarations are normalised and comments dropped."""
+    assert parse_rules(QSS) == [
+        ("QPushButton, QToolButton", ["color: @text", "padding: 6px 12px"]),
+        ("QLabel", ["border: none"]),
+        ]
+
+
+def test_format_round_trip():
+    """Formatted rules parse back to the same rules."""
+    rules = parse_rules(QSS)
+    assert parse_rules(format_rules(rules)) == rules
+    assert parse_rules(format_rules(rules, compact=True)) == rules
+
+
+def test_format_compact():
+    """Compact output has no optional whitespace."""
+    assert format_rules(parse_rules(QSS), compact=True) == (
+        "QPushButton,QToolButton{color:@text;padding:6px 12px}"
+        "QLabel{border:none}")
+
+
+def test_split_themed_rules():
+    """Declarations referencing keywords go to the themed part only."""
+    structural, themed = split_themed_rules(parse_rules(QSS))
+    assert structural == [("QPushButton, QToolButton", ["padding: 6px 12px"]),
+                          ("QLabel", ["border: none"])]
+    assert themed == [("QPushButton, QToolButton", ["color: @text"])]
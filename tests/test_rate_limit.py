@@ -0,0 +1,208 @@
+"""
+Tests for rate_limit.py.
+
+Ensures:
+    - A debouncer runs its slot once, with the latest arguments, after the
+      calls stopped.
+    - A throttler runs at once, then at most once per interval, and always
+      passes on the last call.
+    - A coalescer merges the calls of one event loop turn.
+    - Pending calls can be flushed or cancelled, and limiters are deleted
+      with the object of their slot without keeping it alive.
+    - Spinning the preferences' spin boxes, arrowing through the themes and
+      moving the main window do the expensive work once, with the values
+      the user ends up with.
+"""
+
+import gc
+import os
+import shutil
+import time
+import weakref
+
+import pytest
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, QPoint, Qt, pyqtSignal
+from PyQt6.QtTest import QTest
+
+from app.dialogs.config_dialog import ConfigDialog
+from app.main_window import MainWindow
+from core.main_controller import MainController
+from core.rate_limit import Coalescer, Debouncer, coalesce, debounce, throttle
+from tests.conftest import REPO_ROOT, wait_until
+
+
+class Source(QObject):
+    """Emitter of a high-frequency signal."""
+
+    value_changed = pyqtSignal(int)
+
+
+@pytest.fixture(name="config_path")
+def fixture_config_path(qapp, tmp_path):
+    """Copy of the configuration."""
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                tmp_path)
+    return str(tmp_path / "app_config.yaml")
+
+
+def test_debounce(qapp):
+    """A burst of emissions runs the slot once, with the last value."""
+    source = Source()
+    calls = []
+    limiter = debounce(source.value_changed, calls.append, 50, parent=source)
+    for value in range(10):
+        source.value_changed.emit(value)
+        QTest.qWait(5)
+    assert calls == [] and limiter.is_pending
+    assert wait_until(lambda: calls)
+    QTest.qWait(100)
+    assert calls == [9]
+    assert not limiter.is_pending
+
+
+def test_throttle(qapp):
+    """The first call runs at once, the rest at most once per interval."""
+    source = Source()
+    calls = []
+    throttle(source.value_changed, lambda value: calls.append(
+        (value, time.perf_counter())), 100, parent=source)
+    start = time.perf_counter()
+    for value in range(30):
+        source.value_changed.emit(value)
+        QTest.qWait(10)
+    burst = time.perf_counter() - start
+    QTest.qWait(250)
+
+    values = [value for value, _ in calls]
+    assert values[0] == 0 and values[-1] == 29
+    assert len(values) <= burst / 0.1 + 2
+    times = [start] + [called for _, called in calls]
+    # Timers may fire a little early
+    assert all(later - earlier > 0.09
+               for earlier, later in zip(times[1:], times[2:]))
+
+
+def test_coalesce(qapp):
+    """The calls of one event loop turn run the slot once."""
+    source = Source()
+    calls = []
+    coalesce(source.value_changed, calls.append, parent=source)
+    for value in range(5):
+        source.value_changed.emit(value)
+    assert calls == []
+    qapp.processEvents()
+    assert calls == [4]
+
+
+def test_flush_cancel_and_parent(qapp):
+    """Pending calls run on flush, never after cancel."""
+    owner = Source()
+    calls = []
+    limiter = Debouncer(lambda *args: calls.append(args), 1000, parent=owner)
+    limiter("a", 1)
+    limiter.flush()
+    assert calls == [("a", 1)]
+    limiter.flush()
+    limiter("b", 2)
+    limiter.cancel()
+    QTest.qWait(20)
+    assert calls == [("a", 1)]
+
+    # A method of a QObject makes its object the parent
+    bound = Coalescer(owner.deleteLater)
+    assert bound.parent() is owner
+    owner.deleteLater()
+    assert wait_until(lambda: sip.isdeleted(limiter) and
+                      sip.isdeleted(bound))
+
+
+def test_owner_not_kept_alive(qapp):
+    """An object holding a limiter of its method is freed at once."""
+    owner = Source()
+    owner.limiter = debounce(owner.value_changed, owner.objectName, 10)
+    owner_ref = weakref.ref(owner)
+    gc.disable()
+    try:
+        del owner
+        assert owner_ref() is None
+    finally:
+        gc.enable()
+
+
+def test_preferences_spin_and_theme_preview(qapp, config_path, monkeypatch):
+    """Intermediate values of the fields are dropped."""
+    controller = MainController(config_path)
+    handler = controller.config_handler
+    themes = []
+    get_stylesheet_parts = handler.get_stylesheet_parts
+    monkeypatch.setattr(handler, "get_stylesheet_parts", lambda theme=None: (
+        themes.append(theme) or get_stylesheet_parts(theme)))
+    dialog = ConfigDialog(handler)
+    dialog.show()
+
+    recents = []
+    monkeypatch.setattr(dialog, "_pending_changes",
+                        RecordingDict(recents, "num_recents_to_show"))
+    spin = dialog.num_recents_field
+    spin.setValue(1)
+    for _ in range(10):
+        QTest.keyClick(spin, Qt.Key.Key_Up)
+    combo = dialog.window_theme_field
+    QTest.keyClick(combo, Qt.Key.Key_Home)
+    for _ in range(combo.count() * 3):
+        QTest.keyClick(combo, Qt.Key.Key_Down)
+        QTest.keyClick(combo, Qt.Key.Key_Up)
+    QTest.keyClick(combo, Qt.Key.Key_End)
+
+    # Saving takes the values pending in the limiters
+    dialog.button_box.accepted.emit()
+    assert recents == [11]
+    assert handler.num_recents_to_show == 11
+    assert themes[-1] == combo.itemData(combo.count() - 1)
+    assert handler.theme_filename == themes[-1]
+    assert len(themes) < combo.count() * 6
+    dialog.deleteLater()
+    controller.stop_background_tasks()
+    controller.deleteLater()
+
+
+class RecordingDict(dict):
+    """Dict recording the values set for one key."""
+
+    def __init__(self, values, key):
+        super().__init__()
+        self.values = values
+        self.key = key
+
+    def __setitem__(self, key, value):
+        if key == self.key:
+            self.values.append(value)
+        super().__setitem__(key, value)
+
+
+def test_window_geometry_saved_when_at_rest(qapp, config_path, monkeypatch):
+    """Moving a window saves its geometry once it stopped."""
+    controller = MainController(config_path)
+    window = MainWindow(controller)
+    window.finish_startup()
+    window.show()
+    saves = []
+    monkeypatch.setattr(controller, "save_config_in_background",
+                        lambda: saves.append(
+                            controller.config_handler.window_position))
+    assert wait_until(lambda: window.time_to_first_paint_ms is not None)
+    # The placement when shown is not saved
+    # pylint: disable-next=protected-access
+    assert not window._geometry_saver.is_pending
+
+    start = window.pos()
+    for step in range(1, 21):
+        window.move(start + QPoint(step, step))
+        qapp.processEvents()
+    assert saves == []
+    assert wait_until(lambda: saves, 3000)
+    assert saves == [(start.x() + 20, start.y() + 20)]
+    window.close()
+    window.deleteLater()
+    controller.deleteLater()
@@ -0,0 +1,107 @@
+"""
+Unit tests for resource_loader.py and build_resources.py.
+
+Ensures:
+    - The compiled archive registers with Qt and serves every asset.
+    - Assets read from the archive match the loose files.
+    - Paths fall back to the loose files when no archive is registered,
+      also when the archive is older than the loose files.
+"""
+
+import os
+
+import pytest
+from PyQt6.QtCore import QFile
+
+from core import resource_loader
+from resources import build_resources
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Build the archive into a temporary file and register it."""
+    path = build_resources.main(str(tmp_path / "resources.rcc"))
+    assert resource_loader.register_resources(path)
+    yield path
+    resource_loader.unregister_resources()
+
+
+def test_qt_hash():
+    """Names hash to the same values as Qt's qt_hash."""
+    assert build_resources.qt_hash("") == 0
+    assert build_resources.qt_hash("a") == ord("a")
+    assert build_resources.qt_hash("icons") == 0x006fa653
+
+
+def test_archive_contents(archive):
+    """Every asset is served from the archive with identical contents."""
+    for asset_dir in build_resources.ASSET_DIRS:
+        loose_dir = os.path.join(resource_loader.RESOURCE_DIR, asset_dir)
+        for filename in os.listdir(loose_dir):
+            path = resource_loader.resource_path(f"{asset_dir}/{filename}")
+            assert path == f":/{asset_dir}/{filename}"
+            with open(os.path.join(loose_dir, filename), "r",
+                      encoding="utf-8") as file:
+                assert resource_loader.read_text(path) == file.read()
+
+
+def test_archive_excludes_runtime_files(archive):
+    """The per-user config is not packed into the archive."""
+    assert not QFile.exists(":/app_config.yaml")
+    path = resource_loader.resource_path("app_config.yaml")
+    assert path == os.path.join(resource_loader.RESOURCE_DIR,
+                                "app_config.yaml")
+
+
+def test_register_is_idempotent(archive):
+    """Registering twice keeps the first archive."""
+    assert resource_loader.register_resources("does-not-exist.rcc")
+
+
+def test_list_resources(archive):
+    """Themes are listed from the archive."""
+    themes = resource_loader.list_resources("styles", "colors*.qss")
+    assert [os.path.basename(t) for t in themes] == [
+        "colors_dark.qss", "colors_dark_orange.qss", "colors_light.qss"]
+    assert all(t.startswith(":/styles/") for t in themes)
+
+
+def test_loose_file_fallback(tmp_path):
+    """Without an archive every path resolves to the loose file."""
+    assert not resource_loader.register_resources(str(tmp_path / "no.rcc"))
+    path = resource_loader.resource_path("styles/colors_dark.qss")
+    assert path == os.path.join(resource_loader.RESOURCE_DIR, "styles",
+                                "colors_dark.qss")
+    assert resource_loader.read_text(path).startswith("@theme-name = Dark")
+    themes = resource_loader.list_resources("styles", "colors*.qss")
+    assert len(themes) == 3 and all(os.path.isabs(t) for t in themes)
+
+
+def test_stale_archive_ignored(tmp_path, caplog):
+    """An archive older than the loose files is not registered."""
+    path = build_resources.main(str(tmp_path / "resources.rcc"))
+    newest = resource_loader.newest_asset_mtime()
+    os.utime(path, (newest - 1, newest - 1))
+    assert not resource_loader.register_resources(path)
+    assert "older than the files" in caplog.text
+    assert not resource_loader.resource_path(
+        "styles/colors_dark.qss").startswith(":")
+
+
+def test_removed_asset_is_newer(tmp_path):
+    """Removing an asset counts as a change of its directory."""
+    icons = tmp_path / "icons"
+    icons.mkdir()
+    (icons / "a.svg").write_text("<svg/>")
+    os.utime(icons / "a.svg", (1000, 1000))
+    os.utime(icons, (1000, 1000))
+    assert resource_loader.newest_asset_mtime(str(tmp_path)) == 1000
+    (icons / "a.svg").unlink()
+    assert resource_loader.newest_asset_mtime(str(tmp_path)) > 1000
+    assert resource_loader.newest_asset_mtime(str(tmp_path / "none")) == 0
+
+
+def test_missing_resource(archive):
+    """Reading a missing resource raises FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        resource_loader.read_text(":/styles/missing.qss")
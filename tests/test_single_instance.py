@@ -0,0 +1,100 @@
+"""
+Tests for single_instance.py and the single-instance startup of main.py.
+
+Ensures:
+    - Forwarding fails when no instance is running.
+    - Files forwarded by another launch arrive through files_received.
+    - A socket left behind by a crashed instance does not block listening.
+    - A second launch of main.py hands its files over and exits without
+      importing QtWidgets.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import uuid
+
+import pytest
+from PyQt6.QtCore import QDir
+
+from core.single_instance import SingleInstance, server_name
+from tests.conftest import REPO_ROOT, wait_until
+
+
+@pytest.fixture
+def key():
+    """Application key no other test or instance uses."""
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def instance(qapp, key):
+    """Listening instance collecting the files it receives."""
+    instance = SingleInstance(key)
+    instance.received = []
+    instance.files_received.connect(instance.received.append)
+    assert instance.listen()
+    yield instance
+    instance.close()
+
+
+def test_forward_without_instance(key):
+    """Nothing is forwarded when no instance is listening."""
+    assert not SingleInstance.forward(["/tmp/a.txt"], key, timeout_ms=50)
+
+
+def test_forward_files(instance, key):
+    """Forwarded files arrive in order."""
+    files = ["/tmp/a.txt", "/tmp/ü b.png"]
+    assert SingleInstance.forward(files, key)
+    assert wait_until(lambda: instance.received)
+    assert instance.received == [files]
+
+
+def test_second_listener_backs_off(instance, key):
+    """A second instance does not take over the socket."""
+    other = SingleInstance(key)
+    assert not other.listen()
+    assert SingleInstance.forward(["/tmp/a.txt"], key)
+    assert wait_until(lambda: instance.received)
+    assert instance.received == [["/tmp/a.txt"]]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+def test_stale_socket_is_replaced(qapp, key):
+    """The socket file of a crashed instance is removed."""
+    path = os.path.join(QDir.tempPath(), server_name(key))
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    instance = SingleInstance(key)
+    try:
+        assert instance.listen()
+    finally:
+        instance.close()
+
+
+def test_second_launch_forwards(qapp, tmp_path):
+    """main.py forwards its files and exits before importing QtWidgets."""
+    instance = SingleInstance()
+    received = []
+    instance.files_received.connect(received.extend)
+    if not instance.listen():
+        pytest.skip("Another instance of the application is running")
+    script = ("import sys, main\n"
+              "sys.argv = ['main.py', 'photo.png']\n"
+              "try:\n"
+              "    main.main()\n"
+              "except SystemExit as exit_:\n"
+              "    print(exit_.code, 'PyQt6.QtWidgets' in sys.modules)\n")
+    try:
+        result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path,
+                                env={**os.environ, "PYTHONPATH": REPO_ROOT},
+                                capture_output=True, text=True, timeout=30,
+                                check=True)
+        assert result.stdout.split() == ["0", "False"]
+        assert wait_until(lambda: received)
+        assert received == [str(tmp_path / "photo.png")]
+    finally:
+        instance.close()
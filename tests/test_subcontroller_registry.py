@@ -0,0 +1,184 @@
+"""
+Tests for subcontroller_registry.py.
+
+Ensures:
+    - Declaring subcontrollers imports and constructs none of them.
+    - A subcontroller is constructed once, on the first use of its menu
+      action, signal or file type.
+    - Declarations are read from a manifest and from entry points.
+    - Invalid declarations, including names that are not signals, are
+      rejected before connecting anything, and broken manifests and manifest
+      entries are skipped.
+"""
+
+import sys
+
+import pytest
+
+from core.main_controller import MainController
+from core.subcontroller_registry import SubcontrollerSpec
+
+PLUGIN_SOURCE = '''
+CONSTRUCTED = []
+
+
+class PluginController:
+    def __init__(self, main_controller):
+        CONSTRUCTED.append(main_controller)
+        self.calls = []
+
+    def on_action(self):
+        self.calls.append("action")
+
+    def on_theme_changed(self):
+        self.calls.append("theme")
+
+    def open_file(self, filepath):
+        self.calls.append(filepath)
+'''
+
+MANIFEST = '''
+plugin:
+  class: registry_plugin:PluginController
+  actions:
+    - {menu: "&Tools", text: "&Run plugin", slot: on_action}
+  signals:
+    window_theme_changed: on_theme_changed
+  file_types: [".plug"]
+'''
+
+
+@pytest.fixture
+def plugin_dir(tmp_path, monkeypatch):
+    """Importable directory holding the plugin module and its manifest."""
+    (tmp_path / "registry_plugin.py").write_text(PLUGIN_SOURCE)
+    (tmp_path / "subcontrollers.yaml").write_text(MANIFEST)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    sys.modules.pop("registry_plugin", None)
+
+
+@pytest.fixture
+def controller(qapp, tmp_path, plugin_dir):
+    """Main controller with the plugin manifest loaded."""
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    controller.subcontrollers.load_manifest(
+        str(plugin_dir / "subcontrollers.yaml"))
+    return controller
+
+
+def test_declaring_does_not_import(controller):
+    """Nothing is imported or constructed until first use."""
+    assert [s.name for s in controller.subcontrollers.specs()] == ["plugin"]
+    assert "registry_plugin" not in sys.modules
+    assert not controller.subcontrollers.is_loaded("plugin")
+
+
+def test_menu_action_loads_once(controller):
+    """The menu action constructs the subcontroller on its first trigger."""
+    # pylint: disable=import-outside-toplevel
+    from app.main_window import MainWindow
+
+    window = MainWindow(controller)
+    window.finish_startup()
+    tools = next(a.menu() for a in window.menuBar().actions()
+                 if a.text() == "&Tools")
+    assert [a.text() for a in window.menuBar().actions()][-2:] == [
+        "&Tools", "&Help"]
+    assert "registry_plugin" not in sys.modules
+
+    tools.actions()[0].trigger()
+    tools.actions()[0].trigger()
+    plugin = controller.subcontrollers.get("plugin")
+    assert plugin.calls == ["action", "action"]
+    assert sys.modules["registry_plugin"].CONSTRUCTED == [controller]
+    window.deleteLater()
+
+
+def test_signal_loads(controller):
+    """A declared signal of MainController reaches the subcontroller."""
+    controller.window_theme_changed.emit()
+    assert controller.subcontrollers.get("plugin").calls == ["theme"]
+
+
+def test_file_type_loads(controller, tmp_path):
+    """Files of a declared type are opened by the subcontroller."""
+    controller.open_file(str(tmp_path / "a.txt"))
+    assert not controller.subcontrollers.is_loaded("plugin")
+    controller.open_file(str(tmp_path / "B.PLUG"))
+    assert controller.subcontrollers.get("plugin").calls == [
+        str(tmp_path / "B.PLUG")]
+
+
+def test_entry_points(qapp, tmp_path, plugin_dir):
+    """Installed packages declare subcontrollers through entry points."""
+    (plugin_dir / "registry_plugin_spec.py").write_text(
+        "SPEC = {'class': 'registry_plugin:PluginController',"
+        " 'file_types': ['.ep']}\n")
+    dist_info = plugin_dir / "registry_plugin-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: registry-plugin\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text(
+        "[my_pyqt_app.subcontrollers]\n"
+        "entry_plugin = registry_plugin_spec:SPEC\n")
+
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    assert controller.subcontrollers.load_entry_points() == 1
+    assert controller.subcontrollers.handler_for_file("x.ep") == \
+        "entry_plugin"
+    assert "registry_plugin" not in sys.modules
+    sys.modules.pop("registry_plugin_spec", None)
+
+
+@pytest.mark.parametrize("declaration", [
+    {},
+    {"class": "no_colon"},
+    {"class": "a:B", "actions": [{"menu": "&File", "text": "X"}]},
+    ])
+def test_invalid_declarations(declaration):
+    """Declarations without a usable class or action are rejected."""
+    with pytest.raises(ValueError):
+        SubcontrollerSpec.from_dict("bad", declaration)
+
+
+def test_duplicate_and_unknown_signal(controller):
+    """Names are unique and declared signals must exist."""
+    registry = controller.subcontrollers
+    with pytest.raises(ValueError):
+        registry.register(SubcontrollerSpec("plugin", "a:B"))
+    with pytest.raises(ValueError):
+        registry.register(SubcontrollerSpec("other", "a:B",
+                                            signals={"no_signal": "slot"}))
+
+
+def test_non_signal_attribute(controller):
+    """A declared name that is not a signal connects nothing."""
+    registry = controller.subcontrollers
+    signal = controller.window_theme_changed
+    receivers = controller.receivers(signal)
+    with pytest.raises(ValueError):
+        registry.register(SubcontrollerSpec(
+            "other", "a:B",
+            signals={"window_theme_changed": "theme", "open_file": "x"}))
+    assert controller.receivers(signal) == receivers
+    assert [spec.name for spec in registry.specs()] == ["plugin"]
+
+
+def test_broken_manifest_skipped(qapp, tmp_path, plugin_dir):
+    """Bad entries and unparsable manifests do not stop the startup."""
+    manifest = plugin_dir / "broken.yaml"
+    manifest.write_text(MANIFEST + "no_class:\n  file_types: ['.x']\n"
+                        "not_a_dict: 3\n"
+                        "not_a_signal:\n  class: 'a:B'\n"
+                        "  signals: {open_file: x}\n")
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    registry = controller.subcontrollers
+    assert registry.load_manifest(str(manifest)) == 1
+    assert [spec.name for spec in registry.specs()] == ["plugin"]
+
+    manifest.write_text("plugin: [unclosed\n")
+    assert registry.load_manifest(str(manifest)) == 0
+    manifest.write_text("- a list\n")
+    assert registry.load_manifest(str(manifest)) == 0
+    assert registry.load_manifest(str(plugin_dir / "missing.yaml")) == 0
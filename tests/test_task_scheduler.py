@@ -0,0 +1,230 @@
+"""
+Tests for task_scheduler.py.
+
+Ensures:
+    - Results and errors are delivered on the GUI thread.
+    - Higher priority tasks start first.
+    - Category concurrency limits are respected.
+    - Identical in-flight tasks run once, unless the first was cancelled.
+    - Queued tasks can be cancelled and running tasks see their token.
+    - Deleting a scheduler while a task runs drops the task's outcome.
+"""
+
+import threading
+import time
+
+import pytest
+from PyQt6 import sip
+from PyQt6.QtCore import QThread, QThreadPool
+
+from core.task_scheduler import Priority, TaskScheduler
+from tests.conftest import wait_until
+
+
+def make_scheduler(threads, category_limits=None):
+    """Scheduler on its own pool of `threads` threads."""
+    pool = QThreadPool()
+    pool.setMaxThreadCount(threads)
+    scheduler = TaskScheduler(category_limits, pool)
+    scheduler.pool = pool
+    return scheduler
+
+
+@pytest.fixture
+def gate():
+    """Event the test sets to let blocked tasks return."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_result_on_gui_thread(qapp):
+    """The finished signal carries the result and arrives on the GUI thread."""
+    scheduler = make_scheduler(2)
+    received = []
+    handle = scheduler.submit(lambda a, b: (a + b, threading.get_ident()),
+                              1, b=2)
+    handle.finished.connect(
+        lambda result: received.append((result, QThread.currentThread())))
+    assert wait_until(lambda: received)
+    (total, worker), thread = received[0]
+    assert total == 3 and worker != threading.get_ident()
+    assert thread is qapp.thread()
+    scheduler.wait_for_done()
+
+
+def test_error_is_delivered(qapp):
+    """Exceptions arrive through the failed signals."""
+    scheduler = make_scheduler(1)
+    errors = []
+    scheduler.task_failed.connect(lambda handle, error: errors.append(error))
+    scheduler.submit(lambda: 1 / 0)
+    assert wait_until(lambda: errors)
+    assert isinstance(errors[0], ZeroDivisionError)
+    scheduler.wait_for_done()
+
+
+def test_priority_order(qapp, gate):
+    """Queued tasks start by priority, then in submission order."""
+    scheduler = make_scheduler(1)
+    order = []
+    scheduler.submit(gate.wait)
+    for name, priority in [("low", Priority.LOW), ("normal1", 0),
+                           ("high", Priority.HIGH), ("normal2", 0)]:
+        scheduler.submit(order.append, name, priority=priority)
+    gate.set()
+    assert wait_until(lambda: len(order) == 4)
+    assert order == ["high", "normal1", "normal2", "low"]
+    scheduler.wait_for_done()
+
+
+def test_category_limit(qapp):
+    """No more than the limit of a category runs at once."""
+    scheduler = make_scheduler(4, {"io": 1})
+    lock = threading.Lock()
+    running = {"io": 0, "cpu": 0}
+    peak = {"io": 0, "cpu": 0}
+    done = []
+
+    def work(category):
+        with lock:
+            running[category] += 1
+            peak[category] = max(peak[category], running[category])
+        time.sleep(0.02)
+        with lock:
+            running[category] -= 1
+
+    for _ in range(3):
+        for category in ("io", "cpu"):
+            scheduler.submit(work, category, category=category).finished \
+                .connect(done.append)
+    assert scheduler.running_count("io") == 1
+    assert wait_until(lambda: len(done) == 6)
+    assert peak["io"] == 1 and peak["cpu"] > 1
+    scheduler.wait_for_done()
+
+
+def test_identical_jobs_run_once(qapp, gate):
+    """A job with the key of an in-flight job joins it."""
+    scheduler = make_scheduler(1)
+    calls = []
+
+    def job():
+        calls.append(1)
+        gate.wait()
+        return "done"
+
+    first = scheduler.submit(job, key=("job", 1))
+    second = scheduler.submit(job, key=("job", 1))
+    other = scheduler.submit(job, key=("job", 2))
+    assert first is second and other is not first
+    results = []
+    first.finished.connect(results.append)
+    gate.set()
+    assert wait_until(lambda: len(calls) == 2 and results)
+    assert results == ["done"]
+    # Once done, the key can run again
+    third = scheduler.submit(job, key=("job", 1))
+    assert third is not first
+    scheduler.wait_for_done()
+
+
+def test_cancelled_job_is_not_joined(qapp, gate):
+    """A job with the key of a cancelled running job runs again."""
+    scheduler = make_scheduler(2)
+    started = threading.Event()
+    outcome = []
+
+    def job():
+        started.set()
+        gate.wait()
+        return "done"
+
+    first = scheduler.submit(job, key="job")
+    assert started.wait(2)
+    first.cancel()
+    second = scheduler.submit(job, key="job")
+    assert second is not first
+    assert scheduler.submit(job, key="job") is second
+    first.cancelled.connect(lambda: outcome.append("cancelled"))
+    second.finished.connect(outcome.append)
+    gate.set()
+    assert wait_until(lambda: len(outcome) == 2)
+    assert sorted(outcome) == ["cancelled", "done"]
+    assert scheduler.submit(job, key="job") not in (first, second)
+    scheduler.wait_for_done()
+
+
+def test_cancel_queued(qapp, gate):
+    """A cancelled queued task never runs."""
+    scheduler = make_scheduler(1)
+    calls, cancelled = [], []
+    scheduler.submit(gate.wait)
+    handle = scheduler.submit(calls.append, 1, key="queued")
+    handle.cancelled.connect(lambda: cancelled.append(True))
+    handle.cancel()
+    assert cancelled == [True] and handle.state == "cancelled"
+    assert scheduler.pending_count() == 0
+    gate.set()
+    scheduler.wait_for_done()
+    assert calls == []
+
+
+def test_cancel_running(qapp):
+    """A running task sees its token and is reported as cancelled."""
+    scheduler = make_scheduler(1)
+    started = threading.Event()
+    outcome = []
+
+    def job(token):
+        started.set()
+        while True:
+            token.raise_if_cancelled()
+            time.sleep(0.005)
+
+    handle = scheduler.submit(job, with_token=True)
+    handle.cancelled.connect(lambda: outcome.append("cancelled"))
+    handle.failed.connect(outcome.append)
+    assert started.wait(2)
+    handle.cancel()
+    assert wait_until(lambda: outcome)
+    assert outcome == ["cancelled"]
+    scheduler.wait_for_done()
+
+
+def test_deleted_while_running(qapp):
+    """The scheduler's pool waits for the task, which reports to nobody."""
+    scheduler = TaskScheduler()
+    started = threading.Event()
+    returned = []
+
+    def task():
+        started.set()
+        time.sleep(0.2)
+        returned.append(True)
+
+    scheduler.submit(task)
+    assert started.wait(5)
+    # Deleting the scheduler deletes its own pool, which waits for the task
+    scheduler.deleteLater()
+    assert wait_until(lambda: sip.isdeleted(scheduler))
+    assert returned == [True]
+
+
+def test_controller_saves_config_in_background(qapp, tmp_path):
+    """MainController saves a snapshot of the config on the scheduler."""
+    # pylint: disable=import-outside-toplevel
+    from core.main_controller import MainController
+
+    path = tmp_path / "app_config.yaml"
+    controller = MainController(str(path))
+    handler = controller.config_handler
+    handler.username = "user0"
+    handler.config["user0"] = dict(handler.STARTER_CONFIG)
+    handler.num_recents_to_show = 3
+    done = []
+    controller.save_config_in_background().finished.connect(done.append)
+    handler.num_recents_to_show = 4
+    assert wait_until(lambda: done)
+    assert "num_recents_to_show: 3" in path.read_text()
+    controller.stop_background_tasks()
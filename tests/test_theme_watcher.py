@@ -0,0 +1,155 @@
+"""
+Tests for theme hot-reloading with theme_watcher.py.
+
+Ensures:
+    - Rapid saves of watched files are reported once, after the debounce.
+    - Files replaced by a rename keep being watched.
+    - Changing a theme file only recompiles that theme, without reading the
+      template or the other themes again.
+    - The live windows are restyled when the current theme changes.
+"""
+
+import os
+import re
+
+import pytest
+from PyQt6.QtGui import QPalette
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QWidget
+
+from core import app_config_handler
+from core.main_controller import MainController
+from core.theme_watcher import ThemeWatcher
+from tests.conftest import wait_until
+
+WATCHED = ["styles/colors_a.qss", "styles/colors_b.qss", "icons/arrow.svg"]
+
+
+@pytest.fixture
+def resource_dir(tmp_path):
+    """Resource directory with a few watched files."""
+    for path in WATCHED:
+        os.makedirs(tmp_path / os.path.dirname(path), exist_ok=True)
+        (tmp_path / path).write_text("initial")
+    return tmp_path
+
+
+@pytest.fixture
+def watcher(qapp, resource_dir):
+    """Watcher over the files in `resource_dir` collecting its reports."""
+    watcher = ThemeWatcher(WATCHED, debounce_ms=50,
+                           resource_dir=str(resource_dir))
+    watcher.reports = []
+    watcher.resources_changed.connect(watcher.reports.append)
+    yield watcher
+    watcher.deleteLater()
+
+
+@pytest.fixture
+def read_counter(monkeypatch):
+    """Count the resource reads of the config handler by file name."""
+    reads = {}
+    read_text = app_config_handler.read_text
+
+    def counting_read_text(path):
+        name = os.path.basename(path)
+        reads[name] = reads.get(name, 0) + 1
+        return read_text(path)
+
+    monkeypatch.setattr(app_config_handler, "read_text", counting_read_text)
+    return reads
+
+
+@pytest.fixture
+def controller(qapp, tmp_path):
+    """Main controller with a throw-away config file."""
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    yield controller
+    qapp.setStyleSheet("")
+    qapp.setPalette(QPalette())
+
+
+def test_watched_resources(watcher):
+    """Every existing file is watched."""
+    assert watcher.watched_resources() == sorted(WATCHED)
+
+
+def test_rapid_saves_are_debounced(watcher, resource_dir):
+    """Several saves in a row are reported once."""
+    for i in range(3):
+        (resource_dir / WATCHED[0]).write_text(f"save {i}")
+        QTest.qWait(10)
+    assert wait_until(lambda: watcher.reports)
+    QTest.qWait(100)
+    assert watcher.reports == [[WATCHED[0]]]
+
+
+def test_replaced_file_is_watched_again(watcher, resource_dir):
+    """A file saved by renaming a new file over it is still watched."""
+    path = resource_dir / WATCHED[1]
+    replacement = resource_dir / "styles" / "colors_b.qss.tmp"
+    replacement.write_text("replaced")
+    os.replace(replacement, path)
+    assert wait_until(lambda: watcher.reports)
+    assert WATCHED[1] in watcher.reports[0]
+    assert WATCHED[1] in watcher.watched_resources()
+
+
+def test_theme_change_recompiles_one_theme(tmp_path, read_counter):
+    """Only the changed theme file is read again."""
+    handler = app_config_handler.ConfigHandler(str(tmp_path / "cfg.yaml"))
+    dark = handler.get_stylesheet("colors_dark.qss")
+    light = handler.get_stylesheet("colors_light.qss")
+    reads = dict(read_counter)
+
+    assert handler.invalidate_resources(
+        ["styles/colors_dark.qss"]) == {"colors_dark.qss"}
+    assert handler.get_stylesheet("colors_dark.qss") == dark
+    assert handler.get_stylesheet("colors_light.qss") == light
+    reads["colors_dark.qss"] += 1
+    assert read_counter == reads
+
+
+def test_template_change_recompiles_all_themes(tmp_path, read_counter):
+    """The template and SVG templates invalidate every compiled theme."""
+    handler = app_config_handler.ConfigHandler(str(tmp_path / "cfg.yaml"))
+    handler.get_stylesheet("colors_dark.qss")
+    handler.get_stylesheet_parts("colors_light.qss")
+    themes = {"colors_dark.qss", "colors_light.qss"}
+    assert handler.invalidate_resources(
+        ["styles/style_template.qss"]) == themes
+    handler.get_stylesheet_parts("colors_light.qss")
+    assert read_counter["style_template.qss"] == 2
+    assert handler.invalidate_resources(
+        ["icons/down-arrow-template.svg"]) == {"colors_light.qss"}
+
+
+def test_theme_svgs_are_per_theme(tmp_path):
+    """Each theme refers to its own tinted icon files."""
+    handler = app_config_handler.ConfigHandler(str(tmp_path / "cfg.yaml"))
+    dark = handler.get_stylesheet("colors_dark.qss")
+    light = handler.get_stylesheet("colors_light.qss")
+    assert "-colors_dark.png" in dark and "-colors_dark.png" not in light
+
+
+def test_live_windows_are_restyled(qapp, controller, monkeypatch):
+    """A change of the current theme restyles the themed windows."""
+    window = QWidget()
+    controller.apply_theme(window)
+    theme = controller.config_handler.theme_filename
+    read_text = app_config_handler.read_text
+
+    def edited_read_text(path):
+        text = read_text(path)
+        if os.path.basename(path) == theme:
+            text = re.sub(r"^@text = .*$", "@text = #123456", text,
+                          flags=re.MULTILINE)
+        return text
+
+    monkeypatch.setattr(app_config_handler, "read_text", edited_read_text)
+    controller.on_theme_resources_changed(
+        ["styles/colors_dark_orange.qss"])
+    assert "#123456" not in window.styleSheet()
+    controller.on_theme_resources_changed([f"styles/{theme}"])
+    assert "#123456" in window.styleSheet()
+    window.deleteLater()
@@ -0,0 +1,64 @@
+"""
+Tests for applying themes through MainController.
+
+Ensures:
+    - The structural and color stylesheet parts are fully formatted.
+    - Scoped theming only restyles top-level windows that follow the theme.
+    - Full theming sets the complete stylesheet on the application.
+    - The theme switch time is measured.
+"""
+
+import pytest
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QWidget
+
+from core.main_controller import MainController
+
+THEMES = ["colors_light.qss", "colors_dark.qss", "colors_dark_orange.qss"]
+
+
+@pytest.fixture
+def controller(qapp, tmp_path):
+    """Main controller with a throw-away config file."""
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    yield controller
+    qapp.setStyleSheet("")
+    qapp.setPalette(QPalette())
+
+
+@pytest.mark.parametrize("theme", THEMES)
+def test_stylesheet_parts(controller, theme):
+    """Only the color part changes with the theme and no keyword is left."""
+    structural, colors = controller.config_handler.get_stylesheet_parts(theme)
+    assert "@" not in structural and "@" not in colors
+    assert structural == controller.config_handler.get_stylesheet_parts(
+        "colors_dark.qss")[0]
+    assert "border-radius" in structural and "border-radius" not in colors
+
+
+def test_scoped_theme_switch(qapp, controller):
+    """Only themed windows get the color sheet; the app sheet is fixed."""
+    window = QWidget()
+    other = QWidget()
+    handler = controller.config_handler
+
+    controller.apply_theme(window)
+    structural = qapp.styleSheet()
+    assert window.property(MainController.THEME_PROPERTY) == "colors_light.qss"
+
+    handler.theme_filename = "colors_dark.qss"
+    controller.apply_theme()
+    assert qapp.styleSheet() == structural
+    assert window.styleSheet() == handler.get_stylesheet_parts()[1]
+    assert window.property(MainController.THEME_PROPERTY) == "colors_dark.qss"
+    assert other.styleSheet() == ""
+    assert qapp.palette().color(QPalette.ColorRole.Window) == QColor("#222222")
+    assert controller.last_theme_switch_ms > 0
+
+
+def test_full_theme_switch(qapp, controller):
+    """Without scoped theming the whole stylesheet is set on the app."""
+    controller.config_handler.scoped_theming = False
+    controller.config_handler.theme_filename = "colors_dark.qss"
+    controller.apply_theme(QWidget())
+    assert qapp.styleSheet() == controller.get_stylesheet()
@@ -0,0 +1,179 @@
+"""
+Tests for thumbnail_cache.py.
+
+Ensures:
+    - Thumbnails are generated in the background, within the thumbnail size
+      and keeping the aspect ratio.
+    - Generated thumbnails are written to disk and reused by a new cache,
+      until the file changes.
+    - The disk cache stays within its budget, evicting the least recently
+      used thumbnails first, and the memory cache is an LRU too.
+    - Missing and undecodable files produce no thumbnail.
+    - The Open Recent menu shows a placeholder that is swapped for the
+      thumbnail.
+"""
+
+import os
+import shutil
+
+import pytest
+from PyQt6.QtGui import QColor, QImage
+
+from core.task_scheduler import TaskScheduler
+from core.thumbnail_cache import (THUMBNAIL_SIZE, ThumbnailCache,
+                                  cache_filename, cache_key,
+                                  enforce_disk_budget, is_image_file,
+                                  load_thumbnail)
+from tests.conftest import REPO_ROOT, wait_until
+
+
+def write_image(path, width=400, height=200, color="#ff0000"):
+    """Save a plain image and return its path."""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(color))
+    assert image.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def cache(qapp, tmp_path):
+    """Thumbnail cache with its own scheduler."""
+    scheduler = TaskScheduler({"thumbnails": 2})
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"), scheduler)
+    yield cache
+    scheduler.wait_for_done()
+
+
+def request(cache, path):
+    """Request a thumbnail and return what thumbnail_ready delivered."""
+    ready = []
+    cache.thumbnail_ready.connect(lambda *args: ready.append(args))
+    handle = cache.request(path)
+    assert wait_until(handle.is_done)
+    return ready
+
+
+def test_generate(cache, tmp_path):
+    """The thumbnail is scaled down and stored on disk."""
+    path = write_image(tmp_path / "wide.png")
+    ready = request(cache, path)
+    assert len(ready) == 1
+    filepath, image = ready[0]
+    assert filepath == path
+    assert (image.width(), image.height()) == (THUMBNAIL_SIZE,
+                                               THUMBNAIL_SIZE // 2)
+    assert image.pixelColor(10, 10) == QColor("#ff0000")
+    assert cache.thumbnail(path) == image
+    assert os.path.exists(os.path.join(cache.cache_dir,
+                                       cache_filename(cache_key(path))))
+
+
+def test_up_to_date_not_emitted_again(cache, tmp_path):
+    """A thumbnail in memory that did not change is not announced again."""
+    path = write_image(tmp_path / "image.png")
+    assert len(request(cache, path)) == 1
+    assert request(cache, path) == []
+
+
+def test_disk_cache_reused(cache, tmp_path):
+    """A new cache loads the thumbnail from disk instead of the file."""
+    path = write_image(tmp_path / "image.png")
+    request(cache, path)
+    cached = os.path.join(cache.cache_dir, cache_filename(cache_key(path)))
+    # Mark the cached file, to tell it apart from a new thumbnail
+    marked = QImage(cached)
+    marked.setPixelColor(0, 0, QColor("#00ff00"))
+    marked.save(cached)
+
+    key, image, written = load_thumbnail(path, cache.cache_dir)
+    assert key == cache_key(path)
+    assert written == 0
+    assert image.pixelColor(0, 0) == QColor("#00ff00")
+
+
+def test_changed_file_regenerated(cache, tmp_path):
+    """Editing the file changes the key and the thumbnail."""
+    path = write_image(tmp_path / "image.png")
+    request(cache, path)
+    write_image(path, 100, 300, "#0000ff")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    ready = request(cache, path)
+    assert len(ready) == 1
+    image = ready[0][1]
+    assert image.height() == THUMBNAIL_SIZE
+    assert image.pixelColor(5, 5) == QColor("#0000ff")
+
+
+def test_missing_and_broken_files(cache, tmp_path):
+    """No thumbnail is announced for files that cannot be read."""
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    assert request(cache, str(tmp_path / "missing.png")) == []
+    assert request(cache, str(broken)) == []
+
+
+def test_disk_budget(tmp_path):
+    """The least recently used thumbnails are deleted down to the budget."""
+    cache_dir = tmp_path / "thumbnails"
+    cache_dir.mkdir()
+    for i in range(10):
+        path = cache_dir / f"{i}.png"
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (i, i))
+    assert enforce_disk_budget(str(cache_dir), 5000) <= 4500
+    assert sorted(os.listdir(cache_dir)) == [f"{i}.png" for i in range(6, 10)]
+
+
+def test_disk_budget_enforced_by_cache(qapp, tmp_path):
+    """The cache evicts once its thumbnails exceed the budget."""
+    scheduler = TaskScheduler({"thumbnails": 1})
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"), scheduler,
+                           max_disk_bytes=1)
+    request(cache, write_image(tmp_path / "image.png"))
+    assert wait_until(lambda: scheduler.pending_count() == 0 and
+                      scheduler.running_count() == 0)
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_memory_lru(qapp, tmp_path):
+    """The least recently used thumbnails leave memory first."""
+    scheduler = TaskScheduler({"thumbnails": 1})
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"), scheduler,
+                           max_memory_items=2)
+    paths = [write_image(tmp_path / f"{i}.png") for i in range(3)]
+    request(cache, paths[0])
+    request(cache, paths[1])
+    assert cache.thumbnail(paths[0]) is not None
+    request(cache, paths[2])
+    assert cache.thumbnail(paths[1]) is None
+    assert cache.thumbnail(paths[0]) is not None
+
+
+def test_is_image_file():
+    """Images are recognised by suffix, case insensitively."""
+    assert is_image_file("/a/b.PNG")
+    assert not is_image_file("/a/b.txt")
+    assert not is_image_file("/a/b")
+
+
+def test_recent_menu_thumbnail(qapp, tmp_path):
+    """The menu shows a placeholder, then the thumbnail."""
+    # pylint: disable=import-outside-toplevel
+    from app.main_window import MainWindow
+    from core.main_controller import MainController
+
+    shutil.copy(os.path.join(REPO_ROOT, "resources", "app_config.yaml"),
+                tmp_path)
+    controller = MainController(str(tmp_path / "app_config.yaml"))
+    window = MainWindow(controller)
+    window.finish_startup()
+    path = write_image(tmp_path / "image.png")
+    controller.config_handler.recent_files = {"image.png": path}
+
+    window._populate_open_recent_menu()  # pylint: disable=protected-access
+    action = window.open_recent_menu.actions()[0]
+    placeholder = action.icon().cacheKey()
+    assert not action.icon().isNull()
+    assert wait_until(lambda: action.icon().cacheKey() != placeholder)
+    assert controller.thumbnail_cache.thumbnail(path) is not None
+    controller.stop_background_tasks()